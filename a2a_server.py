@@ -1,11 +1,27 @@
+import asyncio
+import json
 import os
+import signal
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
 import uvicorn
 from dotenv import load_dotenv
 from a2a.server.apps import A2AStarletteApplication
 from a2a.server.request_handlers import DefaultRequestHandler
 from a2a.server.tasks import InMemoryTaskStore
 from a2a.types import AgentCard, AgentCapabilities, AgentSkill
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from agents.cache import get_response_cache
+from agents.governor import get_governor
+from agents.metrics import InFlightMiddleware, metrics_payload
+from agents.resilience import resilience_stats
 from orchestrator.host import PipelineHost
+from orchestrator.near_duplicates import get_near_duplicate_index
+from orchestrator.startup import get_startup_profile
+from orchestrator.task_store import SQLiteTaskStore
 import logging
 
 # Configure logging
@@ -16,6 +32,66 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 load_dotenv()
+startup = get_startup_profile()
+
+async def cache_stats(request):
+    cache = get_response_cache()
+    return JSONResponse({"enabled": cache is not None, **(cache.stats() if cache else {})})
+
+async def governor_stats(request):
+    return JSONResponse(get_governor().stats())
+
+async def resilience_stats_route(request):
+    return JSONResponse(resilience_stats())
+
+async def near_duplicate_stats(request):
+    index = get_near_duplicate_index()
+    return JSONResponse({"enabled": index is not None, **(index.stats() if index else {})})
+
+async def ready(request):
+    """Readiness probe: 503 until the agents are built, so traffic waits for warm-up."""
+    return JSONResponse(startup.report(), status_code=200 if startup.ready else 503)
+
+async def startup_profile(request):
+    return JSONResponse(startup.report())
+
+async def warm_up(host_agent: PipelineHost):
+    try:
+        with startup.phase("agents"):
+            await host_agent.warm_up()
+    except Exception as e:
+        startup.mark_failed(e)
+        return
+    startup.mark_ready()
+
+def create_lifespan(host_agent: PipelineHost):
+    """
+    A2A_WARMUP=background (default) builds the agents right after the port opens;
+    lazy leaves each agent to its first request and reports ready at once.
+    """
+    @asynccontextmanager
+    async def lifespan(app):
+        warmup = None
+        if os.getenv("A2A_WARMUP", "background").lower() == "lazy":
+            startup.mark_ready()
+        else:
+            warmup = asyncio.create_task(warm_up(host_agent))
+        yield
+        if warmup is not None and not warmup.done():
+            warmup.cancel()
+    return lifespan
+
+async def metrics(request):
+    body, content_type = metrics_payload(request.headers.get("accept"))
+    return Response(body, media_type=content_type)
+
+def create_task_store():
+    """TASK_STORE=sqlite (default) persists tasks to TASK_STORE_PATH; memory keeps the SDK store."""
+    kind = os.getenv("TASK_STORE", "sqlite").lower()
+    if kind == "memory":
+        return InMemoryTaskStore()
+    logger.info(f"Using SQLite task store at {os.getenv('TASK_STORE_PATH', 'tasks.db')}")
+    return SQLiteTaskStore.from_env()
 
 def create_a2a_app():
     logger.info("Configuring Agent Capabilities...")
@@ -59,16 +135,100 @@ def create_a2a_app():
         agent_card=agent_card,
         http_handler=DefaultRequestHandler(
             agent_executor=host_agent,
-            task_store=InMemoryTaskStore()
+            task_store=create_task_store()
         )
     )
 
     logger.info("Building application...")
-    return a2a_app.build()
+    app = a2a_app.build(lifespan=create_lifespan(host_agent), routes=[
+        Route("/cache/stats", cache_stats, methods=["GET"]),
+        Route("/governor/stats", governor_stats, methods=["GET"]),
+        Route("/near-duplicates/stats", near_duplicate_stats, methods=["GET"]),
+        Route("/resilience/stats", resilience_stats_route, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/ready", ready, methods=["GET"]),
+        Route("/startup/profile", startup_profile, methods=["GET"]),
+    ])
+    app.add_middleware(InFlightMiddleware, name="a2a")
+    app.state.host_agent = host_agent
+    return app
+
+_app = None
+
+def get_app():
+    """
+    The server's app, built on first use. An A2A_WORKERS supervisor never
+    builds one, so it opens no task store; its workers build their own.
+    """
+    global _app
+    if _app is None:
+        with startup.phase("app"):
+            _app = create_a2a_app()
+    return _app
+
+def __getattr__(name: str):
+    # `uvicorn a2a_server:app` (workers, benchmark.py) builds the app on this lookup
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-app = create_a2a_app()
+async def profile_startup() -> dict:
+    """Cold-start report for `python a2a_server.py --profile-startup`: imports, app build, agents."""
+    await warm_up(get_app().state.host_agent)
+    # A fresh interpreter, as this one has imported everything already
+    startup.measure_imports("a2a_server")
+    return startup.report()
+
+def split_quota(workers: int) -> dict[str, str]:
+    """Each worker governs its own calls, so the account's Gemini quota is shared out evenly."""
+    return {
+        "GEMINI_RPM_LIMIT": str(float(os.getenv("GEMINI_RPM_LIMIT", "60")) / workers),
+        "GEMINI_TPM_LIMIT": str(float(os.getenv("GEMINI_TPM_LIMIT", "1000000")) / workers),
+        "GEMINI_MAX_IN_FLIGHT": str(max(1, int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8")) // workers)),
+    }
+
+def run_workers(workers: int, port: int):
+    """
+    A2A_WORKERS=N runs N independent server processes on ports port..port+N-1,
+    so the pipeline can use N cores. They share the SQLite task store; main.py
+    balances requests over them (same A2A_WORKERS there, or list them in
+    A2A_BACKENDS). This process only supervises: every worker builds its app
+    with the shared store and its quota share already in its environment.
+    """
+    if os.getenv("TASK_STORE", "sqlite").lower() == "memory":
+        logger.warning("TASK_STORE=memory: each worker only knows its own tasks")
+    env = {**os.environ, **split_quota(workers), "TASK_STORE_SHARED": "true"}
+    logger.info(f"Starting {workers} A2A Server workers on ports {port}-{port + workers - 1}...")
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "a2a_server:app", "--host", "0.0.0.0", "--port", str(port + i)],
+            env={**env, "A2A_SERVER_PORT": str(port + i)},
+        )
+        for i in range(workers)
+    ]
+    # A stopped supervisor must not leave its workers behind
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        while all(child.poll() is None for child in children):
+            time.sleep(1.0)
+        logger.error("An A2A Server worker exited, stopping the others")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for child in children:
+            if child.poll() is None:
+                child.terminate()
+        for child in children:
+            child.wait()
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        print(json.dumps(asyncio.run(profile_startup()), indent=2))
+        sys.exit(0 if startup.ready else 1)
     port = int(os.getenv("A2A_SERVER_PORT", "9999"))
-    logger.info(f"Starting A2A Server on port {port}...")
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("A2A_WORKERS", "1"))
+    if workers > 1:
+        run_workers(workers, port)
+    else:
+        logger.info(f"Starting A2A Server on port {port}...")
+        uvicorn.run(get_app(), host="0.0.0.0", port=port)
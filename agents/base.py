@@ -1,41 +1,297 @@
 from abc import ABC
+from contextlib import AsyncExitStack
+from typing import AsyncIterator
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
 from a2a.utils.message import new_agent_text_message, get_message_text
-import google.generativeai as genai
+from agents.cache import get_response_cache
+from agents.cassette import RecordingModel, ReplayModel, get_cassette_recorder
+from agents.call_context import CallOptions, call_options, current_call_options, deadline_timeout
+from agents.governor import get_governor
+from agents.metrics import observe_usage, track_gemini_call
+from agents.resilience import CircuitOpenError, HedgedCall, get_circuit_breaker, get_hedger
+from agents.structured_output import gemini_schema
+from pydantic import BaseModel
+import asyncio
+import json
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _candidate_text(candidate) -> str:
+    return "".join(part.text for part in candidate.content.parts if getattr(part, "text", None))
+
+
+_gemini_api_key: str | None = None
+
+
+def configure_gemini():
+    """
+    Imports and configures the Gemini SDK once per process; every agent's
+    GenerativeModel then shares its client. The import is deferred to here
+    because it is the slowest part of server startup.
+    """
+    global _gemini_api_key
+    import google.generativeai as genai
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment")
+    if api_key != _gemini_api_key:
+        genai.configure(api_key=api_key)
+        _gemini_api_key = api_key
+    return genai
+
+
+def create_model(model_name: str, system_instruction: str, generation_config: dict):
+    """
+    The model backend for an agent: Gemini, GEMINI_BACKEND=fake for the offline
+    stand-in from agents.fake_model (benchmarks, no quota spent), or replay to
+    answer from a recorded cassette (agents.cassette). With GEMINI_CASSETTE_RECORD
+    set, the calls of a live or fake backend are recorded.
+    """
+    backend = os.getenv("GEMINI_BACKEND", "gemini").lower()
+    if backend == "replay":
+        return ReplayModel(model_name, system_instruction, generation_config)
+    if backend == "fake":
+        from agents.fake_model import FakeGenerativeModel
+        model = FakeGenerativeModel(model_name, system_instruction, generation_config)
+    elif backend == "gemini":
+        genai = configure_gemini()
+        model = genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction,
+            generation_config=generation_config or None,
+        )
+    else:
+        raise ValueError(f"Unknown GEMINI_BACKEND: {backend}")
+
+    recorder = get_cassette_recorder()
+    if recorder is None:
+        return model
+    return RecordingModel(model, model_name, system_instruction, generation_config, recorder)
+
+
 class GeminiAgentExecutor(AgentExecutor):
+    # Agents whose output is worth showing while it is generated set this to True;
+    # PipelineHost then forwards their tokens as artifact chunks.
+    stream_output = False
+    # Agents whose output depends only on their input opt in to the response cache;
+    # creative stages stay out so that re-runs give new answers.
+    cacheable = False
+    # Agents with a typed output set this; run_logic() then returns JSON for it
+    # (Gemini JSON mode) and callers parse it with structured_output.parse_output().
+    response_model: type[BaseModel] | None = None
+
     def __init__(self, system_instruction: str):
         self.system_instruction = system_instruction
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise ValueError("GEMINI_API_KEY not found in environment")
+        self.model_name = "gemini-1.5-flash"
+        self.generation_config: dict = {}
+        if self.response_model is not None:
+            self.generation_config = {
+                "response_mime_type": "application/json",
+                "response_schema": gemini_schema(self.response_model),
+            }
+        self.model = create_model(self.model_name, system_instruction, self.generation_config)
+        # Latency history, upstream health and metrics are tracked per agent
+        self.agent_name = type(self).__name__
+        self.hedger = get_hedger(self.agent_name)
+        self.breaker = get_circuit_breaker(self.agent_name)
 
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            system_instruction=system_instruction
-        )
+    def _estimate_tokens(self, user_input: str, candidates: int = 1) -> int:
+        """Rough prompt+response token count used to reserve quota before the call."""
+        expected_output = int(os.getenv("GEMINI_EXPECTED_OUTPUT_TOKENS", "512"))
+        return (len(self.system_instruction) + len(user_input)) // 4 + expected_output * candidates
+
+    def _cache_key(self, user_input: str, generation_config: dict | None = None) -> str | None:
+        """Cache key for this call, or None if the call must not use the cache."""
+        cache = get_response_cache()
+        if cache is None or not self.cacheable:
+            return None
+        if current_call_options().bypass_cache:
+            cache.record_bypass()
+            return None
+        config = self.generation_config if generation_config is None else generation_config
+        return cache.make_key(self.model_name, self.system_instruction, config, user_input)
 
     async def run_logic(self, user_input: str) -> str:
         """Helper for internal orchestration by PipelineHost."""
-        logger.info(f"GeminiAgentExecutor: run_logic() with input: {user_input[:50]}...")
+        return await self._generate(user_input, self.generation_config)
+
+    async def run_json(self, user_input: str, response_model: type[BaseModel]) -> str:
+        """Like run_logic(), but answers with JSON for `response_model` instead of the agent's own schema."""
+        config = {
+            **self.generation_config,
+            "response_mime_type": "application/json",
+            "response_schema": gemini_schema(response_model),
+        }
+        return await self._generate(user_input, config)
+
+    async def run_variants(self, user_input: str, count: int) -> list[str]:
+        """
+        `count` independent answers to the same input. They are requested as
+        candidates of one call (candidate_count); models that return fewer are
+        topped up with concurrent single calls, which skip the cache so the
+        answers differ.
+        """
+        config = {**self.generation_config, "candidate_count": count}
+        cache_key = self._cache_key(user_input, config)
+        if cache_key:
+            cached = await get_response_cache().get(cache_key)
+            if cached is not None:
+                logger.info("GeminiAgentExecutor: run_variants() served from cache")
+                return json.loads(cached)
+
+        texts: list[str] = []
         try:
-            response = await self.model.generate_content_async(user_input)
+            async def attempt():
+                async with get_governor().slot(self._estimate_tokens(user_input, candidates=count)) as slot:
+                    with track_gemini_call(self.agent_name, "variants"):
+                        response = await self.model.generate_content_async(user_input, generation_config=config)
+                    slot.record_usage(response)
+                    observe_usage(self.agent_name, response)
+                return response
+
+            async with deadline_timeout():
+                response = await self._call_upstream(attempt)
+            texts = [text for text in (_candidate_text(c) for c in response.candidates) if text]
+        except (TimeoutError, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.warning(f"GeminiAgentExecutor: candidate_count={count} call failed ({e}), using single calls")
+
+        if len(texts) < count:
+            logger.info(f"GeminiAgentExecutor: run_variants() got {len(texts)}/{count} candidates, topping up")
+            texts += await asyncio.gather(*(
+                self._generate(user_input, self.generation_config, use_cache=False)
+                for _ in range(count - len(texts))
+            ))
+        texts = texts[:count]
+        if cache_key:
+            await get_response_cache().set(cache_key, json.dumps(texts, ensure_ascii=False))
+        return texts
+
+    async def _generate(self, user_input: str, generation_config: dict, use_cache: bool = True) -> str:
+        trace = f" [trace {trace_id}]" if (trace_id := current_call_options().trace_id) else ""
+        logger.info(f"GeminiAgentExecutor: run_logic() with input: {user_input[:50]}...{trace}")
+        cache_key = self._cache_key(user_input, generation_config) if use_cache else None
+        if cache_key:
+            cached = await get_response_cache().get(cache_key)
+            if cached is not None:
+                logger.info("GeminiAgentExecutor: run_logic() served from cache")
+                return cached
+        try:
+            async with deadline_timeout():
+                response = await self._call_upstream(
+                    lambda hedged=None: self._attempt(user_input, generation_config, hedged), hedge=True
+                )
             logger.info("GeminiAgentExecutor: run_logic() received response from model")
-            return response.text
+            text = response.text
+            if cache_key and text:
+                await get_response_cache().set(cache_key, text)
+            return text
+        except TimeoutError:
+            logger.warning("GeminiAgentExecutor: run_logic() stopped at the request deadline")
+            raise
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"GeminiAgentExecutor: Error in run_logic: {str(e)}", exc_info=True)
             raise
 
+    async def _attempt(self, user_input: str, generation_config: dict, hedged: HedgedCall | None = None):
+        """One model call under a governor slot; hedges are separate attempts with their own slot."""
+        async with get_governor().slot(self._estimate_tokens(user_input)) as slot:
+            if hedged is not None:
+                # The hedger times the model call only, not the wait for the slot
+                hedged.admit()
+            with track_gemini_call(self.agent_name, "unary"):
+                response = await self.model.generate_content_async(
+                    user_input, generation_config=generation_config or None
+                )
+            slot.record_usage(response)
+            observe_usage(self.agent_name, response)
+        return response
+
+    async def _call_upstream(self, attempt, hedge: bool = False):
+        """
+        Runs `attempt` behind this agent's circuit breaker, hedged if asked and
+        enabled; hedged attempts are passed a HedgedCall to report their admission.
+        """
+        self.breaker.check()
+        try:
+            response = await (self.hedger.run(attempt) if hedge and self.hedger else attempt())
+        except (TimeoutError, asyncio.CancelledError):
+            # Our deadline or our caller gave up; says nothing about upstream health
+            self.breaker.release_trial()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return response
+
+    async def stream_logic(self, user_input: str) -> AsyncIterator[str]:
+        """Like run_logic(), but yields text chunks as the model generates them."""
+        logger.info(f"GeminiAgentExecutor: stream_logic() with input: {user_input[:50]}...")
+        cache_key = self._cache_key(user_input)
+        if cache_key:
+            cached = await get_response_cache().get(cache_key)
+            if cached is not None:
+                logger.info("GeminiAgentExecutor: stream_logic() served from cache")
+                yield cached
+                return
+        try:
+            chunks = []
+            self.breaker.check()
+            async with AsyncExitStack() as stack:
+                # The deadline only covers awaits inside this generator, never the consumer's
+                # work between chunks, so each await gets its own timeout scope.
+                async with deadline_timeout():
+                    slot = await stack.enter_async_context(get_governor().slot(self._estimate_tokens(user_input)))
+                    # Timed from the request to the last chunk
+                    stack.enter_context(track_gemini_call(self.agent_name, "stream"))
+                    response = await self.model.generate_content_async(user_input, stream=True)
+                chunk = None
+                stream = aiter(response)
+                while True:
+                    try:
+                        async with deadline_timeout():
+                            chunk = await anext(stream)
+                    except StopAsyncIteration:
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunks that only carry finish_reason/safety data have no text parts
+                        continue
+                    if text:
+                        chunks.append(text)
+                        yield text
+                # The last streamed chunk carries the usage totals for the whole response
+                slot.record_usage(chunk)
+                observe_usage(self.agent_name, chunk)
+            self.breaker.record_success()
+            if cache_key and chunks:
+                await get_response_cache().set(cache_key, "".join(chunks))
+            logger.info("GeminiAgentExecutor: stream_logic() finished streaming")
+        except (TimeoutError, asyncio.CancelledError, GeneratorExit):
+            self.breaker.release_trial()
+            logger.warning("GeminiAgentExecutor: stream_logic() stopped before the model finished")
+            raise
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            logger.error(f"GeminiAgentExecutor: Error in stream_logic: {str(e)}", exc_info=True)
+            raise
+
     async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
         """
-        SDK 0.3.x direct execution handler.
+        SDK 0.3.x direct execution handler. Goes through run_logic(), so direct
+        calls share the governor, cache, breaker and metrics with pipeline calls.
         """
         logger.info(f"GeminiAgentExecutor.execute() started for task: {context.task_id}")
         try:
@@ -45,9 +301,9 @@ class GeminiAgentExecutor(AgentExecutor):
                 logger.warning("No user input received")
                 return
 
-            logger.info(f"Calling Gemini model with input: {user_input[:50]}...")
-            response = await self.model.generate_content_async(user_input)
-            text_response = response.text
+            # Priority, tenant and deadline of a direct call come with its message, as for the pipeline
+            call_options.set(CallOptions.from_metadata(context.message.metadata))
+            text_response = await self.run_logic(user_input)
             logger.info(f"Gemini responded. Length: {len(text_response)}")
 
             # BUG FIX #1: new_agent_text_message only accepts `text` — remove task_id/context_id
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Content-addressed cache of model responses.
+
+    Tier 1 is an in-process LRU bounded by entry count and total bytes; tier 2 is
+    an optional SQLite file that survives restarts. Both tiers honour the TTL.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        max_entries: int = 1024,
+        max_bytes: int = 32 * 1024 * 1024,
+        sqlite_path: str | None = None,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sqlite_path = sqlite_path
+
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._memory_bytes = 0
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.bypasses = 0
+        self.evictions = 0
+
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            ttl=float(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600")),
+            max_entries=int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.getenv("GEMINI_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            sqlite_path=os.getenv("GEMINI_CACHE_SQLITE_PATH") or None,
+        )
+
+    @staticmethod
+    def make_key(model_name: str, system_instruction: str, generation_config: dict[str, Any], input_text: str) -> str:
+        payload = json.dumps(
+            [model_name, system_instruction, generation_config, input_text],
+            sort_keys=True, ensure_ascii=False, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> str | None:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+                return value
+            self._drop(key)
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._db_get, key, now)
+            if row is not None:
+                value, expires_at = row
+                self.hits_disk += 1
+                # Keeps the stored expiry, so a disk hit never extends the entry's TTL
+                self._remember(key, value, expires_at)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, value, expires_at)
+
+    def record_bypass(self) -> None:
+        self.bypasses += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "evictions": self.evictions,
+            "entries": len(self._memory),
+            "bytes": self._memory_bytes,
+        }
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self._memory:
+            self._drop(key)
+        self._memory[key] = (expires_at, value)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            oldest = next(iter(self._memory))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, value = self._memory.pop(key)
+        self._memory_bytes -= len(value.encode("utf-8"))
+
+    def _db_get(self, key: str, now: float) -> tuple[str, float] | None:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _db_set(self, key: str, value: str, expires_at: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+
+_response_cache: ResponseCache | None = None
+
+
+def get_response_cache() -> ResponseCache | None:
+    """
+    Process-wide cache, or None when GEMINI_CACHE_ENABLED=false or while
+    recording a cassette (GEMINI_CASSETTE_RECORD), which must see every call.
+    """
+    global _response_cache
+    if os.getenv("GEMINI_CACHE_ENABLED", "true").lower() != "true" or os.getenv("GEMINI_CASSETTE_RECORD"):
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache.from_env()
+    return _response_cache
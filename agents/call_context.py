@@ -0,0 +1,85 @@
+import asyncio
+import math
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any
+
+# Scheduling classes for Gemini calls, most urgent first
+PRIORITIES = ("interactive", "batch")
+
+
+def _number(value: Any, kind: type):
+    """`value` as an int or float, or None if it is missing or not a number."""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+@dataclass(frozen=True)
+class CallOptions:
+    """Per-request options that every agent call made on behalf of a request can see."""
+    bypass_cache: bool = False
+    # Number of ad script candidates to write and rank
+    variants: int = 1
+    # Wall-clock time (time.time()) by which the caller needs an answer
+    deadline: float | None = None
+    # Correlates logs and metric exemplars of every call made for one request
+    trace_id: str | None = None
+    # Governor scheduling: class, and the tenant whose fair share the calls count against
+    priority: str = "interactive"
+    tenant: str = "default"
+
+    def remaining(self) -> float | None:
+        """Seconds left before the deadline, or None without one."""
+        return None if self.deadline is None else self.deadline - time.time()
+
+    @classmethod
+    def from_metadata(cls, metadata: dict[str, Any] | None) -> "CallOptions":
+        """
+        Reads options from A2A message metadata as sent by main.py. Any client can
+        send metadata, so malformed values fall back to their defaults.
+        """
+        metadata = metadata or {}
+        variants = _number(metadata.get("variants"), int)
+        deadline = _number(metadata.get("deadline"), float)
+        return cls(
+            bypass_cache=bool(metadata.get("cache_bypass", False)),
+            variants=max(variants, 1) if variants is not None else 1,
+            deadline=deadline if deadline and math.isfinite(deadline) else None,
+            trace_id=str(metadata["trace_id"]) if metadata.get("trace_id") else None,
+            priority=metadata["priority"] if metadata.get("priority") in PRIORITIES else "interactive",
+            tenant=str(metadata.get("tenant") or "default"),
+        )
+
+
+# Set by PipelineHost for the duration of a request; asyncio tasks spawned while
+# it is set (e.g. by StageScheduler) inherit it.
+call_options: ContextVar[CallOptions] = ContextVar("call_options", default=CallOptions())
+
+
+def current_call_options() -> CallOptions:
+    return call_options.get()
+
+
+@dataclass
+class RunProgress:
+    """How far one pipeline run has got; updated as its stages finish."""
+    completed: int = 0
+
+
+# Set by PipelineHost for the duration of a run and inherited by its stage tasks, so
+# the governor can let runs that are further along go first (None outside a pipeline).
+run_progress: ContextVar[RunProgress | None] = ContextVar("run_progress", default=None)
+
+
+def deadline_timeout() -> asyncio.Timeout:
+    """
+    asyncio.timeout() for what is left of the current request's deadline. Once
+    the deadline has passed the wrapped call fails at its first await.
+    """
+    remaining = current_call_options().remaining()
+    return asyncio.timeout(None if remaining is None else max(remaining, 0.0))
@@ -0,0 +1,305 @@
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_SUFFIX = ".jsonl.gz"
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded call for this model input."""
+
+
+class RecordedError(Exception):
+    """A call that failed while recording, failing the same way on replay."""
+
+
+def call_key(model_name: str, system_instruction: str, generation_config: dict, contents) -> str:
+    """Identifies one model call: same agent, same config, same input."""
+    payload = json.dumps(
+        [model_name, system_instruction, generation_config, contents], sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cassette_files(path: str) -> list[Path]:
+    """A cassette file, or every cassette in a corpus directory."""
+    root = Path(path)
+    if root.is_dir():
+        return sorted(root.rglob(f"*{CASSETTE_SUFFIX}"))
+    return [root]
+
+
+def read_cassette(path: str):
+    """Yields the records of a cassette or corpus; a truncated tail (crashed recorder) ends a file."""
+    for file in cassette_files(path):
+        try:
+            with gzip.open(file, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        except (EOFError, json.JSONDecodeError, gzip.BadGzipFile) as e:
+            logger.warning(f"Cassette {file}: stopped at a damaged record ({e})")
+
+
+def _texts(response) -> list[str]:
+    return [
+        "".join(part.text for part in candidate.content.parts if getattr(part, "text", None))
+        for candidate in getattr(response, "candidates", None) or []
+    ]
+
+
+def _chunk_text(chunk) -> str:
+    try:
+        return chunk.text or ""
+    except ValueError:
+        # Chunks that only carry finish_reason/safety data have no text parts
+        return ""
+
+
+def _usage(response) -> dict | None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return {
+        field: getattr(usage, field, 0) or 0
+        for field in ("prompt_token_count", "candidates_token_count", "total_token_count")
+    }
+
+
+class CassetteRecorder:
+    """
+    Appends every model call to a gzipped JSONL cassette: a `call` record per
+    call (key, input, output texts or streamed chunks, usage, latency) and a
+    `pipeline` record per pipeline input, which is what a replay re-sends.
+    A directory path gets one file per process, so A2A workers can share it.
+    While recording, the response cache and near-duplicate reuse are off, as
+    replays bypass both and would miss the calls they answered.
+    """
+
+    def __init__(self, path: str):
+        target = Path(path)
+        if target.is_dir() or not path.endswith(CASSETTE_SUFFIX):
+            target.mkdir(parents=True, exist_ok=True)
+            target = target / f"cassette-{int(time.time())}-{os.getpid()}{CASSETTE_SUFFIX}"
+        self.path = target
+        self._file = gzip.open(target, "at", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.pipelines = 0
+        atexit.register(self.close)
+        logger.info(f"Recording model calls to {target}")
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(line + "\n")
+            # A sync flush keeps everything written so far readable if the process dies
+            self._file.flush()
+        if record["kind"] == "call":
+            self.calls += 1
+        else:
+            self.pipelines += 1
+
+    def record_pipeline(self, user_input: str, metadata: dict) -> None:
+        self.write({"kind": "pipeline", "input": user_input, "metadata": metadata})
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def stats(self) -> dict:
+        return {"path": str(self.path), "calls": self.calls, "pipelines": self.pipelines}
+
+
+class RecordingModel:
+    """Wraps a model backend and records each of its calls; answers are passed through unchanged."""
+
+    def __init__(self, model, model_name: str, system_instruction: str, generation_config: dict,
+                 recorder: CassetteRecorder):
+        self.model = model
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.recorder = recorder
+
+    def _record(self, contents, config: dict, started: float, **fields) -> None:
+        self.recorder.write({
+            "kind": "call",
+            "key": call_key(self.model_name, self.system_instruction, config, contents),
+            "model": self.model_name,
+            "input": contents,
+            "latency": round(time.monotonic() - started, 4),
+            **fields,
+        })
+
+    async def generate_content_async(self, contents, generation_config: dict | None = None, stream: bool = False):
+        config = {**self.generation_config, **(generation_config or {})}
+        started = time.monotonic()
+        try:
+            response = await self.model.generate_content_async(
+                contents, generation_config=generation_config, stream=stream
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._record(contents, config, started, error=f"{type(e).__name__}: {e}")
+            raise
+        if stream:
+            return self._stream(response, contents, config, started)
+        self._record(contents, config, started, texts=_texts(response), usage=_usage(response))
+        return response
+
+    async def _stream(self, response, contents, config: dict, started: float):
+        chunks, offsets, last = [], [], None
+        async for chunk in response:
+            last = chunk
+            chunks.append(_chunk_text(chunk))
+            offsets.append(round(time.monotonic() - started, 4))
+            yield chunk
+        # Streams the caller abandoned are not recorded: their answer is incomplete
+        self._record(contents, config, started, chunks=chunks, offsets=offsets, usage=_usage(last))
+
+
+def _response(text: str, usage: dict | None, texts: list[str] | None = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(**usage) if usage else None,
+        candidates=[
+            SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=candidate)]))
+            for candidate in (texts if texts is not None else [text])
+        ],
+    )
+
+
+class Cassette:
+    """
+    Recorded calls by key, for replay. Calls made several times with the same
+    input (variant top-ups) are served their recorded answers in turn.
+    `timing` is `instant`, or `original` to wait each call's recorded latency.
+    """
+
+    def __init__(self, path: str, timing: str = "instant"):
+        if timing not in ("instant", "original"):
+            raise ValueError(f"Unknown cassette timing: {timing}")
+        self.path = path
+        self.timing = timing
+        self.calls: dict[str, list[dict]] = {}
+        self.pipelines: list[dict] = []
+        for record in read_cassette(path):
+            if record.get("kind") == "pipeline":
+                self.pipelines.append(record)
+            elif record.get("kind") == "call":
+                self.calls.setdefault(record["key"], []).append(record)
+        self._turns: dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        logger.info(
+            f"Cassette {path}: {sum(len(calls) for calls in self.calls.values())} calls, "
+            f"{len(self.pipelines)} pipeline inputs"
+        )
+
+    @classmethod
+    def from_env(cls) -> "Cassette":
+        path = os.getenv("GEMINI_CASSETTE")
+        if not path:
+            raise ValueError("GEMINI_BACKEND=replay needs GEMINI_CASSETTE (a cassette file or directory)")
+        return cls(path, timing=os.getenv("GEMINI_CASSETTE_TIMING", "instant").lower())
+
+    def lookup(self, key: str) -> dict:
+        recorded = self.calls.get(key)
+        if not recorded:
+            self.misses += 1
+            raise CassetteMiss(f"No recorded call for key {key[:12]}")
+        turn = self._turns.get(key, 0)
+        self._turns[key] = turn + 1
+        self.hits += 1
+        return recorded[turn % len(recorded)]
+
+    def rewind(self) -> None:
+        self._turns.clear()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "timing": self.timing,
+            "keys": len(self.calls),
+            "pipelines": len(self.pipelines),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ReplayModel:
+    """
+    Model backend for GEMINI_BACKEND=replay: answers from a cassette, with no
+    network. Unary and streamed calls share recordings; either is replayed as
+    the other by joining or re-chunking the recorded text.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str = "", generation_config: dict | None = None,
+                 cassette: Cassette | None = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.cassette = cassette or get_cassette()
+
+    async def generate_content_async(self, contents, generation_config: dict | None = None, stream: bool = False):
+        config = {**self.generation_config, **(generation_config or {})}
+        record = self.cassette.lookup(call_key(self.model_name, self.system_instruction, config, contents))
+        original = self.cassette.timing == "original"
+        if "chunks" in record:
+            chunks, offsets = record["chunks"], record["offsets"]
+        else:
+            chunks, offsets = [(record.get("texts") or [""])[0]], [record["latency"]]
+        if original:
+            await asyncio.sleep(offsets[0] if stream else record["latency"])
+        if "error" in record:
+            raise RecordedError(record["error"])
+        if stream:
+            return self._stream(chunks, offsets, record.get("usage"))
+        texts = record.get("texts") or ["".join(chunks)]
+        return _response(texts[0], record.get("usage"), texts)
+
+    async def _stream(self, chunks: list[str], offsets: list[float], usage: dict | None):
+        original = self.cassette.timing == "original"
+        for i, chunk in enumerate(chunks):
+            last = i == len(chunks) - 1
+            yield _response(chunk, usage if last else None)
+            if original and not last:
+                await asyncio.sleep(max(offsets[i + 1] - offsets[i], 0.0))
+
+
+_cassette: Cassette | None = None
+_cassette_recorder: CassetteRecorder | None = None
+
+
+def get_cassette() -> Cassette:
+    """The process-wide replay cassette (GEMINI_CASSETTE), loaded on first use."""
+    global _cassette
+    if _cassette is None:
+        _cassette = Cassette.from_env()
+    return _cassette
+
+
+def get_cassette_recorder() -> CassetteRecorder | None:
+    """Process-wide recorder, or None unless GEMINI_CASSETTE_RECORD names a file or directory."""
+    global _cassette_recorder
+    path = os.getenv("GEMINI_CASSETTE_RECORD")
+    if not path:
+        return None
+    if _cassette_recorder is None:
+        _cassette_recorder = CassetteRecorder(path)
+    return _cassette_recorder
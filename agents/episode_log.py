@@ -0,0 +1,229 @@
+import io
+import re
+from dataclasses import dataclass, field
+from typing import Iterable
+
+from agents.format_profiles import DIALOGUE_SIGNALS, VIBE_SIGNALS, VOW_SIGNALS
+
+# Leading noise stripped from every line before it is classified
+TIMESTAMP_PREFIX = re.compile(
+    r"^\s*[\[(]?\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?[\])]?\s*[-|:]?\s*"
+    r"|^\s*[\[(]?\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}[\])]?\s*[-|:]?\s*"
+    r"|^\s*[\[(]?\d{2}:\d{2}(?::\d{2})?[\])]?\s*[-|:]?\s*"
+)
+LOG_LEVEL_PREFIX = re.compile(r"^\s*[\[(]?(?:INFO|DEBUG|WARN|WARNING|ERROR|TRACE)[\])]?\s*[-|:]?\s*", re.IGNORECASE)
+BULLET_PREFIX = re.compile(r"^\s*(?:[-*•>]+|\d+[.)])\s+")
+
+# Lines that carry nothing about the story
+METADATA_LINE = re.compile(
+    r"^(?:model|tokens?|input tokens|output tokens|latency|duration|request[ _-]?id|trace[ _-]?id|"
+    r"session|user[ _-]?id|status|temperature|top[_ ]?[pk]|version|source|generated(?: by| at)?|cost)\s*[:=]",
+    re.IGNORECASE,
+)
+MODEL_NAME = re.compile(r"\b(?:gemini|gpt|claude|llama|mistral)-[\w.-]+\b", re.IGNORECASE)
+UUID = re.compile(r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", re.IGNORECASE)
+URL = re.compile(r"https?://\S+")
+
+EPISODE = re.compile(r"^(?:EP|Ep|ep|Episode|EPISODE|episode)\.?\s*#?\s*(\d{1,4})\b\s*[-:|–—]*\s*(.*)$")
+TITLE = re.compile(r"^(?:show(?:\s*title)?|title|series)\s*[:=-]\s*(.+)$", re.IGNORECASE)
+TAGS = re.compile(r"^(?:tags?|genre|vibe|mood)\s*[:=-]\s*(.+)$", re.IGNORECASE)
+PEAKS = re.compile(r"^(?:peak\s*moments?|cliff\s*hangers?|highlights?|key\s*moments?)\s*[:=-]\s*(.*)$", re.IGNORECASE)
+SUMMARY = re.compile(r"^(?:episode\s*)?summary\s*[:=-]\s*(.*)$", re.IGNORECASE)
+HASHTAG = re.compile(r"#(\w+)")
+# List separators of an inline "Peak moments: a, b; c" line; quoted speech is never split
+LIST_SEPARATOR = re.compile(r"[,;|](?=(?:[^\"“”]*[\"“”][^\"“”]*[\"“”])*[^\"“”]*$)")
+
+MAX_TAGS = 8
+KNOWN_TAGS = tuple(signal for signals in VIBE_SIGNALS.values() for signal in signals if " " in signal)
+
+
+def estimate_tokens(text: str) -> int:
+    """Same 4-characters-per-token estimate the governor uses."""
+    return len(text) // 4
+
+
+def _normalise(line: str) -> str:
+    return re.sub(r"[\W_]+", " ", line.lower()).strip()
+
+
+def _clean(line: str) -> str:
+    line = TIMESTAMP_PREFIX.sub("", line)
+    line = LOG_LEVEL_PREFIX.sub("", line)
+    line = URL.sub("", UUID.sub("", line))
+    return " ".join(line.split())
+
+
+@dataclass
+class EpisodeDigest:
+    """What is left of a pasted episode log once the noise is gone."""
+    title: str | None = None
+    episodes: list[int] = field(default_factory=list)
+    tags: list[str] = field(default_factory=list)
+    story: list[str] = field(default_factory=list)
+    peak_moments: list[str] = field(default_factory=list)
+    dropped: int = 0
+    duplicates: int = 0
+    # Lines kept with timestamps, log levels, ids or model names stripped
+    rewritten: int = 0
+
+
+def parse_episode_log(lines: Iterable[str]) -> EpisodeDigest:
+    """
+    Single pass over the log: strips timestamps/log levels, drops metadata
+    lines (model names, token counts, ids), removes repeated lines and pulls
+    out episode numbers, title and tags. Works on any line iterator, so a
+    large file never has to be held in memory twice.
+    """
+    digest = EpisodeDigest()
+    seen: set[str] = set()
+    in_peaks = False
+
+    def add(target: list[str], text: str) -> None:
+        key = _normalise(text)
+        if not key:
+            return
+        if key in seen:
+            digest.duplicates += 1
+            return
+        seen.add(key)
+        target.append(text)
+
+    for raw in lines:
+        line = _clean(raw)
+        if not line:
+            in_peaks = False
+            continue
+        if METADATA_LINE.match(line):
+            digest.dropped += 1
+            continue
+        if MODEL_NAME.search(line):
+            # "EP 12 - gemini-2.5-flash-lite - text": the separators around the name go with it
+            line = re.sub(r"\s*[-|:,]?\s*" + MODEL_NAME.pattern + r"\s*[-|:,]?", " ", line, flags=re.IGNORECASE)
+            line = " ".join(line.split()).strip(" -|:,")
+            if not line:
+                digest.dropped += 1
+                continue
+        if line != " ".join(raw.split()):
+            digest.rewritten += 1
+
+        for tag in HASHTAG.findall(line):
+            if tag.lower() not in (t.lower() for t in digest.tags):
+                digest.tags.append(tag)
+        line = HASHTAG.sub("", line).strip()
+        lowered = line.lower()
+        for tag in KNOWN_TAGS:
+            if tag in lowered and tag not in (t.lower() for t in digest.tags):
+                digest.tags.append(tag.title())
+
+        if match := EPISODE.match(line):
+            number = int(match.group(1))
+            if number not in digest.episodes:
+                digest.episodes.append(number)
+            line = match.group(2).strip()
+            if not line:
+                continue
+        if match := TITLE.match(line):
+            digest.title = digest.title or match.group(1).strip()
+            continue
+        if match := TAGS.match(line):
+            for tag in re.split(r"[,;|/]", match.group(1)):
+                tag = tag.strip(" #")
+                if tag and tag.lower() not in (t.lower() for t in digest.tags):
+                    digest.tags.append(tag)
+            continue
+        if match := PEAKS.match(line):
+            in_peaks = True
+            for moment in LIST_SEPARATOR.split(match.group(1)):
+                add(digest.peak_moments, moment.strip())
+            continue
+        if match := SUMMARY.match(line):
+            in_peaks = False
+            line = match.group(1).strip()
+            if not line:
+                continue
+
+        if in_peaks and BULLET_PREFIX.match(line):
+            add(digest.peak_moments, BULLET_PREFIX.sub("", line))
+        else:
+            in_peaks = False
+            add(digest.story, BULLET_PREFIX.sub("", line))
+    return digest
+
+
+def rank_moment(text: str, explicit: bool) -> float:
+    """Higher for lines that read like a cliffhanger: reveals, vows, quotes, exclamations."""
+    lowered = text.lower()
+    score = 3.0 if explicit else 0.0
+    score += sum(lowered.count(signal) for signal in DIALOGUE_SIGNALS + VOW_SIGNALS)
+    score += 0.5 * sum(lowered.count(s) for signals in VIBE_SIGNALS.values() for s in signals)
+    score += 0.5 * (text.count('"') // 2) + 0.5 * min(text.count("!"), 2)
+    return score
+
+
+def _truncate(text: str, tokens: int) -> str:
+    limit = max(tokens, 1) * 4
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " …"
+
+
+def episode_ranges(numbers: list[int]) -> str:
+    """EP 3, EP 5-9 style listing, so a long run of episodes stays one short line."""
+    ranges: list[list[int]] = []
+    for number in sorted(set(numbers)):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ", ".join(f"EP {a}" if a == b else f"EP {a}-{b}" for a, b in ranges)
+
+
+def build_structurer_input(digest: EpisodeDigest, token_budget: int) -> str:
+    """
+    Compact prompt for the Structurer. The header is always kept; story lines
+    and peak moments are admitted by rank until the budget is spent, then
+    printed in their original order.
+    """
+    header = []
+    if digest.title:
+        header.append(f"Show: {digest.title}")
+    if digest.episodes:
+        header.append("Episodes: " + _truncate(episode_ranges(digest.episodes), token_budget // 10))
+    if digest.tags:
+        header.append("Tags: " + ", ".join(digest.tags[:MAX_TAGS]))
+    remaining = token_budget - estimate_tokens("\n".join(header)) - 8
+
+    candidates = [(rank_moment(text, True), "peak", i, text) for i, text in enumerate(digest.peak_moments)]
+    candidates += [(rank_moment(text, False), "story", i, text) for i, text in enumerate(digest.story)]
+    # Stable sort: ties keep peak moments first, then log order
+    candidates.sort(key=lambda item: -item[0])
+
+    chosen: dict[str, dict[int, str]] = {"peak": {}, "story": {}}
+    for _, kind, index, text in candidates:
+        cost = estimate_tokens(text) + 1
+        if cost > remaining:
+            if not chosen["peak"] and not chosen["story"] and remaining > 0:
+                # A single oversized line still gets in, cut to what is left
+                chosen[kind][index] = _truncate(text, remaining)
+                remaining = 0
+            continue
+        chosen[kind][index] = text
+        remaining -= cost
+
+    sections = list(header)
+    story = [chosen["story"][i] for i in sorted(chosen["story"])]
+    peaks = [chosen["peak"][i] for i in sorted(chosen["peak"])]
+    if story:
+        sections.append("Episode Summary: " + " ".join(story))
+    if peaks:
+        sections.append("Peak Moments:\n" + "\n".join(f"- {moment}" for moment in peaks))
+    return "\n".join(sections)
+
+
+def prepare_episode_input(text: str, token_budget: int) -> str:
+    """
+    The Structurer's input for a pasted log. Clean inputs that already fit
+    the budget are passed through unchanged.
+    """
+    digest = parse_episode_log(io.StringIO(text))
+    if not (digest.dropped or digest.duplicates or digest.rewritten) and estimate_tokens(text) <= token_budget:
+        return text
+    return build_structurer_input(digest, token_budget)
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import math
+import os
+import random
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+FILLER = (
+    "the queen hides the letter while the palace sleeps and her brother swears revenge "
+    "before dawn a stranger reveals the truth that nobody in the family expected"
+).split()
+
+
+class FakeModelError(Exception):
+    """Stand-in for an upstream failure (quota, 5xx) raised at the configured error rate."""
+
+
+@dataclass
+class LatencyDistribution:
+    """
+    Seconds per call, from a spec such as `fixed:0.5`, `uniform:0.2:1.5` or
+    `lognormal:0.8:0.5` (median seconds, sigma).
+    """
+    kind: str = "lognormal"
+    a: float = 0.8
+    b: float = 0.5
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, *params = spec.split(":")
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        values = [float(p) for p in params]
+        return cls(kind, values[0] if values else 0.0, values[1] if len(values) > 1 else 0.0)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        return self.a * math.exp(rng.gauss(0.0, self.b))
+
+
+@dataclass
+class FakeModelConfig:
+    latency: LatencyDistribution
+    error_rate: float = 0.0
+    response_words: int = 80
+    # Streamed responses are split into chunks of this many words
+    chunk_words: int = 4
+    seed: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "FakeModelConfig":
+        seed = os.getenv("FAKE_MODEL_SEED")
+        return cls(
+            latency=LatencyDistribution.parse(os.getenv("FAKE_MODEL_LATENCY", "lognormal:0.8:0.5")),
+            error_rate=float(os.getenv("FAKE_MODEL_ERROR_RATE", "0")),
+            response_words=int(os.getenv("FAKE_MODEL_RESPONSE_WORDS", "80")),
+            chunk_words=int(os.getenv("FAKE_MODEL_CHUNK_WORDS", "4")),
+            seed=int(seed) if seed else None,
+        )
+
+
+def _usage(prompt: str, text: str) -> SimpleNamespace:
+    prompt_tokens, response_tokens = len(prompt) // 4, len(text) // 4
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=response_tokens,
+        total_token_count=prompt_tokens + response_tokens,
+    )
+
+
+def _response(text: str, usage=None, candidates: list[str] | None = None) -> SimpleNamespace:
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=usage,
+        candidates=[
+            SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=candidate)]))
+            for candidate in (candidates if candidates is not None else [text])
+        ],
+    )
+
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel (GEMINI_BACKEND=fake). Answers
+    after a sampled latency with filler text of the configured size, or with
+    an instance of the response schema in JSON mode, and fails at the
+    configured error rate. Supports stream=True and candidate_count.
+    """
+
+    def __init__(self, model_name: str, system_instruction: str = "", generation_config: dict | None = None,
+                 config: FakeModelConfig | None = None):
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self.generation_config = generation_config or {}
+        self.config = config or FakeModelConfig.from_env()
+        # Each agent gets its own stream of samples, reproducible when a seed is set
+        self.rng = random.Random(None if self.config.seed is None else f"{self.config.seed}:{system_instruction}")
+
+    def _words(self, count: int) -> str:
+        return " ".join(self.rng.choice(FILLER) for _ in range(max(count, 1)))
+
+    def _instance(self, schema: dict):
+        if "enum" in schema:
+            return self.rng.choice(schema["enum"])
+        kind = schema.get("type")
+        if kind == "object":
+            return {name: self._instance(prop) for name, prop in schema.get("properties", {}).items()}
+        if kind == "array":
+            return [self._instance(schema["items"]) for _ in range(2)]
+        if kind == "integer":
+            return self.rng.randint(1, 5)
+        if kind == "number":
+            return round(self.rng.random(), 2)
+        if kind == "boolean":
+            return self.rng.random() < 0.5
+        return self._words(min(self.config.response_words, 12))
+
+    def _text(self, generation_config: dict) -> str:
+        schema = generation_config.get("response_schema")
+        if schema and generation_config.get("response_mime_type") == "application/json":
+            return json.dumps(self._instance(schema), ensure_ascii=False)
+        return self._words(self.config.response_words)
+
+    async def generate_content_async(self, contents, generation_config: dict | None = None, stream: bool = False):
+        config = {**self.generation_config, **(generation_config or {})}
+        await asyncio.sleep(self.config.latency.sample(self.rng))
+        if self.rng.random() < self.config.error_rate:
+            raise FakeModelError("503 fake upstream unavailable")
+
+        prompt = f"{self.system_instruction}\n{contents}"
+        if stream:
+            return self._stream(prompt, self._text(config))
+        texts = [self._text(config) for _ in range(int(config.get("candidate_count", 1)))]
+        return _response(texts[0], _usage(prompt, "".join(texts)), texts)
+
+    async def _stream(self, prompt: str, text: str):
+        words = text.split(" ")
+        size = max(self.config.chunk_words, 1)
+        # Time to first chunk is the sampled latency; the rest trickles in
+        gap = self.config.latency.a / max(len(words) // size, 1) / 10
+        for start in range(0, len(words), size):
+            last = start + size >= len(words)
+            chunk = " ".join(words[start:start + size]) + ("" if last else " ")
+            yield _response(chunk, _usage(prompt, text) if last else None)
+            if not last:
+                await asyncio.sleep(gap)
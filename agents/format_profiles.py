@@ -0,0 +1,132 @@
+import re
+from dataclasses import dataclass
+
+# Bump when any profile text changes so cached/stored outputs can be told apart.
+PROFILE_LIBRARY_VERSION = "2026.1"
+
+SINGLE_SPEAKER = "Single-Speaker"
+MULTI_SPEAKER = "Multi-Speaker"
+
+# Multi-Speaker: a big revelation, a confrontation or dialogue worth re-enacting.
+DIALOGUE_SIGNALS = (
+    "stun", "reveal", "expose", "confront", "shout", "slap", "argue", "argument", "fight",
+    "tells", "says", "asks", "accuse", "caught", "phone call", "truth", "face to face",
+    "खुलासा", "सच", "बोल", "कहा", "थप्पड़",
+)
+# Single-Speaker rant: an inner vow, revenge or a conspiracy told by one voice.
+VOW_SIGNALS = (
+    "vow", "swear", "oath", "revenge", "plot", "plan", "scheme", "conspir", "secretly",
+    "behind her back", "behind his back", "betray", "kasam", "badla",
+    "कसम", "बदला", "साजिश", "षड्यंत्र",
+)
+
+VIBE_SIGNALS = {
+    "shock": ("shock laga ke", "shock", "twist", "unbelievable", "jhatka"),
+    "romance": ("romance", "love", "pyaar", "pyar", "wedding", "shaadi"),
+    "comedy": ("comedy", "funny", "hasi", "masti", "laugh"),
+    "drama": ("drama bhar ke", "drama", "emotional", "family", "betrayal"),
+}
+
+SPEAKER_PROFILES = {
+    (SINGLE_SPEAKER, "drama"): (
+        "[Speaker 0]: Breathless gossip-aunty narrator. Fast, rising pitch, dramatic pauses before every "
+        "reveal, treats the listener like a neighbour over the balcony."
+    ),
+    (SINGLE_SPEAKER, "shock"): (
+        "[Speaker 0]: 'Leaked audio' whistle-blower. Hushed and urgent at first, then bursts into "
+        "disbelief on the twist; very fast delivery with sharp stops."
+    ),
+    (SINGLE_SPEAKER, "romance"): (
+        "[Speaker 0]: Filmy best-friend narrator. Warm and teasing, slows down on the romantic beat, "
+        "then speeds up with excitement for the cliffhanger."
+    ),
+    (SINGLE_SPEAKER, "comedy"): (
+        "[Speaker 0]: Stand-up style ranter. Punchy, sarcastic, quick timing, laughs at his own lines "
+        "and lands every analogy like a punchline."
+    ),
+    (SINGLE_SPEAKER, "default"): (
+        "[Speaker 0]: High-energy storyteller. Fast, gossipy and dramatic, with a mind-blown opening "
+        "and a pause before the final hook."
+    ),
+    (MULTI_SPEAKER, "drama"): (
+        "[Speaker 0]: Frantic caller who just saw everything; fast and breathless. "
+        "[Speaker 1]: Disbelieving friend who keeps interrupting with 'Kya?!'; slower, rising outrage."
+    ),
+    (MULTI_SPEAKER, "shock"): (
+        "[Speaker 0]: Whispering insider leaking the twist; urgent, clipped sentences. "
+        "[Speaker 1]: Friend whose shock escalates line by line; loud, incredulous."
+    ),
+    (MULTI_SPEAKER, "romance"): (
+        "[Speaker 0]: Hopeless romantic gushing about the couple; dreamy, quick. "
+        "[Speaker 1]: Cynical friend teasing back; dry, then won over by the reveal."
+    ),
+    (MULTI_SPEAKER, "comedy"): (
+        "[Speaker 0]: Over-dramatic narrator exaggerating everything; fast, loud. "
+        "[Speaker 1]: Deadpan friend puncturing the drama with one-liners; slow, flat."
+    ),
+    (MULTI_SPEAKER, "default"): (
+        "[Speaker 0]: Excited gossip starter; fast and dramatic. "
+        "[Speaker 1]: Reacting friend who heightens every beat; rising energy, quick back-and-forth."
+    ),
+}
+
+
+@dataclass
+class FormatDecision:
+    format: str
+    vibe: str
+    confidence: float
+    reason: str
+
+
+def _count(text: str, signals: tuple[str, ...]) -> int:
+    return sum(text.count(signal) for signal in signals)
+
+
+def detect_vibe(text: str) -> str:
+    lowered = text.lower()
+    scores = {vibe: _count(lowered, signals) for vibe, signals in VIBE_SIGNALS.items()}
+    vibe, score = max(scores.items(), key=lambda item: item[1])
+    return vibe if score else "default"
+
+
+def route_format(structure: str) -> FormatDecision:
+    """
+    Picks the ad format from dialogue/revelation vs vow/conspiracy signals.
+    Confidence is the signal margin, damped when there is little evidence.
+    """
+    lowered = structure.lower()
+    dialogue = _count(lowered, DIALOGUE_SIGNALS) + lowered.count('"') // 2
+    vow = _count(lowered, VOW_SIGNALS)
+    vibe = detect_vibe(structure)
+
+    if dialogue == vow:
+        return FormatDecision(MULTI_SPEAKER, vibe, 0.0, "No clear signal either way")
+    total = dialogue + vow
+    confidence = abs(dialogue - vow) / (total + 1)
+    if dialogue > vow:
+        return FormatDecision(
+            MULTI_SPEAKER, vibe, confidence,
+            f"Revelation/dialogue signals dominate ({dialogue} vs {vow} vow/conspiracy)",
+        )
+    return FormatDecision(
+        SINGLE_SPEAKER, vibe, confidence,
+        f"Vow/conspiracy signals dominate ({vow} vs {dialogue} revelation/dialogue)",
+    )
+
+
+FORMAT_LINE = re.compile(r"(Single|Multi)[\s-]*Speaker", re.IGNORECASE)
+VIBE_LINE = re.compile(r"^Vibe:\s*(\w+)", re.IGNORECASE | re.MULTILINE)
+
+
+def parse_format(text: str) -> str | None:
+    """The first format named in a router answer, local or LLM."""
+    match = FORMAT_LINE.search(text)
+    if not match:
+        return None
+    return MULTI_SPEAKER if match.group(1).lower() == "multi" else SINGLE_SPEAKER
+
+
+def speaker_profile(ad_format: str, vibe: str) -> str:
+    profile = SPEAKER_PROFILES.get((ad_format, vibe)) or SPEAKER_PROFILES[(ad_format, "default")]
+    return f"{profile}\n(Profile library v{PROFILE_LIBRARY_VERSION}: {ad_format} / {vibe})"
@@ -0,0 +1,314 @@
+import asyncio
+import itertools
+import os
+import time
+import logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from agents.call_context import PRIORITIES, RunProgress, current_call_options, run_progress
+from agents.metrics import QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """True for 429/503 responses, the signals the governor backs off on."""
+    if getattr(error, "code", None) in (429, 503):
+        return True
+    # Imported here: the Gemini SDK stays out of the server's import path (see base.configure_gemini)
+    from google.api_core import exceptions as google_exceptions
+
+    return isinstance(error, (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+    ))
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, rate: float) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, rate_factor: float = 1.0) -> float:
+        """Seconds until `amount` is available at the scaled rate (0 if available now)."""
+        rate = self.rate * rate_factor
+        self._refill(rate)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """Credits (positive) or debits (negative) tokens after the real cost is known."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class GovernorSlot:
+    def __init__(self, governor: "GeminiGovernor", estimated_tokens: int):
+        self._governor = governor
+        self.estimated_tokens = estimated_tokens
+
+    def record_usage(self, response) -> None:
+        """Settles the token bucket with the real usage reported by the model."""
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage else None
+        if total:
+            self._governor.tokens.adjust(self.estimated_tokens - total)
+
+
+def parse_weights(spec: str) -> dict[str, float]:
+    """`acme=3,beta=1` -> {"acme": 3.0, "beta": 1.0}"""
+    weights = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, weight = item.split("=", 1)
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+@dataclass
+class Waiter:
+    priority: str
+    tenant: str
+    # The pipeline run the call belongs to; read when ranking, as it advances while the call waits
+    run: RunProgress | None
+    estimated_tokens: int
+    # Weighted fair queuing: the call's virtual start and finish on its tenant's clock
+    start_tag: float
+    finish_tag: float
+    seq: int
+    queued_at: float = field(default_factory=time.monotonic)
+    future: asyncio.Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+
+
+class GeminiGovernor:
+    """
+    Process-wide admission control for Gemini calls.
+
+    A call is admitted once a request token, enough prompt+response tokens and
+    an in-flight slot are available. Waiting calls are admitted in this order:
+
+    1. priority class (interactive before batch); a batch call that has waited
+       `starvation_seconds` competes as interactive,
+    2. calls of runs that have finished more stages first, so runs that are
+       well under way finish before new ones take capacity,
+    3. weighted fair queuing across tenants (`tenant_weights`); within a
+       tenant that is arrival order, so an older run goes before a newer one
+       that has got as far.
+
+    429/503 responses halve the effective rate and concurrency (multiplicative
+    decrease); every success restores a little of it (additive increase).
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = 60,
+        tokens_per_minute: float = 1_000_000,
+        max_in_flight: int = 8,
+        min_rate_factor: float = 0.05,
+        increase_step: float = 0.02,
+        decrease_cooldown: float = 1.0,
+        tenant_weights: dict[str, float] | None = None,
+        starvation_seconds: float = 30.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute / 60.0, max(1.0, requests_per_minute / 60.0 * 5))
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 6.0)
+        self.max_in_flight = max_in_flight
+        self.min_rate_factor = min_rate_factor
+        self.increase_step = increase_step
+        self.decrease_cooldown = decrease_cooldown
+
+        self.tenant_weights = tenant_weights or {}
+        self.starvation_seconds = starvation_seconds
+
+        self.rate_factor = 1.0
+        self._last_decrease = 0.0
+        self._waiters: list[Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._tenant_finish: dict[str, float] = {}
+        self._wake: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.admitted = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.class_stats = {priority: {"admitted": 0, "total_wait": 0.0, "max_wait": 0.0} for priority in PRIORITIES}
+
+    @classmethod
+    def from_env(cls) -> "GeminiGovernor":
+        return cls(
+            requests_per_minute=float(os.getenv("GEMINI_RPM_LIMIT", "60")),
+            tokens_per_minute=float(os.getenv("GEMINI_TPM_LIMIT", "1000000")),
+            max_in_flight=int(os.getenv("GEMINI_MAX_IN_FLIGHT", "8")),
+            tenant_weights=parse_weights(os.getenv("GEMINI_TENANT_WEIGHTS", "")),
+            starvation_seconds=float(os.getenv("GEMINI_BATCH_STARVATION_SECONDS", "30")),
+        )
+
+    @property
+    def in_flight_limit(self) -> int:
+        return max(1, int(self.max_in_flight * self.rate_factor))
+
+    def _enqueue(self, estimated_tokens: int) -> Waiter:
+        options = current_call_options()
+        # Each tenant's calls advance its own virtual clock by cost / weight
+        weight = self.tenant_weights.get(options.tenant, 1.0)
+        start = max(self._virtual_time, self._tenant_finish.get(options.tenant, 0.0))
+        finish = start + max(estimated_tokens, 1) / weight
+        self._tenant_finish[options.tenant] = finish
+        waiter = Waiter(
+            options.priority, options.tenant, run_progress.get(), estimated_tokens, start, finish, next(self._seq)
+        )
+        self._waiters.append(waiter)
+        return waiter
+
+    def _rank(self, waiter: Waiter, now: float) -> tuple:
+        priority = PRIORITIES.index(waiter.priority)
+        if now - waiter.queued_at >= self.starvation_seconds:
+            priority = 0
+        completed = waiter.run.completed if waiter.run is not None else 0
+        return priority, -completed, waiter.finish_tag, waiter.seq
+
+    def _ensure_dispatcher(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._wake = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch())
+        self._wake.set()
+
+    async def _dispatch(self) -> None:
+        """Admits the best-ranked waiter whenever capacity allows; runs while calls are queued."""
+        while True:
+            self._waiters = [w for w in self._waiters if not w.future.done()]
+            if not self._waiters:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if self.in_flight >= self.in_flight_limit:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            now = time.monotonic()
+            waiter = min(self._waiters, key=lambda w: self._rank(w, now))
+            wait = max(
+                self.requests.wait_time(1, self.rate_factor),
+                self.tokens.wait_time(waiter.estimated_tokens, self.rate_factor),
+            )
+            if wait > 0:
+                # A more urgent call arriving meanwhile is ranked again on wake-up
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=wait)
+                except TimeoutError:
+                    pass
+                continue
+
+            self._waiters.remove(waiter)
+            self.requests.take(1)
+            self.tokens.take(waiter.estimated_tokens)
+            self.in_flight += 1
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            waiter.future.set_result(None)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        if self._wake is not None:
+            self._wake.set()
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int) -> AsyncIterator[GovernorSlot]:
+        self.queue_depth += 1
+        waiter = self._enqueue(estimated_tokens)
+        self._ensure_dispatcher()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as the caller gave up; hand the slot back
+                self._release()
+            raise
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - waiter.queued_at
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        by_class = self.class_stats[waiter.priority]
+        by_class["admitted"] += 1
+        by_class["total_wait"] += waited
+        by_class["max_wait"] = max(by_class["max_wait"], waited)
+        QUEUE_WAIT.labels(waiter.priority).observe(waited)
+        if waited > 1.0:
+            logger.info(
+                f"GeminiGovernor: {waiter.priority} call admitted after {waited:.2f}s (in flight: {self.in_flight})"
+            )
+
+        try:
+            yield GovernorSlot(self, estimated_tokens)
+        except Exception as e:
+            if is_throttle_error(e):
+                self._decrease()
+            raise
+        else:
+            self.rate_factor = min(1.0, self.rate_factor + self.increase_step)
+        finally:
+            self._release()
+
+    def _decrease(self) -> None:
+        self.throttled += 1
+        now = time.monotonic()
+        # Calls already in flight when the quota ran out fail together; count that burst once
+        if now - self._last_decrease < self.decrease_cooldown:
+            return
+        self._last_decrease = now
+        self.rate_factor = max(self.min_rate_factor, self.rate_factor / 2)
+        logger.warning(f"GeminiGovernor: throttled by upstream, rate factor now {self.rate_factor:.2f}")
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "in_flight_limit": self.in_flight_limit,
+            "queue_depth": self.queue_depth,
+            "admitted": self.admitted,
+            "throttled": self.throttled,
+            "rate_factor": round(self.rate_factor, 3),
+            "avg_wait_seconds": round(self.total_wait / self.admitted, 4) if self.admitted else 0.0,
+            "max_wait_seconds": round(self.max_wait, 4),
+            "classes": {
+                priority: {
+                    "queued": sum(1 for w in self._waiters if w.priority == priority and not w.future.done()),
+                    "admitted": stats["admitted"],
+                    "avg_wait_seconds": round(stats["total_wait"] / stats["admitted"], 4) if stats["admitted"] else 0.0,
+                    "max_wait_seconds": round(stats["max_wait"], 4),
+                }
+                for priority, stats in self.class_stats.items()
+            },
+        }
+
+
+_governor: GeminiGovernor | None = None
+
+
+def get_governor() -> GeminiGovernor:
+    global _governor
+    if _governor is None:
+        _governor = GeminiGovernor.from_env()
+    return _governor
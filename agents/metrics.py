@@ -0,0 +1,94 @@
+import asyncio
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.exposition import choose_encoder
+
+from agents.call_context import current_call_options
+
+# Gemini calls sit in the 0.3-30 s range; stages add local work on top
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+STAGE_LATENCY = Histogram(
+    "pipeline_stage_duration_seconds", "Time spent in one pipeline stage", ["stage", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+STAGE_FALLBACKS = Counter(
+    "pipeline_stage_fallbacks_total", "Stages that ended with their fallback text", ["stage", "reason"],
+)
+PIPELINE_IN_FLIGHT = Gauge("pipeline_runs_in_flight", "Pipeline tasks being executed by PipelineHost")
+
+GEMINI_LATENCY = Histogram(
+    "gemini_call_duration_seconds", "Latency of one Gemini call attempt", ["agent", "kind"],
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_TOKENS = Histogram(
+    "gemini_tokens", "Token counts reported in Gemini usage metadata", ["agent", "direction"],
+    buckets=TOKEN_BUCKETS,
+)
+GEMINI_ERRORS = Counter("gemini_call_errors_total", "Failed Gemini call attempts", ["agent", "error"])
+QUEUE_WAIT = Histogram(
+    "gemini_queue_wait_seconds", "Time a Gemini call waited for governor admission", ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+)
+GEMINI_IN_FLIGHT = Gauge("gemini_calls_in_flight", "Gemini calls currently waiting on the model", ["agent"])
+
+
+def trace_exemplar() -> dict[str, str] | None:
+    """Links a histogram sample to the request's trace id (OpenMetrics exemplars)."""
+    trace_id = current_call_options().trace_id
+    return {"trace_id": trace_id} if trace_id else None
+
+
+@contextmanager
+def track_gemini_call(agent: str, kind: str):
+    """
+    Times one Gemini call attempt. Failures are counted by exception type;
+    cancellations (hedge losers, callers that gave up) are neither errors nor samples.
+    """
+    started = time.monotonic()
+    with GEMINI_IN_FLIGHT.labels(agent).track_inprogress():
+        try:
+            yield
+        except (asyncio.CancelledError, GeneratorExit):
+            raise
+        except BaseException as e:
+            GEMINI_ERRORS.labels(agent, type(e).__name__).inc()
+            raise
+    GEMINI_LATENCY.labels(agent, kind).observe(time.monotonic() - started, exemplar=trace_exemplar())
+
+
+def observe_usage(agent: str, response) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for direction, field in (("prompt", "prompt_token_count"), ("response", "candidates_token_count")):
+        count = getattr(usage, field, None)
+        if count:
+            GEMINI_TOKENS.labels(agent, direction).observe(count)
+
+
+def metrics_payload(accept: str | None = None) -> tuple[bytes, str]:
+    """Body and content type for a /metrics scrape; OpenMetrics scrapers also get trace exemplars."""
+    encoder, content_type = choose_encoder(accept or "")
+    return encoder(REGISTRY), content_type
+
+
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served, streams until their last byte", ["app"])
+
+
+class InFlightMiddleware:
+    """ASGI middleware keeping HTTP_IN_FLIGHT for one app; scrapes of /metrics are not counted."""
+
+    def __init__(self, app, name: str):
+        self.app = app
+        self.gauge = HTTP_IN_FLIGHT.labels(name)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        with self.gauge.track_inprogress():
+            await self.app(scope, receive, send)
@@ -0,0 +1,237 @@
+import asyncio
+import math
+import os
+import time
+import logging
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class LatencyHistogram:
+    """Latencies of the last `window` successful calls."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> float | None:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class HedgedCall:
+    """One attempt of a hedged call, which reports when the governor admitted it."""
+
+    def __init__(self):
+        self.admitted_at: float | None = None
+        self._admitted = asyncio.Event()
+
+    def admit(self) -> None:
+        self.admitted_at = time.monotonic()
+        self._admitted.set()
+
+
+class Hedger:
+    """
+    Hedged calls: if a call has not finished after the `percentile` latency of
+    recent calls, an identical call is started and whichever succeeds first
+    wins; the other is cancelled.
+
+    Latency is upstream latency: it is timed from the moment an attempt is
+    admitted (HedgedCall.admit), so time queued behind the governor counts
+    neither towards the percentile nor towards the hedge delay, and a call
+    still waiting for admission is never hedged.
+
+    Hedges are paid for from a budget that grows by `max_rate` per call, so at
+    most that fraction of calls is ever duplicated.
+    """
+
+    def __init__(self, percentile: float = 95.0, min_samples: int = 20, max_rate: float = 0.05, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.max_rate = max_rate
+        self.latency = LatencyHistogram(window)
+        self._budget = 1.0
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls) -> "Hedger":
+        return cls(
+            percentile=float(os.getenv("GEMINI_HEDGE_PERCENTILE", "95")),
+            min_samples=int(os.getenv("GEMINI_HEDGE_MIN_SAMPLES", "20")),
+            max_rate=float(os.getenv("GEMINI_HEDGE_MAX_RATE", "0.05")),
+        )
+
+    def hedge_delay(self) -> float | None:
+        """How long to wait before hedging, or None while there is too little history."""
+        if self.max_rate <= 0 or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(self.percentile)
+
+    async def _timed(self, call: Callable[[HedgedCall], Awaitable[T]], attempt: HedgedCall) -> T:
+        result = await call(attempt)
+        if attempt.admitted_at is not None:
+            self.latency.record(time.monotonic() - attempt.admitted_at)
+        return result
+
+    async def run(self, call: Callable[[HedgedCall], Awaitable[T]]) -> T:
+        self.calls += 1
+        self._budget = min(self._budget + self.max_rate, 1.0 + self.max_rate)
+        delay = self.hedge_delay()
+        first = HedgedCall()
+        primary = asyncio.create_task(self._timed(call, first))
+        tasks = {primary}
+        try:
+            if delay is None:
+                return await primary
+            admitted = asyncio.create_task(first._admitted.wait())
+            try:
+                await asyncio.wait({primary, admitted}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                admitted.cancel()
+            if primary.done():
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=max(delay - (time.monotonic() - first.admitted_at), 0.0))
+            if done or self._budget < 1.0:
+                return await primary
+
+            self._budget -= 1.0
+            self.hedges += 1
+            logger.info(f"Hedger: call exceeded p{self.percentile:g} ({delay:.2f}s), sending a hedge")
+            hedge = asyncio.create_task(self._timed(call, HedgedCall()))
+            tasks.add(hedge)
+            error: BaseException | None = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "samples": len(self.latency),
+            "hedge_after_seconds": self.hedge_delay(),
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive upstream failures. While open,
+    calls fail immediately with CircuitOpenError; after `reset_timeout` one
+    trial call is let through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_running = False
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            failure_threshold=int(os.getenv("GEMINI_CIRCUIT_FAILURES", "5")),
+            reset_timeout=float(os.getenv("GEMINI_CIRCUIT_RESET_SECONDS", "30")),
+        )
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def check(self) -> None:
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(f"{self.name}: upstream degraded, circuit open")
+
+    def record_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"CircuitBreaker[{self.name}]: trial call succeeded, closing circuit")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self._trial_running or self.failures >= self.failure_threshold:
+            if self.opened_at is None or self._trial_running:
+                logger.warning(f"CircuitBreaker[{self.name}]: {self.failures} failures in a row, opening circuit")
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def release_trial(self) -> None:
+        """A trial call that ended without an upstream verdict (cancelled, deadline)."""
+        self._trial_running = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+# Per-agent state, shared by every executor instance of the same agent class
+_hedgers: dict[str, Hedger] = {}
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_hedger(name: str) -> Hedger | None:
+    """The agent's hedger, or None when GEMINI_HEDGE_ENABLED=false."""
+    if os.getenv("GEMINI_HEDGE_ENABLED", "true").lower() != "true":
+        return None
+    if name not in _hedgers:
+        _hedgers[name] = Hedger.from_env()
+    return _hedgers[name]
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    if name not in _breakers:
+        _breakers[name] = CircuitBreaker.from_env(name)
+    return _breakers[name]
+
+
+def resilience_stats() -> dict:
+    return {
+        name: {
+            **({"hedging": _hedgers[name].stats()} if name in _hedgers else {}),
+            **({"circuit": _breakers[name].stats()} if name in _breakers else {}),
+        }
+        for name in sorted({*_hedgers, *_breakers})
+    }
@@ -1,13 +1,16 @@
 from agents.base import GeminiAgentExecutor
-from a2a.server.agent_execution import RequestContext
-from a2a.server.events import EventQueue
-from a2a.utils.message import new_agent_text_message
-from a2a.utils.task import completed_task
+from agents.format_profiles import MULTI_SPEAKER, parse_format, route_format
+from agents.structured_output import parse_output
+from api.schemas import SpeakerDecision
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 class RouterAgent(GeminiAgentExecutor):
+    cacheable = True
+    response_model = SpeakerDecision
+
     def __init__(self):
         system_instruction = """
         You are an ad script format selector for KukuTV.
@@ -21,6 +24,33 @@ class RouterAgent(GeminiAgentExecutor):
         - If there is a big revelation or dialogue (like "Nalin stuns everyone"), Multi-Speaker is preferred.
         - If it's a deep internal vow or conspiracy, Single-Speaker Rant works better.
         
-        Output: [Selected Format] and a brief reason.
+        Output: the selected format and a brief reason.
         """
         super().__init__(system_instruction=system_instruction)
+        self.confidence_threshold = float(os.getenv("ROUTER_LOCAL_CONFIDENCE", "0.6"))
+
+    async def run_logic(self, user_input: str) -> str:
+        """
+        Returns a SpeakerDecision as JSON. Decides locally when the structure is
+        clear enough; asks the model otherwise.
+        """
+        local = route_format(user_input)
+        if local.confidence >= self.confidence_threshold:
+            logger.info(f"RouterAgent: local decision {local.format} (confidence {local.confidence:.2f})")
+            decision = SpeakerDecision(
+                format=local.format,
+                reason=f"{local.reason} (local router)",
+                vibe=local.vibe,
+                confidence=round(local.confidence, 2),
+            )
+            return decision.model_dump_json(exclude_none=True)
+
+        logger.info(f"RouterAgent: local confidence {local.confidence:.2f} below threshold, asking the model")
+        answer = await super().run_logic(user_input)
+        decision = parse_output(SpeakerDecision, answer)
+        if decision is None:
+            logger.warning("RouterAgent: model answer did not match the schema, reading the format from text")
+            decision = SpeakerDecision(format=parse_format(answer) or MULTI_SPEAKER, reason=answer.strip())
+        # The vibe is still detected locally so SpeakerAgent can use its profile library
+        decision.vibe = local.vibe
+        return decision.model_dump_json(exclude_none=True)
@@ -1,13 +1,13 @@
 from agents.base import GeminiAgentExecutor
-from a2a.server.agent_execution import RequestContext
-from a2a.server.events import EventQueue
-from a2a.utils.message import new_agent_text_message
-from a2a.utils.task import completed_task
 import logging
 
 logger = logging.getLogger(__name__)
 
 class ScriptAgent(GeminiAgentExecutor):
+    stream_output = True
+    # A re-run of the same episode must give a fresh script, not a cached one
+    cacheable = False
+
     def __init__(self):
         system_instruction = """
         Act as an expert copywriter for short-form viral promotional videos (Reels/Shorts).
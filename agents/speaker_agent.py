@@ -1,13 +1,15 @@
 from agents.base import GeminiAgentExecutor
-from a2a.server.agent_execution import RequestContext
-from a2a.server.events import EventQueue
-from a2a.utils.message import new_agent_text_message
-from a2a.utils.task import completed_task
+from agents.format_profiles import VIBE_LINE, detect_vibe, parse_format, speaker_profile
+from agents.structured_output import parse_output
+from api.schemas import SpeakerDecision
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 class SpeakerAgent(GeminiAgentExecutor):
+    cacheable = True
+
     def __init__(self):
         system_instruction = """
         You are a casting specialist for viral audio ads.
@@ -20,3 +22,19 @@ class SpeakerAgent(GeminiAgentExecutor):
         Personality should be high-energy, gossipy, or dramatic. Describe their tone and speed.
         """
         super().__init__(system_instruction=system_instruction)
+        self.use_profile_library = os.getenv("SPEAKER_PROFILE_LIBRARY", "true").lower() == "true"
+
+    async def run_logic(self, user_input: str) -> str:
+        """Serves a precomputed profile for the router's format and vibe; the model is the fallback."""
+        decision = parse_output(SpeakerDecision, user_input)
+        if decision is not None:
+            ad_format, vibe = decision.format, decision.vibe or "default"
+        else:
+            # Free-text router answers, e.g. when this agent is called directly over A2A
+            ad_format = parse_format(user_input)
+            match = VIBE_LINE.search(user_input)
+            vibe = match.group(1).lower() if match else detect_vibe(user_input)
+        if self.use_profile_library and ad_format:
+            logger.info(f"SpeakerAgent: using library profile for {ad_format} / {vibe}")
+            return speaker_profile(ad_format, vibe)
+        return await super().run_logic(user_input)
@@ -0,0 +1,57 @@
+import json
+import re
+from typing import TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+# The OpenAPI subset Gemini accepts as `response_schema`; anything else
+# (title, default, minimum, ...) is rejected by the API.
+GEMINI_SCHEMA_KEYS = {"type", "format", "description", "nullable", "enum", "items", "properties", "required"}
+
+CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def _convert(schema: dict, defs: dict) -> dict:
+    if "$ref" in schema:
+        return _convert(defs[schema["$ref"].split("/")[-1]], defs)
+    if "anyOf" in schema:
+        # Optional[X] is the only union the schemas use: X | null
+        options = [option for option in schema["anyOf"] if option.get("type") != "null"]
+        converted = _convert(options[0], defs)
+        converted["nullable"] = True
+        return converted
+
+    converted = {}
+    for key, value in schema.items():
+        if key == "properties":
+            converted[key] = {name: _convert(prop, defs) for name, prop in value.items()}
+        elif key == "items":
+            converted[key] = _convert(value, defs)
+        elif key in GEMINI_SCHEMA_KEYS:
+            converted[key] = value
+    return converted
+
+
+def gemini_schema(model: type[BaseModel]) -> dict:
+    """The model's JSON schema reduced to what Gemini's JSON mode accepts."""
+    schema = model.model_json_schema()
+    return _convert(schema, schema.get("$defs", {}))
+
+
+def parse_output(model: type[T], text: str | None) -> T | None:
+    """
+    Parses a stage output into `model`, or None if it is not valid JSON for it
+    (fallback strings, cached pre-schema answers, a model ignoring JSON mode).
+    """
+    if not text:
+        return None
+    body = CODE_FENCE.sub("", text.strip())
+    start, end = body.find("{"), body.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        return model.model_validate(json.loads(body[start:end + 1]))
+    except (ValueError, ValidationError):
+        return None
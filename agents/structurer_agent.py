@@ -1,13 +1,13 @@
 from agents.base import GeminiAgentExecutor
-from a2a.server.agent_execution import RequestContext
-from a2a.server.events import EventQueue
-from a2a.utils.message import new_agent_text_message
-from a2a.utils.task import completed_task
+from api.schemas import StructuredInput
 import logging
 
 logger = logging.getLogger(__name__)
 
 class StructurerAgent(GeminiAgentExecutor):
+    cacheable = True
+    response_model = StructuredInput
+
     def __init__(self):
         system_instruction = """
         You are a KukuTV Content Analyst. 
@@ -17,7 +17,8 @@ class StructurerAgent(GeminiAgentExecutor):
         1. Identify the Show Title and Character Names (Parul, Naveen, Nalin, etc.).
         2. Extract the Core Conflict (e.g., Baby swap, Betrayal, Revenge).
         3. Identify the vibe/genre from tags like 'Drama Bhar Ke' or 'Shock Laga Ke'.
+        4. List the shock moments / cliffhangers and rate romance, betrayal, comedy and darkness from 0 to 5.
         
-        Output only valid JSON with keys: show_title, characters, core_conflict, vibe, summary.
+        Output only JSON matching the response schema. Keep `summary` to two sentences.
         """
         super().__init__(system_instruction=system_instruction)
@@ -1,22 +1,104 @@
 from agents.base import GeminiAgentExecutor
-from a2a.server.agent_execution import RequestContext
-from a2a.server.events import EventQueue
-from a2a.utils.message import new_agent_text_message
-from a2a.utils.task import completed_task
+from agents.structured_output import parse_output
+from agents.validator_rules import check_script
+from api.schemas import (
+    CandidateReviews, ScriptCandidates, ScriptResult, ScriptVariant, ValidationResult, VariantRanking,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
 class ValidatorAgent(GeminiAgentExecutor):
+    response_model = ValidationResult
+
     def __init__(self):
+        # Length, script and speaker-tag rules are checked locally (agents/validator_rules.py);
+        # the model only judges what needs taste.
         system_instruction = """
         You are a KukuTV Quality Reviewer.
-        Validate the generated script for:
-        1. Script Length: Must be 30s (70-90 words).
-        2. Script Language: Must be Hinglish in DEVANAGARI ONLY. Reject if English characters are used in the dialogue.
-        3. Hook: Must have a high-energy opening.
-        4. Viral Element: Must contain a famous Indian analogy or dialogue.
+        The script has already passed the mechanical checks (70-90 words, Devanagari only, speaker tags).
+        Judge only:
+        1. Hook: Must have a high-energy opening.
+        2. Viral Element: Must contain a famous Indian analogy or dialogue.
         
-        Provide verdict: APPROVED or REJECTED with reasons.
+        Set `valid` to false if either is missing and list what is missing in `issues`.
+        Put any short improvement suggestions in `notes`.
         """
         super().__init__(system_instruction=system_instruction)
+
+    async def validate(self, script: str, multi_speaker: bool | None = None) -> ValidationResult:
+        """Runs the local checks and calls the model only if they all pass."""
+        result = check_script(script, multi_speaker)
+        if not result.valid:
+            logger.info(f"ValidatorAgent: rejected locally ({len(result.issues)} issues), skipping LLM review")
+            return result
+
+        verdict = (await super().run_logic(script)).strip()
+        review = parse_output(ValidationResult, verdict)
+        if review is not None:
+            if not review.valid and not review.issues:
+                review.issues = ["Rejected by reviewer"]
+            return review
+        # A model that ignores JSON mode still tends to answer with a plain verdict
+        if verdict.upper().startswith("REJECTED"):
+            reasons = verdict[len("REJECTED"):].strip(" :-\n")
+            return ValidationResult(valid=False, issues=[reasons or "Rejected by reviewer"])
+        notes = verdict[len("APPROVED"):].strip(" :-\n") if verdict.upper().startswith("APPROVED") else verdict
+        return ValidationResult(valid=True, issues=[], notes=notes or None)
+
+    async def rank(self, scripts: list[str], multi_speaker: bool | None = None) -> list[ScriptVariant]:
+        """
+        Ranks candidate scripts. Every candidate gets the local checks; those
+        that pass are reviewed together in a single model call.
+        """
+        checked = [check_script(script, multi_speaker) for script in scripts]
+        passing = [i for i, result in enumerate(checked) if result.valid]
+        reviews = {}
+        if passing:
+            candidates = "\n\n".join(f"### Candidate {i}\n{scripts[i]}" for i in passing)
+            answer = await self.run_json(
+                "Review each candidate below on its own and score it from 0 to 10. "
+                "Return one review per candidate with its index.\n\n" + candidates,
+                CandidateReviews,
+            )
+            parsed = parse_output(CandidateReviews, answer)
+            if parsed is None:
+                logger.warning("ValidatorAgent: batched review did not match the schema, ranking on local checks only")
+            else:
+                reviews = {review.index: review for review in parsed.reviews if review.index in passing}
+
+        variants = []
+        for i, script in enumerate(scripts):
+            review = reviews.get(i)
+            if not checked[i].valid:
+                variants.append(ScriptVariant(rank=0, script=script, valid=False, issues=checked[i].issues))
+            elif review is None:
+                variants.append(ScriptVariant(rank=0, script=script, valid=True))
+            else:
+                issues = review.issues or ([] if review.valid else ["Rejected by reviewer"])
+                variants.append(ScriptVariant(
+                    rank=0, script=script, valid=review.valid, score=review.score, issues=issues, notes=review.notes,
+                ))
+        # Stable sort keeps generation order among equals
+        variants.sort(key=lambda v: (not v.valid, -(v.score if v.score is not None else -1)))
+        for rank, variant in enumerate(variants, start=1):
+            variant.rank = rank
+        return variants
+
+    async def run_logic(self, user_input: str) -> str:
+        """
+        ValidationResult as JSON for PipelineHost. The input is a ScriptResult,
+        whose format decides the speaker-tag check, or a bare script.
+        ScriptCandidates are ranked instead and answered with a VariantRanking.
+        """
+        candidates = parse_output(ScriptCandidates, user_input)
+        if candidates is not None:
+            ranked = await self.rank(candidates.scripts, multi_speaker=candidates.format == "Multi-Speaker")
+            return VariantRanking(variants=ranked).model_dump_json(exclude_none=True)
+
+        request = parse_output(ScriptResult, user_input)
+        if request is None:
+            result = await self.validate(user_input)
+        else:
+            result = await self.validate(request.script, multi_speaker=request.format == "Multi-Speaker")
+        return result.model_dump_json(exclude_none=True)
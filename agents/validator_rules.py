@@ -0,0 +1,46 @@
+import re
+
+from api.schemas import ValidationResult
+
+MIN_WORDS = 70
+MAX_WORDS = 90
+
+SPEAKER_TAG = re.compile(r"\[\s*Speaker\s*(\d+)\s*\]", re.IGNORECASE)
+LATIN = re.compile(r"[A-Za-z]+")
+
+
+def dialogue_text(script: str) -> str:
+    """The spoken part of a script: speaker tags and markdown headings removed."""
+    lines = [line for line in script.splitlines() if not line.lstrip().startswith("#")]
+    return SPEAKER_TAG.sub(" ", "\n".join(lines))
+
+
+def count_words(text: str) -> int:
+    return sum(1 for token in text.split() if any(ch.isalnum() for ch in token))
+
+
+def check_script(script: str, multi_speaker: bool | None = None) -> ValidationResult:
+    """
+    Mechanical checks from the validator brief: 70-90 words, Devanagari-only
+    dialogue and speaker tags. `multi_speaker=None` infers the format from the
+    tags that are present.
+    """
+    issues = []
+    speakers = {int(n) for n in SPEAKER_TAG.findall(script)}
+    dialogue = dialogue_text(script)
+
+    words = count_words(dialogue)
+    if not MIN_WORDS <= words <= MAX_WORDS:
+        issues.append(f"Script length is {words} words; must be {MIN_WORDS}-{MAX_WORDS} (30 seconds).")
+
+    latin = LATIN.findall(dialogue)
+    if latin:
+        sample = ", ".join(dict.fromkeys(latin[:5]))
+        issues.append(f"Dialogue must be Devanagari only; found English characters: {sample}.")
+
+    if 0 not in speakers:
+        issues.append("Missing `[Speaker 0]` tag.")
+    if multi_speaker and 1 not in speakers:
+        issues.append("Multi-Speaker format requires a `[Speaker 1]` tag.")
+
+    return ValidationResult(valid=not issues, issues=issues)
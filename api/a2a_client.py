@@ -0,0 +1,294 @@
+import asyncio
+import os
+import random
+import time
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import httpx
+
+from a2a.client import A2AClient
+from a2a.client.card_resolver import A2ACardResolver
+from a2a.types import AgentCard
+from a2a.utils.constants import AGENT_CARD_WELL_KNOWN_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class A2AClientPool:
+    """
+    App-lifetime A2A client: one pooled httpx client plus a TTL-cached agent card.
+
+    The card is re-resolved in the background once it is older than `card_ttl`,
+    or synchronously on the next call after `invalidate()` (used on failures).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        card_ttl: float = 300.0,
+        timeout: float = 120.0,
+        max_connections: int = 200,
+        max_keepalive_connections: int = 100,
+        keepalive_expiry: float = 30.0,
+    ):
+        self.base_url = base_url
+        self.card_ttl = card_ttl
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+
+        self._http_client: httpx.AsyncClient | None = None
+        self._client: A2AClient | None = None
+        self._card: AgentCard | None = None
+        self._card_fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> "A2AClientPool":
+        port = os.getenv("A2A_SERVER_PORT", "9999")
+        return cls(
+            base_url=f"http://localhost:{port}/",
+            card_ttl=float(os.getenv("A2A_CARD_TTL_SECONDS", "300")),
+            timeout=float(os.getenv("A2A_TIMEOUT_SECONDS", "120")),
+            max_connections=int(os.getenv("A2A_POOL_MAX_CONNECTIONS", "200")),
+            max_keepalive_connections=int(os.getenv("A2A_POOL_MAX_KEEPALIVE", "100")),
+            keepalive_expiry=float(os.getenv("A2A_POOL_KEEPALIVE_EXPIRY", "30")),
+        )
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        if self._http_client is None:
+            raise RuntimeError("A2AClientPool has not been started")
+        return self._http_client
+
+    async def start(self) -> None:
+        """Opens the connection pool and tries to warm the agent card."""
+        self._http_client = httpx.AsyncClient(timeout=self.timeout, limits=self.limits)
+        try:
+            await self._refresh()
+        except Exception as e:
+            # The A2A server may come up after us; the first request will retry.
+            logger.warning(f"A2AClientPool: initial agent card fetch failed: {str(e)}")
+
+    async def close(self) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._http_client = None
+        self._client = None
+        self._card = None
+
+    async def get_client(self) -> A2AClient:
+        """Returns the shared client, resolving the agent card only when needed."""
+        if self._client is None:
+            async with self._lock:
+                if self._client is None:
+                    await self._refresh()
+        elif time.monotonic() - self._card_fetched_at > self.card_ttl:
+            self._schedule_refresh()
+        return self._client
+
+    def invalidate(self) -> None:
+        """Drops the cached card/client so the next call re-resolves it."""
+        logger.info("A2AClientPool: invalidating cached agent card")
+        self._client = None
+        self._card = None
+        self._card_fetched_at = 0.0
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self) -> None:
+        try:
+            async with self._lock:
+                await self._refresh()
+        except Exception as e:
+            # Keep serving with the stale card; a failing call will invalidate it.
+            logger.warning(f"A2AClientPool: background card refresh failed: {str(e)}")
+
+    async def _refresh(self) -> None:
+        resolver = A2ACardResolver(httpx_client=self.http_client, base_url=self.base_url)
+        card = await resolver.get_agent_card()
+        # A2AClient is a thin wrapper over the JSON-RPC transport; building it is cheap
+        # once the card is known, so it is rebuilt together with the card. Calls go to
+        # the configured address, not the card's url, which names the server's own view
+        # of itself (localhost for every worker).
+        self._client = A2AClient(httpx_client=self.http_client, agent_card=card, url=self.base_url)
+        self._card = card
+        self._card_fetched_at = time.monotonic()
+        logger.info(f"A2AClientPool: agent card resolved: {card.name}")
+
+
+class Backend:
+    """One A2A server in an A2ABalancer, with its own client pool and health state."""
+
+    def __init__(self, pool: A2AClientPool):
+        self.pool = pool
+        self.outstanding = 0
+        self.ejected_until = 0.0
+        self.failures = 0
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        return self.pool.base_url
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.ejected_until
+
+    def stats(self) -> dict:
+        return {
+            "available": self.available,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "consecutive_failures": self.failures,
+        }
+
+
+class A2ABalancer:
+    """
+    Spreads pipeline calls over several A2A servers (A2A_BACKENDS).
+
+    New calls go to the available backend with the fewest outstanding calls.
+    A backend that fails a call or its agent-card health check is ejected for
+    `eject_seconds` (longer after repeated failures); when every backend is
+    ejected the least recently failed one is still tried. Follow-ups for a task
+    (cancel) go to the backend that runs it.
+    """
+
+    def __init__(
+        self,
+        pools: list[A2AClientPool],
+        health_interval: float = 5.0,
+        health_timeout: float = 2.0,
+        eject_seconds: float = 10.0,
+        max_sticky: int = 10_000,
+    ):
+        if not pools:
+            raise ValueError("A2ABalancer needs at least one backend")
+        self.backends = [Backend(pool) for pool in pools]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.eject_seconds = eject_seconds
+        self.max_sticky = max_sticky
+        self._sticky: OrderedDict[str, Backend] = OrderedDict()
+        self._health_task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> "A2ABalancer":
+        """
+        A2A_BACKENDS is a comma-separated list of base URLs. Without it, the
+        A2A_WORKERS local workers started by a2a_server.py are used, on
+        consecutive ports from A2A_SERVER_PORT.
+        """
+        urls = [url.strip() for url in os.getenv("A2A_BACKENDS", "").split(",") if url.strip()]
+        if not urls:
+            port = int(os.getenv("A2A_SERVER_PORT", "9999"))
+            urls = [f"http://localhost:{port + i}/" for i in range(int(os.getenv("A2A_WORKERS", "1")))]
+        template = A2AClientPool.from_env()
+        pools = [
+            A2AClientPool(
+                base_url=url if url.endswith("/") else url + "/",
+                card_ttl=template.card_ttl,
+                timeout=template.timeout,
+                max_connections=template.limits.max_connections,
+                max_keepalive_connections=template.limits.max_keepalive_connections,
+                keepalive_expiry=template.limits.keepalive_expiry,
+            )
+            for url in urls
+        ]
+        return cls(
+            pools,
+            health_interval=float(os.getenv("A2A_HEALTH_INTERVAL_SECONDS", "5")),
+            eject_seconds=float(os.getenv("A2A_EJECT_SECONDS", "10")),
+        )
+
+    async def start(self) -> None:
+        await asyncio.gather(*(backend.pool.start() for backend in self.backends))
+        if len(self.backends) > 1 and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"A2ABalancer: {len(self.backends)} backend(s): {[b.url for b in self.backends]}")
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+        await asyncio.gather(*(backend.pool.close() for backend in self.backends))
+
+    def pick(self, exclude: set[Backend] | None = None) -> Backend:
+        """The available backend with the fewest outstanding calls (ties broken at random)."""
+        candidates = [b for b in self.backends if b not in (exclude or set())] or self.backends
+        available = [b for b in candidates if b.available]
+        if not available:
+            return min(candidates, key=lambda b: b.ejected_until)
+        fewest = min(b.outstanding for b in available)
+        return random.choice([b for b in available if b.outstanding == fewest])
+
+    @asynccontextmanager
+    async def lease(self, backend: Backend):
+        """Counts a call against `backend` for as long as it is outstanding."""
+        backend.outstanding += 1
+        backend.requests += 1
+        try:
+            yield backend
+        finally:
+            backend.outstanding -= 1
+
+    def bind(self, task_id: str, backend: Backend) -> None:
+        self._sticky[task_id] = backend
+        self._sticky.move_to_end(task_id)
+        while len(self._sticky) > self.max_sticky:
+            self._sticky.popitem(last=False)
+
+    def backend_for(self, task_id: str) -> Backend:
+        """The backend running `task_id`, or a balanced pick for unknown tasks."""
+        backend = self._sticky.get(task_id)
+        return backend if backend is not None else self.pick()
+
+    def record_success(self, backend: Backend) -> None:
+        backend.failures = 0
+        backend.ejected_until = 0.0
+
+    def record_failure(self, backend: Backend) -> None:
+        backend.failures += 1
+        backend.pool.invalidate()
+        if len(self.backends) > 1:
+            # Repeated failures (health checks of a dead backend) back off up to 8x
+            duration = self.eject_seconds * min(2 ** (backend.failures - 1), 8)
+            if backend.available:
+                logger.warning(f"A2ABalancer: ejecting {backend.url} for {duration:.0f}s")
+            backend.ejected_until = time.monotonic() + duration
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await asyncio.gather(*(self._check(backend) for backend in self.backends))
+
+    async def _check(self, backend: Backend) -> None:
+        try:
+            response = await backend.pool.http_client.get(
+                backend.url.rstrip("/") + AGENT_CARD_WELL_KNOWN_PATH, timeout=self.health_timeout
+            )
+            response.raise_for_status()
+        except Exception as e:
+            if backend.available:
+                logger.warning(f"A2ABalancer: health check of {backend.url} failed: {str(e)}")
+            self.record_failure(backend)
+            return
+        if not backend.available or backend.failures:
+            logger.info(f"A2ABalancer: {backend.url} is healthy again")
+        self.record_success(backend)
+
+    def stats(self) -> dict:
+        return {
+            "backends": {backend.url: backend.stats() for backend in self.backends},
+            "sticky_tasks": len(self._sticky),
+        }
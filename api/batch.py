@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Iterable
+
+from api.schemas import BatchItemResult, PipelineEvent, ScriptResponse
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineRunError(Exception):
+    """The pipeline ended with an error event instead of a result."""
+
+
+async def collect_result(events: AsyncIterator[PipelineEvent]) -> ScriptResponse:
+    """Drains a pipeline event stream down to its final result."""
+    async with aclosing(events) as stream:
+        async for event in stream:
+            if event.event == "error":
+                raise PipelineRunError(event.detail or "Pipeline failed")
+            if event.event == "result":
+                return event.result
+    raise PipelineRunError("No output received from agent pipeline")
+
+
+async def run_batch(
+    items: Iterable[tuple[str, str]],
+    run: Callable[[str], AsyncIterator[PipelineEvent]],
+    concurrency: int = 4,
+) -> AsyncIterator[BatchItemResult]:
+    """
+    Runs (id, prompt) items through the pipeline with at most `concurrency` in
+    flight and yields one BatchItemResult per item in completion order. A
+    failing item is reported as an error result and never stops the batch.
+    """
+    pending = iter(items)
+    results: asyncio.Queue[BatchItemResult | None] = asyncio.Queue()
+
+    async def worker() -> None:
+        for item_id, prompt in pending:
+            try:
+                result = await collect_result(run(prompt))
+                await results.put(BatchItemResult(id=item_id, status="ok", result=result))
+            except Exception as e:
+                logger.warning(f"Batch item {item_id} failed: {str(e)}")
+                await results.put(BatchItemResult(id=item_id, status="error", error=str(e)))
+        await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+    try:
+        remaining = len(workers)
+        while remaining:
+            result = await results.get()
+            if result is None:
+                remaining -= 1
+                continue
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import AsyncIterator, Callable
+
+from api.schemas import JobStatus, PipelineEvent
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("succeeded", "failed")
+
+
+class JobQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, prompt: str, metadata: dict):
+        self.id = uuid.uuid4().hex
+        self.prompt = prompt
+        self.metadata = metadata
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        # Progress/result history for late subscribers; token events are only relayed live
+        self.events: list[PipelineEvent] = []
+        # Live subscribers get every event, tokens included, as (sequence number, event)
+        self.subscribers: list[asyncio.Queue] = []
+        self.published = 0
+        self.result = None
+        self.error: str | None = None
+        self.changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def publish(self, event: PipelineEvent) -> None:
+        """Records and relays one event; callers hold `changed`, so subscribers attach between events."""
+        if event.event != "token":
+            self.events.append(event)
+        for subscriber in self.subscribers:
+            subscriber.put_nowait((self.published, event))
+        self.published += 1
+
+    def to_status(self, queue_position: int | None = None) -> JobStatus:
+        progress = next((e.text for e in reversed(self.events) if e.event == "progress" and not e.done), None)
+        return JobStatus(
+            job_id=self.id,
+            status=self.status,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at,
+            queue_position=queue_position,
+            progress=progress,
+            result=self.result,
+            error=self.error,
+        )
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a fixed number of workers behind a bounded queue.
+    Submissions are rejected immediately when the queue is full.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str, dict], AsyncIterator[PipelineEvent]],
+        workers: int = 4,
+        queue_size: int = 100,
+        retention_seconds: float = 3600.0,
+        max_retained: int = 1000,
+        prune_interval: float = 60.0,
+    ):
+        self.run = run
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self.prune_interval = prune_interval
+
+        self._queue: asyncio.Queue[Job] | None = None
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._waiting: list[str] = []
+        self._worker_tasks: list[asyncio.Task] = []
+        self._avg_duration = 30.0
+
+    @classmethod
+    def from_env(cls, run: Callable[[str, dict], AsyncIterator[PipelineEvent]]) -> "JobManager":
+        return cls(
+            run,
+            workers=int(os.getenv("JOB_WORKERS", "4")),
+            queue_size=int(os.getenv("JOB_QUEUE_SIZE", "100")),
+            retention_seconds=float(os.getenv("JOB_RETENTION_SECONDS", "3600")),
+            max_retained=int(os.getenv("JOB_MAX_RETAINED", "1000")),
+            prune_interval=float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "60")),
+        )
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        # Finished jobs expire even while no new jobs are submitted
+        self._worker_tasks.append(asyncio.create_task(self._prune_loop()))
+
+    async def close(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def submit(self, prompt: str, metadata: dict) -> Job:
+        job = Job(prompt, metadata)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(self.retry_after())
+        self._waiting.append(job.id)
+        self._jobs[job.id] = job
+        self._prune()
+        logger.info(f"JobManager: queued job {job.id} (queue depth {self._queue.qsize()})")
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def status(self, job: Job) -> JobStatus:
+        position = self._waiting.index(job.id) + 1 if job.id in self._waiting else None
+        return job.to_status(position)
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        return max(1, int(self._avg_duration / max(1, self.workers)))
+
+    async def wait(self, job: Job, timeout: float) -> None:
+        """Long-poll: returns when the job finishes or the timeout expires."""
+        if timeout <= 0 or job.done:
+            return
+        try:
+            async with job.changed:
+                await asyncio.wait_for(job.changed.wait_for(lambda: job.done), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def events(self, job: Job) -> AsyncIterator[PipelineEvent]:
+        """Replays the job's events so far, then follows it live until it finishes."""
+        live: asyncio.Queue = asyncio.Queue()
+        async with job.changed:
+            history = list(job.events)
+            since = job.published
+            finished = job.done
+            if not finished:
+                job.subscribers.append(live)
+        try:
+            for event in history:
+                yield event
+            if finished:
+                return
+            while True:
+                seq, event = await live.get()
+                if seq < since:
+                    # Already part of the replayed history
+                    continue
+                yield event
+                if event.event in ("result", "error"):
+                    return
+        finally:
+            if live in job.subscribers:
+                job.subscribers.remove(live)
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                logger.error(f"JobManager: worker {number} crashed on job {job.id}: {str(e)}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: Job) -> None:
+        self._waiting.remove(job.id)
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            async with aclosing(self.run(job.prompt, job.metadata)) as events:
+                async for event in events:
+                    async with job.changed:
+                        job.publish(event)
+                        if event.event == "result":
+                            job.result = event.result
+                        elif event.event == "error":
+                            job.error = event.detail
+                        job.changed.notify_all()
+                    if event.event in ("result", "error"):
+                        break
+        except asyncio.CancelledError:
+            job.error = job.error or "Job cancelled (server shutting down)"
+            raise
+        except Exception as e:
+            logger.error(f"JobManager: job {job.id} failed: {str(e)}", exc_info=True)
+            job.error = job.error or str(e)
+        finally:
+            # Whatever happened, the job ends and every waiter and event subscriber is released
+            async with job.changed:
+                if job.result is None and job.error is None:
+                    job.error = "No output received from agent pipeline"
+                if job.result is None and not any(event.event == "error" for event in job.events):
+                    # Event subscribers always see the job end with a terminal event
+                    job.publish(PipelineEvent(event="error", detail=job.error))
+                job.status = "succeeded" if job.result is not None else "failed"
+                job.finished_at = time.time()
+                job.changed.notify_all()
+
+        duration = job.finished_at - job.started_at
+        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        logger.info(f"JobManager: job {job.id} {job.status} in {duration:.2f}s")
+
+    async def _prune_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            self._prune()
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for job_id in list(self._jobs):
+            job = self._jobs[job_id]
+            if len(self._jobs) <= self.max_retained and job.created_at >= cutoff:
+                break
+            if job.done:
+                del self._jobs[job_id]
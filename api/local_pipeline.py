@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import AsyncIterator
+
+from a2a.server.agent_execution import RequestContext
+from a2a.server.events import EventQueue
+from a2a.server.events.event_consumer import EventConsumer
+from a2a.types import MessageSendParams
+
+from api.pipeline_stream import build_message, event_from_result
+from api.schemas import PipelineEvent
+from orchestrator.host import PipelineHost
+
+logger = logging.getLogger(__name__)
+
+
+class LocalPipelineRunner:
+    """
+    Runs PipelineHost inside this process. Events go through an in-memory
+    EventQueue exactly as they would inside the A2A server, minus the JSON-RPC
+    encoding and the localhost hop.
+    """
+
+    def __init__(self, host: PipelineHost | None = None):
+        self.host = host or PipelineHost()
+
+    async def start(self) -> None:
+        logger.info("LocalPipelineRunner: running PipelineHost in-process")
+
+    async def close(self) -> None:
+        pass
+
+    async def stream(self, full_prompt: str, metadata: dict | None = None) -> AsyncIterator[PipelineEvent]:
+        """Yields events as they are produced; always ends with one `result` or `error` event."""
+        context = RequestContext(request=MessageSendParams(message=build_message(full_prompt, metadata)))
+        queue = EventQueue()
+        consumer = EventConsumer(queue)
+
+        async def run() -> None:
+            try:
+                await self.host.execute(context, queue)
+            finally:
+                await queue.close()
+
+        producer = asyncio.create_task(run())
+        producer.add_done_callback(consumer.agent_task_callback)
+        try:
+            async for result in consumer.consume_all():
+                event = event_from_result(result)
+                if event is None:
+                    continue
+                yield event
+                if event.event in ("result", "error"):
+                    return
+            yield PipelineEvent(event="error", detail="No output received from agent pipeline")
+        except Exception as e:
+            logger.error(f"In-process pipeline failed: {str(e)}", exc_info=True)
+            yield PipelineEvent(event="error", detail=str(e))
+        finally:
+            if not producer.done():
+                producer.cancel()
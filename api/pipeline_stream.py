@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+import logging
+from contextlib import aclosing
+from typing import AsyncIterator
+
+from a2a.types import (
+    CancelTaskRequest,
+    SendStreamingMessageRequest,
+    TaskIdParams,
+    MessageSendParams,
+    Message,
+    Part,
+    TextPart,
+    Role,
+    Task,
+    TaskState,
+    TaskStatusUpdateEvent,
+    TaskArtifactUpdateEvent,
+    JSONRPCErrorResponse,
+)
+from a2a.utils.message import get_message_text
+from a2a.utils.artifact import get_artifact_text
+
+from agents.call_context import PRIORITIES
+from api.a2a_client import A2ABalancer
+from api.schemas import PipelineEvent, ScriptResponse
+from api.tracing import TRACE_HEADER
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_PATTERN = re.compile(r"^\[(\d+)/(\d+)\]")
+
+
+def build_prompt(episode_summary: str | None, peak_moments: list[str] | None, prompt: str | None) -> str:
+    if episode_summary and peak_moments:
+        return (
+            f"Episode Summary: {episode_summary}\n"
+            f"Peak Moments: {', '.join(peak_moments)}"
+        )
+    return prompt or "Generic script request"
+
+
+def build_result(final_text: str, metadata: dict | None = None) -> ScriptResponse:
+    """The host reports the chosen format in the final message's metadata."""
+    return ScriptResponse(
+        script=final_text,
+        genre="kukufm_drama",
+        speaker_format=(metadata or {}).get("speaker_format", "single_speaker"),
+        variants=(metadata or {}).get("variants"),
+        stage_seconds=(metadata or {}).get("stage_seconds"),
+    )
+
+
+def event_from_result(result) -> PipelineEvent | None:
+    """Translates one A2A stream result into a client-facing PipelineEvent."""
+    if isinstance(result, Task):
+        return PipelineEvent(event="task", task_id=result.id, state=result.status.state.value)
+
+    if isinstance(result, TaskStatusUpdateEvent):
+        state = result.status.state
+        text = get_message_text(result.status.message) if result.status.message else None
+        if state == TaskState.completed and text:
+            return PipelineEvent(
+                event="result", task_id=result.task_id, state=state.value,
+                result=build_result(text, result.status.message.metadata),
+            )
+        if state in (TaskState.failed, TaskState.rejected, TaskState.canceled):
+            return PipelineEvent(event="error", task_id=result.task_id, state=state.value, detail=text or f"Task {state.value}")
+        if text:
+            meta = result.metadata or {}
+            step, total = meta.get("step"), meta.get("total")
+            match = PROGRESS_PATTERN.match(text)
+            if step is None and match:
+                step, total = int(match.group(1)), int(match.group(2))
+            return PipelineEvent(
+                event="progress", task_id=result.task_id, state=state.value,
+                stage=meta.get("stage"), step=step, total=total, done=meta.get("done"), text=text,
+            )
+        return PipelineEvent(event="status", task_id=result.task_id, state=state.value)
+
+    if isinstance(result, TaskArtifactUpdateEvent):
+        return PipelineEvent(
+            event="token", task_id=result.task_id, stage=result.artifact.name,
+            text=get_artifact_text(result.artifact, delimiter=""),
+            append=bool(result.append), last_chunk=bool(result.last_chunk),
+        )
+
+    if isinstance(result, Message):
+        # A bare Message ends the A2A stream, so it is treated as the final answer
+        text = get_message_text(result)
+        if text.startswith("ERROR:"):
+            return PipelineEvent(event="error", detail=text)
+        return PipelineEvent(event="result", result=build_result(text, result.metadata))
+
+    logger.debug(f"Received event: {type(result).__name__}")
+    return None
+
+
+def request_metadata(headers, variants: int | None = None, priority: str = "interactive") -> dict:
+    """
+    A2A message metadata derived from the client's HTTP request headers and options.
+    `X-Priority: batch|interactive` overrides the endpoint's scheduling class; calls
+    are shared fairly across tenants, named by `X-Tenant-Id` or the caller's API key.
+    """
+    metadata = {"priority": headers.get("x-priority", priority).lower()}
+    if metadata["priority"] not in PRIORITIES:
+        metadata["priority"] = priority
+    if tenant := headers.get("x-tenant-id"):
+        metadata["tenant"] = tenant[:64]
+    elif api_key := headers.get("x-api-key"):
+        # Never forward the key itself
+        metadata["tenant"] = "key-" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    if trace_id := headers.get(TRACE_HEADER):
+        metadata["trace_id"] = trace_id
+    if variants and variants > 1:
+        metadata["variants"] = variants
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-cache" in cache_control or headers.get("x-cache-bypass", "").lower() in ("1", "true"):
+        metadata["cache_bypass"] = True
+    return metadata
+
+
+def build_message(full_prompt: str, metadata: dict | None = None) -> Message:
+    # BUG FIX #5: Use proper Part/TextPart objects, not raw dicts
+    return Message(
+        role=Role.user,
+        parts=[Part(root=TextPart(text=full_prompt))],
+        messageId=uuid.uuid4().hex,
+        metadata=metadata or None,
+    )
+
+
+# Cancel requests outlive the stream that issued them; keep references until they finish
+_cancellations: set[asyncio.Task] = set()
+
+
+async def cancel_remote_task(balancer: A2ABalancer, task_id: str) -> None:
+    """Asks the A2A server running a task whose caller went away to stop it."""
+    backend = balancer.backend_for(task_id)
+    try:
+        client = await backend.pool.get_client()
+        await client.cancel_task(CancelTaskRequest(id=str(uuid.uuid4()), params=TaskIdParams(id=task_id)))
+        logger.info(f"Canceled abandoned A2A task {task_id} on {backend.url}")
+    except Exception as e:
+        # The task may have finished in the meantime; nothing left to free then
+        logger.warning(f"Could not cancel A2A task {task_id}: {str(e)}")
+
+
+async def stream_remote_pipeline(
+    balancer: A2ABalancer, full_prompt: str, metadata: dict | None = None
+) -> AsyncIterator[PipelineEvent]:
+    """
+    Sends the prompt to an A2A pipeline server and yields events as they arrive.
+    Always ends with exactly one `result` or `error` event. If the caller stops
+    consuming before the server finished, the server-side task is canceled.
+    """
+    message = build_message(full_prompt, metadata)
+    task_id = None
+    finished = False
+    try:
+        async with aclosing(_stream_remote_events(balancer, message)) as events:
+            async for event in events:
+                task_id = task_id or event.task_id
+                if event.event in ("result", "error"):
+                    finished = True
+                yield event
+    finally:
+        if task_id and not finished:
+            cancellation = asyncio.create_task(cancel_remote_task(balancer, task_id))
+            _cancellations.add(cancellation)
+            cancellation.add_done_callback(_cancellations.discard)
+
+
+async def _stream_remote_events(balancer: A2ABalancer, message: Message) -> AsyncIterator[PipelineEvent]:
+    received = False
+    tried = set()
+    # A call that fails before any output arrives is retried once, on another backend
+    # if there is one, else with a freshly resolved agent card
+    for attempt in range(2):
+        backend = balancer.pick(exclude=tried)
+        tried.add(backend)
+        try:
+            async with balancer.lease(backend):
+                client = await backend.pool.get_client()
+                streaming_request = SendStreamingMessageRequest(
+                    id=str(uuid.uuid4()),
+                    params=MessageSendParams(message=message)
+                )
+
+                logger.info(f"Sending message to {backend.url} and consuming stream...")
+                async for chunk in client.send_message_streaming(streaming_request):
+                    resp = chunk.root
+
+                    if isinstance(resp, JSONRPCErrorResponse):
+                        error_detail = resp.error.message
+                        logger.error(f"A2A Error Response: {error_detail}")
+                        yield PipelineEvent(event="error", detail=f"A2A Error: {error_detail}")
+                        return
+
+                    event = event_from_result(resp.result)
+                    if event is None:
+                        continue
+                    if not received and event.task_id:
+                        # Follow-ups for this task must reach the server that runs it
+                        balancer.bind(event.task_id, backend)
+                    received = True
+                    if event.event != "token":
+                        logger.info(f"Stream event: {event.event} {(event.text or '')[:80]}")
+                    yield event
+                    if event.event in ("result", "error"):
+                        balancer.record_success(backend)
+                        return
+            break
+
+        except Exception as e:
+            balancer.record_failure(backend)
+            if attempt == 0 and not received:
+                logger.warning(f"A2A call to {backend.url} failed, retrying: {str(e)}")
+                continue
+            logger.error(f"Error calling A2A Agent: {str(e)}", exc_info=True)
+            yield PipelineEvent(event="error", detail=str(e))
+            return
+
+    yield PipelineEvent(event="error", detail="No output received from agent pipeline")
+
+
+class RemotePipelineRunner:
+    """Runs the pipeline on the A2A server(s) over JSON-RPC/SSE."""
+
+    def __init__(self, balancer: A2ABalancer):
+        self.balancer = balancer
+
+    async def start(self) -> None:
+        await self.balancer.start()
+
+    async def close(self) -> None:
+        await self.balancer.close()
+
+    def stream(self, full_prompt: str, metadata: dict | None = None) -> AsyncIterator[PipelineEvent]:
+        return stream_remote_pipeline(self.balancer, full_prompt, metadata)
+
+
+def create_pipeline_runner(mode: str | None = None):
+    """PIPELINE_MODE=a2a (default) calls the A2A server; inprocess runs PipelineHost here."""
+    mode = (mode or os.getenv("PIPELINE_MODE", "a2a")).lower()
+    if mode == "inprocess":
+        # Imported lazily: only this mode needs the agents and the Gemini SDK
+        from api.local_pipeline import LocalPipelineRunner
+        return LocalPipelineRunner()
+    if mode != "a2a":
+        raise ValueError(f"Unknown PIPELINE_MODE: {mode}")
+    return RemotePipelineRunner(A2ABalancer.from_env())
@@ -1,24 +1,34 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Literal, Optional
 
 class UserInput(BaseModel):
     episode_summary: str = Field(..., description="Raw episodic summary of the show")
     peak_moments: List[str] = Field(..., description="List of peak moments or cliffhangers")
 
 class StructuredInput(BaseModel):
+    show_title: Optional[str] = None
     primary_characters: List[str]
     core_conflict: str
-    romance_intensity: int = Field(ge=0, le=5)
-    betrayal_level: int = Field(ge=0, le=5)
-    comedy_score: int = Field(ge=0, le=5)
-    darkness_score: int = Field(ge=0, le=5)
+    romance_intensity: int = Field(ge=0, le=5, description="0-5")
+    betrayal_level: int = Field(ge=0, le=5, description="0-5")
+    comedy_score: int = Field(ge=0, le=5, description="0-5")
+    darkness_score: int = Field(ge=0, le=5, description="0-5")
     shock_moments: List[str]
+    vibe: Optional[str] = None
+    summary: Optional[str] = None
 
 class GenreDecision(BaseModel):
     selected_agent: str
 
 class SpeakerDecision(BaseModel):
-    format: str  # single_narrator | dual_speaker
+    format: Literal["Single-Speaker", "Multi-Speaker"]
+    reason: str
+    vibe: Optional[str] = None
+    confidence: Optional[float] = None
+
+    @property
+    def multi_speaker(self) -> bool:
+        return self.format == "Multi-Speaker"
 
 class ScriptResult(BaseModel):
     script: str
@@ -29,6 +39,33 @@ class ValidationResult(BaseModel):
     valid: bool
     issues: List[str] = []
     corrected_script: Optional[str] = None
+    notes: Optional[str] = None
+
+class ScriptCandidates(BaseModel):
+    scripts: List[str]
+    genre: str
+    format: str
+
+class CandidateReview(BaseModel):
+    index: int
+    valid: bool
+    score: int = Field(description="0-10")
+    issues: List[str] = []
+    notes: Optional[str] = None
+
+class CandidateReviews(BaseModel):
+    reviews: List[CandidateReview]
+
+class ScriptVariant(BaseModel):
+    rank: int
+    script: str
+    valid: bool
+    score: Optional[int] = None
+    issues: List[str] = []
+    notes: Optional[str] = None
+
+class VariantRanking(BaseModel):
+    variants: List[ScriptVariant]
 
 class FinalResponse(BaseModel):
     task_id: str
@@ -38,3 +75,51 @@ class FinalResponse(BaseModel):
     speaker_format: str
     script: str
     metadata: dict = {}
+
+class ScriptResponse(BaseModel):
+    script: str
+    genre: str
+    speaker_format: str
+    variants: Optional[List[ScriptVariant]] = None
+    # Wall-clock seconds per stage that ran for this result (reused stages are absent)
+    stage_seconds: Optional[Dict[str, float]] = None
+
+class PipelineEvent(BaseModel):
+    """One event relayed to clients of the streaming endpoints."""
+    event: str  # task | progress | status | token | result | error
+    task_id: Optional[str] = None
+    state: Optional[str] = None
+    stage: Optional[str] = None
+    step: Optional[int] = None
+    total: Optional[int] = None
+    # progress: the stage finished (false or absent: it started); stages can overlap
+    done: Optional[bool] = None
+    text: Optional[str] = None
+    append: Optional[bool] = None
+    last_chunk: Optional[bool] = None
+    result: Optional[ScriptResponse] = None
+    detail: Optional[str] = None
+
+    def to_sse(self) -> str:
+        return f"event: {self.event}\ndata: {self.model_dump_json(exclude_none=True)}\n\n"
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str  # queued | running | succeeded | failed
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    queue_position: Optional[int] = None
+    progress: Optional[str] = None
+    result: Optional[ScriptResponse] = None
+    error: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[UserInput]
+    concurrency: Optional[int] = Field(None, ge=1, le=64)
+
+class BatchItemResult(BaseModel):
+    id: str
+    status: str  # ok | error
+    result: Optional[ScriptResponse] = None
+    error: Optional[str] = None
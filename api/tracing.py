@@ -0,0 +1,42 @@
+import re
+import uuid
+
+TRACE_HEADER = "x-trace-id"
+# W3C trace context: version-traceid-parentid-flags
+TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$")
+
+
+def trace_id_from_headers(headers: dict[str, str]) -> str:
+    """The caller's X-Trace-Id or traceparent trace id, else a new one."""
+    if trace_id := headers.get(TRACE_HEADER, "").strip():
+        return trace_id[:64]
+    if match := TRACEPARENT.match(headers.get("traceparent", "").strip().lower()):
+        return match.group(1)
+    return uuid.uuid4().hex
+
+
+class TraceIdMiddleware:
+    """
+    ASGI middleware giving every HTTP request a trace id: it is set as the
+    request's X-Trace-Id header (where request_metadata() picks it up for the
+    A2A message) and echoed on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {key.decode("latin-1").lower(): value.decode("latin-1") for key, value in scope["headers"]}
+        trace_id = trace_id_from_headers(headers)
+        header = (TRACE_HEADER.encode(), trace_id.encode("latin-1"))
+        scope = {**scope, "headers": [(k, v) for k, v in scope["headers"] if k.lower() != header[0]] + [header]}
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), header]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_trace)
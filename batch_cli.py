@@ -0,0 +1,118 @@
+"""
+Offline pre-generation of ad scripts for a whole catalog.
+
+    python batch_cli.py catalog.jsonl scripts.jsonl --concurrency 8
+
+The catalog is JSONL or CSV with `episode_summary` and `peak_moments`
+(a JSON list, or a '|'-separated string in CSV) and an optional `id`.
+Results are appended to the output JSONL as they complete; re-running with
+the same output file skips every item that already succeeded, so a crashed
+run resumes where it stopped.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from api.batch import run_batch
+from api.pipeline_stream import build_prompt, create_pipeline_runner
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("batch_cli")
+
+load_dotenv()
+
+# Catalog runs only use capacity interactive requests leave free
+BATCH_METADATA = {"priority": "batch"}
+
+
+def read_catalog(path: str):
+    """Yields (id, row) pairs from a JSONL or CSV catalog."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for i, row in enumerate(csv.DictReader(f)):
+                peaks = row.get("peak_moments") or ""
+                row["peak_moments"] = [p.strip() for p in peaks.split("|") if p.strip()]
+                yield str(row.get("id") or i), row
+        else:
+            for i, line in enumerate(f):
+                if line.strip():
+                    row = json.loads(line)
+                    yield str(row.get("id") or i), row
+
+
+def read_checkpoint(path: str) -> set[str]:
+    """Ids that already have a successful result in the output file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line; that item is simply redone
+                continue
+            if record.get("status") == "ok":
+                done.add(record["id"])
+    return done
+
+
+def end_torn_line(path: str) -> None:
+    """Terminates a truncated last line, so the first appended result starts on a line of its own."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+async def main(args) -> int:
+    done = read_checkpoint(args.output)
+    items = []
+    for item_id, row in read_catalog(args.catalog):
+        if item_id in done:
+            continue
+        prompt = build_prompt(row.get("episode_summary"), row.get("peak_moments"), row.get("prompt"))
+        items.append((item_id, prompt))
+    logger.info(f"{len(done)} items already done, {len(items)} to generate")
+
+    runner = create_pipeline_runner(args.mode)
+    await runner.start()
+    ok = failed = 0
+    started = time.monotonic()
+    try:
+        end_torn_line(args.output)
+        with open(args.output, "a", encoding="utf-8") as out:
+            async for result in run_batch(items, lambda prompt: runner.stream(prompt, BATCH_METADATA), args.concurrency):
+                out.write(result.model_dump_json(exclude_none=True) + "\n")
+                out.flush()
+                if result.status == "ok":
+                    ok += 1
+                else:
+                    failed += 1
+                if (ok + failed) % 10 == 0:
+                    rate = (ok + failed) / (time.monotonic() - started)
+                    logger.info(f"Progress: {ok + failed}/{len(items)} ({failed} failed, {rate:.2f} items/s)")
+    finally:
+        await runner.close()
+
+    logger.info(f"Finished: {ok} ok, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate ad scripts for a catalog of episodes.")
+    parser.add_argument("catalog", help="Input catalog (.jsonl or .csv)")
+    parser.add_argument("output", help="Output JSONL; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "4")))
+    parser.add_argument("--mode", choices=["a2a", "inprocess"], default=None,
+                        help="Pipeline mode (defaults to PIPELINE_MODE)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,439 @@
+"""
+Offline benchmark of the orchestration layer, run against the fake Gemini
+backend (agents/fake_model.py) so no quota is spent.
+
+    python benchmark.py --target api --requests 200 --concurrency 16 --output base.json
+    python benchmark.py --target api --requests 200 --concurrency 16 --compare base.json
+
+Targets:
+  inprocess  PipelineHost in this process (LocalPipelineRunner)
+  a2a        a2a_server.py in a subprocess, driven over A2A JSON-RPC/SSE
+  api        main.py and a2a_server.py in subprocesses, driven over HTTP SSE
+
+--a2a-workers N starts N A2A server processes on consecutive ports, balanced
+by main.py (or by this process for the a2a target).
+
+The fake model is shaped with --latency (fixed:S, uniform:A:B or
+lognormal:MEDIAN:SIGMA), --error-rate and --response-words. Every request
+gets a distinct prompt and skips the response cache unless --allow-cache.
+The fake model has no quota, so the governor's RPM limit is lifted unless
+--rpm is given (pass the production value to include quota pacing).
+
+The JSON report has throughput, p50/p95/p99 end to end, to the first script
+token and per stage, error rate, stage fallbacks and RSS per process. With
+--compare, regressions beyond --tolerance are listed and the exit code is 1.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+
+import httpx
+from dotenv import load_dotenv
+from prometheus_client.parser import text_string_to_metric_families
+
+from api.schemas import PipelineEvent
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("benchmark")
+
+load_dotenv()
+
+WORDS = (
+    "queen king brother letter palace poison throne secret wedding betrayal revenge village "
+    "storm heir promise dagger mirror oath exile return ghost fortune debt lover rival"
+).split()
+
+# Differences smaller than this are noise, whatever the tolerance
+MIN_LATENCY_DELTA = 0.005
+
+
+@dataclass
+class Sample:
+    ok: bool
+    seconds: float
+    first_token: float | None = None
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    error: str | None = None
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, max(int(p / 100 * len(ordered) + 0.5) - 1, 0))], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": rank(50),
+        "p95": rank(95),
+        "p99": rank(99),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def make_prompts(count: int, seed: int) -> list[tuple[str, list[str]]]:
+    """Distinct episodes, so coalescing and near-duplicate reuse do not collapse the load."""
+    rng = random.Random(seed)
+    prompts = []
+    for i in range(count):
+        summary = f"Episode {i}: " + " ".join(rng.choice(WORDS) for _ in range(40))
+        peaks = [" ".join(rng.choice(WORDS) for _ in range(6)) for _ in range(3)]
+        prompts.append((summary, peaks))
+    return prompts
+
+
+async def consume(events, started: float) -> Sample:
+    first_token = None
+    async for event in events:
+        if event.event == "token" and first_token is None:
+            first_token = time.monotonic() - started
+        elif event.event == "result":
+            return Sample(True, time.monotonic() - started, first_token, event.result.stage_seconds or {})
+        elif event.event == "error":
+            return Sample(False, time.monotonic() - started, first_token, error=event.detail)
+    return Sample(False, time.monotonic() - started, first_token, error="stream ended without a result")
+
+
+async def sse_events(client: httpx.AsyncClient, url: str, body: dict, headers: dict):
+    async with client.stream("POST", url, json=body, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("data: "):
+                yield PipelineEvent.model_validate_json(line[len("data: "):])
+
+
+class ServerProcess:
+    """One app under test, started with uvicorn in a subprocess."""
+
+    def __init__(self, name: str, command: list[str], ready_url: str, env: dict[str, str]):
+        self.name = name
+        self.ready_url = ready_url
+        self.process = subprocess.Popen(
+            command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+
+    async def wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        async with httpx.AsyncClient(timeout=2.0) as client:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"{self.name} exited with code {self.process.returncode}")
+                try:
+                    if (await client.get(self.ready_url)).status_code == 200:
+                        return
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(0.2)
+        raise RuntimeError(f"{self.name} did not become ready within {timeout:.0f}s")
+
+    def memory(self) -> dict:
+        return process_memory(self.process.pid)
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def process_memory(pid: int) -> dict:
+    """Current and peak RSS in MB from /proc; empty where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {
+        "rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+        "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+    }
+
+
+def fallback_counts(metrics_text: str) -> dict[str, float]:
+    counts: dict[str, float] = {}
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name == "pipeline_stage_fallbacks":
+            for sample in family.samples:
+                if sample.name.endswith("_total"):
+                    stage = sample.labels["stage"]
+                    counts[stage] = counts.get(stage, 0) + sample.value
+    return counts
+
+
+class Target:
+    """Sends one pipeline request to the system under test and reports what it saw."""
+
+    def __init__(self, args, env: dict[str, str]):
+        self.args = args
+        self.env = env
+        self.servers: list[ServerProcess] = []
+        self.runner = None
+        self.client: httpx.AsyncClient | None = None
+        self.metrics_urls: list[str] = []
+
+    async def start(self) -> None:
+        args = self.args
+        if args.target == "inprocess":
+            os.environ.update(self.env)
+            # Imported only now: the agents read the fake backend settings when they are built
+            from api.local_pipeline import LocalPipelineRunner
+            self.runner = LocalPipelineRunner()
+            await self.runner.start()
+            return
+
+        for i in range(args.a2a_workers):
+            port = args.a2a_port + i
+            worker = ServerProcess(
+                "a2a_server" if args.a2a_workers == 1 else f"a2a_server_{i}",
+                [sys.executable, "-m", "uvicorn", "a2a_server:app", "--port", str(port), "--log-level", "warning"],
+                f"http://localhost:{port}/ready",
+                {**self.env, "A2A_SERVER_PORT": str(port)},
+            )
+            self.servers.append(worker)
+            self.metrics_urls.append(f"http://localhost:{port}/metrics")
+        await asyncio.gather(*(server.wait_ready() for server in self.servers))
+        if args.target == "api":
+            api = ServerProcess(
+                "api",
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.api_port), "--log-level", "warning"],
+                f"http://localhost:{args.api_port}/health",
+                self.env,
+            )
+            self.servers.append(api)
+            await api.wait_ready()
+        else:
+            from api.a2a_client import A2ABalancer, A2AClientPool
+            from api.pipeline_stream import RemotePipelineRunner
+            pools = [
+                A2AClientPool(f"http://localhost:{args.a2a_port + i}/", timeout=args.timeout)
+                for i in range(args.a2a_workers)
+            ]
+            self.runner = RemotePipelineRunner(A2ABalancer(pools))
+            await self.runner.start()
+        self.client = httpx.AsyncClient(
+            timeout=args.timeout, limits=httpx.Limits(max_connections=args.concurrency * 2)
+        )
+
+    async def close(self) -> None:
+        if self.runner is not None:
+            await self.runner.close()
+        if self.client is not None:
+            await self.client.aclose()
+        for server in reversed(self.servers):
+            server.stop()
+
+    async def send(self, summary: str, peaks: list[str]) -> Sample:
+        started = time.monotonic()
+        try:
+            if self.args.target == "api":
+                headers = {} if self.args.allow_cache else {"X-Cache-Bypass": "1"}
+                body = {"episode_summary": summary, "peak_moments": peaks}
+                url = f"http://localhost:{self.args.api_port}/api/generate-script/stream"
+                return await consume(sse_events(self.client, url, body, headers), started)
+            from api.pipeline_stream import build_prompt
+            metadata = {} if self.args.allow_cache else {"cache_bypass": True}
+            return await consume(self.runner.stream(build_prompt(summary, peaks, None), metadata), started)
+        except Exception as e:
+            return Sample(False, time.monotonic() - started, error=f"{type(e).__name__}: {e}")
+
+    async def fallbacks(self) -> dict[str, float]:
+        if not self.metrics_urls:
+            from prometheus_client import generate_latest
+            return fallback_counts(generate_latest().decode())
+        counts: dict[str, float] = {}
+        for url in self.metrics_urls:
+            for stage, count in fallback_counts((await self.client.get(url)).text).items():
+                counts[stage] = counts.get(stage, 0) + count
+        return counts
+
+    def memory(self) -> dict:
+        if not self.servers:
+            return {"benchmark": process_memory(os.getpid())}
+        return {server.name: server.memory() for server in self.servers}
+
+
+async def drive(target: Target, prompts, concurrency: int) -> tuple[list[Sample], float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(summary: str, peaks: list[str]) -> Sample:
+        async with semaphore:
+            return await target.send(summary, peaks)
+
+    started = time.monotonic()
+    samples = await asyncio.gather(*(one(summary, peaks) for summary, peaks in prompts))
+    return samples, time.monotonic() - started
+
+
+def build_report(args, samples: list[Sample], elapsed: float, memory_before: dict, memory_after: dict,
+                 fallbacks: dict[str, float]) -> dict:
+    ok = [s for s in samples if s.ok]
+    stages: dict[str, list[float]] = {}
+    for sample in ok:
+        for stage, seconds in sample.stage_seconds.items():
+            stages.setdefault(stage, []).append(seconds)
+
+    memory = {}
+    for name, after in memory_after.items():
+        before = memory_before.get(name, {})
+        memory[name] = {**after}
+        if "rss_mb" in after and "rss_mb" in before:
+            memory[name]["rss_growth_kb_per_request"] = round(
+                (after["rss_mb"] - before["rss_mb"]) * 1024 / max(len(samples), 1), 2
+            )
+
+    errors: dict[str, int] = {}
+    for sample in samples:
+        if not sample.ok:
+            errors[sample.error or "unknown"] = errors.get(sample.error or "unknown", 0) + 1
+
+    return {
+        "target": args.target,
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "a2a_workers": args.a2a_workers,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "response_words": args.response_words,
+            "seed": args.seed,
+            "rpm": args.rpm,
+            "allow_cache": args.allow_cache,
+        },
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round((len(samples) - len(ok)) / max(len(samples), 1), 4),
+        "errors": dict(sorted(errors.items(), key=lambda item: -item[1])[:10]),
+        "end_to_end": percentiles([s.seconds for s in ok]),
+        "first_token": percentiles([s.first_token for s in ok if s.first_token is not None]),
+        "stages": {stage: percentiles(values) for stage, values in stages.items()},
+        "stage_fallbacks": fallbacks,
+        "memory": memory,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Metrics that got worse than the baseline by more than `tolerance` (relative)."""
+    regressions = []
+
+    def latency(name: str, new: dict, old: dict) -> None:
+        for key in ("p50", "p95", "p99"):
+            if key in new and key in old:
+                if new[key] - old[key] > max(old[key] * tolerance, MIN_LATENCY_DELTA):
+                    regressions.append(f"{name} {key}: {old[key]:.4f}s -> {new[key]:.4f}s")
+
+    latency("end_to_end", report["end_to_end"], baseline.get("end_to_end", {}))
+    latency("first_token", report["first_token"], baseline.get("first_token", {}))
+    for stage, stats in report["stages"].items():
+        latency(f"stage {stage}", stats, baseline.get("stages", {}).get(stage, {}))
+
+    old_rps = baseline.get("throughput_rps")
+    if old_rps and report["throughput_rps"] < old_rps * (1 - tolerance):
+        regressions.append(f"throughput: {old_rps:.3f} -> {report['throughput_rps']:.3f} req/s")
+    old_errors = baseline.get("error_rate", 0.0)
+    if report["error_rate"] > old_errors + 0.01:
+        regressions.append(f"error rate: {old_errors:.4f} -> {report['error_rate']:.4f}")
+    for name, stats in report["memory"].items():
+        old = baseline.get("memory", {}).get(name, {}).get("peak_rss_mb")
+        if old and stats.get("peak_rss_mb", 0) > old * (1 + tolerance):
+            regressions.append(f"{name} peak RSS: {old:.1f} -> {stats['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+async def run(args) -> dict:
+    env = {
+        **os.environ,
+        "GEMINI_BACKEND": "fake",
+        "FAKE_MODEL_LATENCY": args.latency,
+        "FAKE_MODEL_ERROR_RATE": str(args.error_rate),
+        "FAKE_MODEL_RESPONSE_WORDS": str(args.response_words),
+        "GEMINI_RPM_LIMIT": str(args.rpm),
+        "A2A_SERVER_PORT": str(args.a2a_port),
+        # main.py balances over the workers on consecutive ports
+        "A2A_WORKERS": str(args.a2a_workers),
+        "PIPELINE_MODE": "a2a",
+        "TASK_STORE": os.getenv("TASK_STORE", "memory"),
+        "TASK_STORE_SHARED": "true" if args.a2a_workers > 1 else "false",
+        "PYTHONUNBUFFERED": "1",
+    }
+    if args.seed is not None:
+        env["FAKE_MODEL_SEED"] = str(args.seed)
+
+    prompts = make_prompts(args.warmup + args.requests, args.seed or 0)
+    target = Target(args, env)
+    await target.start()
+    try:
+        if args.warmup:
+            await drive(target, prompts[:args.warmup], args.concurrency)
+        memory_before = target.memory()
+        fallbacks_before = await target.fallbacks()
+        samples, elapsed = await drive(target, prompts[args.warmup:], args.concurrency)
+        fallbacks_after = await target.fallbacks()
+        memory_after = target.memory()
+    finally:
+        await target.close()
+
+    fallbacks = {
+        stage: count - fallbacks_before.get(stage, 0)
+        for stage, count in fallbacks_after.items()
+        if count - fallbacks_before.get(stage, 0)
+    }
+    return build_report(args, samples, elapsed, memory_before, memory_after, fallbacks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the ad script pipeline against a fake Gemini backend.")
+    parser.add_argument("--target", choices=["inprocess", "a2a", "api"], default="api")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5, help="requests sent before measuring")
+    parser.add_argument("--latency", default="lognormal:0.8:0.5", help="fake model latency distribution")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake model calls that fail")
+    parser.add_argument("--response-words", type=int, default=80, help="words per fake free-text answer")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--rpm", type=float, default=1_000_000, help="governor requests-per-minute limit")
+    parser.add_argument("--allow-cache", action="store_true", help="let requests use the response cache")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--a2a-port", type=int, default=9931)
+    parser.add_argument("--a2a-workers", type=int, default=1, help="A2A server processes on consecutive ports")
+    parser.add_argument("--api-port", type=int, default=8031)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown vs the baseline")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("target") != report["target"] or baseline.get("config") != report["config"]:
+            logger.warning("Baseline was run with a different target or config; differences may not be regressions")
+        regressions = compare(report, baseline, args.tolerance)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logger.warning(f"Report written to {args.output}")
+    else:
+        print(text)
+    for regression in regressions:
+        logger.warning(f"Regression: {regression}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
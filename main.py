@@ -1,31 +1,47 @@
-import os
-import uuid
-from fastapi import FastAPI, HTTPException
+from contextlib import aclosing, asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+import asyncio
 import logging
-import httpx
-
-from a2a.client import A2AClient, ClientFactory
-from a2a.client.card_resolver import A2ACardResolver
-from a2a.types import (
-    SendStreamingMessageRequest,
-    MessageSendParams,
-    Message,
-    Part,
-    TextPart,
-    Role,
-    JSONRPCErrorResponse,
-)
-from a2a.utils.message import get_message_text
+import os
+import time
+
+from agents.metrics import InFlightMiddleware, metrics_payload
+from api.batch import run_batch
+from api.jobs import JobManager, JobQueueFull
+from api.pipeline_stream import build_prompt, create_pipeline_runner, request_metadata
+from api.schemas import BatchRequest, PipelineEvent
+from api.tracing import TraceIdMiddleware
+from orchestrator.singleflight import SingleFlight, coalesce_key
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-app = FastAPI(title="KukuTV Ad Script Generator API")
+pipeline_runner = create_pipeline_runner()
+pipeline_flights: SingleFlight[PipelineEvent] = SingleFlight.from_env()
+coalesce_requests = os.getenv("PIPELINE_COALESCE", "true").lower() == "true"
+batch_concurrency = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Time budget for one pipeline run. Kept below A2A_TIMEOUT_SECONDS so late stages fall
+# back and a result still arrives before the HTTP call to the A2A server times out.
+pipeline_deadline = float(os.getenv("PIPELINE_DEADLINE_SECONDS", "110"))
+job_manager = JobManager.from_env(lambda prompt, metadata: pipeline_events(prompt, metadata))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pipeline_runner.start()
+    await job_manager.start()
+    yield
+    await job_manager.close()
+    await pipeline_runner.close()
+
+
+app = FastAPI(title="KukuTV Ad Script Generator API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,96 +49,185 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+app.add_middleware(TraceIdMiddleware)
+app.add_middleware(InFlightMiddleware, name="api")
 
 
 class GenerateRequest(BaseModel):
     prompt: str | None = None
     episode_summary: str | None = None
     peak_moments: list[str] | None = None
+    # Write this many script candidates and return them ranked (capped by PIPELINE_MAX_VARIANTS)
+    variants: int = Field(1, ge=1, le=8)
 
 
-@app.post("/api/generate-script")
-async def generate_script(request: GenerateRequest):
+def pipeline_events(full_prompt: str, metadata: dict):
     """
-    Client-facing endpoint that triggers the A2A Pipeline.
+    Pipeline event stream; identical concurrent prompts attach to one in-flight run
+    unless its deadline is much earlier than theirs. The run's deadline starts now
+    and travels to the host in the A2A metadata.
     """
-    if request.episode_summary and request.peak_moments:
-        full_prompt = (
-            f"Episode Summary: {request.episode_summary}\n"
-            f"Peak Moments: {', '.join(request.peak_moments)}"
-        )
-    else:
-        full_prompt = request.prompt or "Generic script request"
+    deadline = time.time() + pipeline_deadline
+    metadata = {**metadata, "deadline": deadline}
+    if not coalesce_requests:
+        return pipeline_runner.stream(full_prompt, metadata)
+    return pipeline_flights.stream(
+        coalesce_key(full_prompt, metadata),
+        lambda: pipeline_runner.stream(full_prompt, metadata),
+        deadline=deadline,
+    )
+
+
+async def cancel_on_disconnect(http_request: Request, run: asyncio.Task, interval: float = 1.0) -> None:
+    while not run.done():
+        if await http_request.is_disconnected():
+            logger.info("Client disconnected, cancelling its pipeline run")
+            run.cancel()
+            return
+        await asyncio.sleep(interval)
+
 
+@app.post("/api/generate-script")
+async def generate_script(request: GenerateRequest, http_request: Request):
+    """
+    Client-facing endpoint that triggers the pipeline (over A2A, or in-process
+    with PIPELINE_MODE=inprocess).
+    Send `Cache-Control: no-cache` or `X-Cache-Bypass: 1` to skip cached agent responses.
+    """
+    full_prompt = build_prompt(request.episode_summary, request.peak_moments, request.prompt)
     logger.info(f"Received request. Prompt: {full_prompt[:80]}...")
 
-    port = os.getenv("A2A_SERVER_PORT", "9999")
-    agent_url = f"http://localhost:{port}/"
+    metadata = request_metadata(http_request.headers, request.variants)
+
+    async def final_event() -> PipelineEvent | None:
+        async with aclosing(pipeline_events(full_prompt, metadata)) as events:
+            async for event in events:
+                if event.event in ("result", "error"):
+                    return event
+        return None
+
+    # A client that hangs up cancels the run instead of leaving it to finish unread
+    run = asyncio.create_task(final_event())
+    watcher = asyncio.create_task(cancel_on_disconnect(http_request, run))
+    try:
+        event = await run
+    except asyncio.CancelledError:
+        if not run.cancelled():
+            raise
+        raise HTTPException(status_code=499, detail="Client closed request")
+    finally:
+        watcher.cancel()
+        if not run.done():
+            run.cancel()
+
+    if event is not None and event.event == "error":
+        raise HTTPException(status_code=500, detail=event.detail)
+    if event is not None:
+        return event.result.model_dump()
+
+    raise HTTPException(status_code=500, detail="No output received from agent pipeline")
+
+
+@app.post("/api/generate-script/stream")
+async def generate_script_stream(request: GenerateRequest, http_request: Request):
+    """
+    Same pipeline as /api/generate-script, relayed as Server-Sent Events: a
+    `progress` event per stage as it starts and another (`done`) as it finishes,
+    `token` events while the ad script is being written, then a terminal
+    `result` or `error`.
+    """
+    full_prompt = build_prompt(request.episode_summary, request.peak_moments, request.prompt)
+    logger.info(f"Received streaming request. Prompt: {full_prompt[:80]}...")
+
+    metadata = request_metadata(http_request.headers, request.variants)
 
+    async def sse():
+        # aclosing() detaches this subscriber as soon as the client disconnects
+        async with aclosing(pipeline_events(full_prompt, metadata)) as events:
+            async for event in events:
+                yield event.to_sse()
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/batch")
+async def generate_batch(request: BatchRequest, http_request: Request):
+    """
+    Generates scripts for many episodes. Results are streamed as NDJSON, one
+    line per item in completion order; `id` is the item's index in the request.
+    """
+    metadata = request_metadata(http_request.headers, priority="batch")
+    items = [
+        (str(i), build_prompt(item.episode_summary, item.peak_moments, None))
+        for i, item in enumerate(request.items)
+    ]
+    logger.info(f"Received batch of {len(items)} items")
+
+    async def ndjson():
+        async with aclosing(run_batch(
+            items,
+            lambda prompt: pipeline_events(prompt, metadata),
+            concurrency=request.concurrency or batch_concurrency,
+        )) as results:
+            async for result in results:
+                yield result.model_dump_json(exclude_none=True) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: GenerateRequest, http_request: Request):
+    """
+    Queues a pipeline run and returns its id immediately. Rejected with 429 and
+    Retry-After when the job queue is full.
+    """
+    full_prompt = build_prompt(request.episode_summary, request.peak_moments, request.prompt)
     try:
-        async with httpx.AsyncClient(timeout=120.0) as http_client:
-            # 1. Resolve Agent Card
-            resolver = A2ACardResolver(httpx_client=http_client, base_url=agent_url)
-            agent_card = await resolver.get_agent_card()
-            logger.info(f"Agent Card resolved: {agent_card.name}")
-
-            # 2. Initialize client via ClientFactory (A2AClient is deprecated)
-            client = await ClientFactory.create_client(httpx_client=http_client, agent_card=agent_card)
-
-            # BUG FIX #5: Use proper Part/TextPart objects, not raw dicts
-            message = Message(
-                role=Role.user,
-                parts=[Part(root=TextPart(text=full_prompt))],
-                messageId=uuid.uuid4().hex,
-            )
-
-            streaming_request = SendStreamingMessageRequest(
-                id=str(uuid.uuid4()),
-                params=MessageSendParams(message=message)
-            )
-
-            # 4. Consume stream — collect all Message chunks
-            all_messages = []
-            logger.info("Sending message and consuming stream...")
-
-            async for chunk in client.send_message_streaming(streaming_request):
-                resp = chunk.root
-
-                if isinstance(resp, JSONRPCErrorResponse):
-                    error_detail = resp.error.message
-                    logger.error(f"A2A Error Response: {error_detail}")
-                    raise HTTPException(status_code=500, detail=f"A2A Error: {error_detail}")
-
-                result = resp.result
-                if isinstance(result, Message):
-                    text = get_message_text(result)
-                    logger.info(f"Stream chunk received: {text[:80]}...")
-                    all_messages.append(text)
-                elif hasattr(result, "status") and hasattr(result.status, "state"):
-                    logger.info(f"Task state update: {result.status.state}")
-                else:
-                    logger.debug(f"Received event: {type(result).__name__}")
-
-            logger.info(f"Stream finished. Total chunks received: {len(all_messages)}")
-
-            if not all_messages:
-                raise HTTPException(status_code=500, detail="No output received from agent pipeline")
-
-            # Progress messages are like "[1/5]...", final output is the last (and longest) message
-            final_text = max(all_messages, key=len)
-
-            return {
-                "script": final_text,
-                "genre": "kukufm_drama",
-                "speaker_format": "multi_speaker" if "Multi-Speaker" in final_text else "single_speaker",
-            }
-
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error calling A2A Agent: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        # Editors wait on these too; bulk clients opt in to batch scheduling with X-Priority
+        job = job_manager.submit(full_prompt, request_metadata(http_request.headers, request.variants))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    return {
+        **job_manager.status(job).model_dump(exclude_none=True),
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events",
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0.0):
+    """Job status. With `wait` (seconds, max 60) this long-polls until the job finishes."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    await job_manager.wait(job, min(max(wait, 0.0), 60.0))
+    return job_manager.status(job).model_dump(exclude_none=True)
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def get_job_events(job_id: str):
+    """Job progress as Server-Sent Events, replayed from the start of the job."""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def sse():
+        async with aclosing(job_manager.events(job)) as events:
+            async for event in events:
+                yield event.to_sse()
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/health")
@@ -130,6 +235,20 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/a2a/backends")
+async def a2a_backends():
+    """Load and health of the A2A servers this API balances over (empty in-process)."""
+    balancer = getattr(pipeline_runner, "balancer", None)
+    return balancer.stats() if balancer is not None else {"backends": {}}
+
+
+@app.get("/metrics")
+async def metrics(http_request: Request):
+    """Prometheus metrics; in-process mode includes the pipeline and Gemini metrics."""
+    body, content_type = metrics_payload(http_request.headers.get("accept"))
+    return Response(content=body, media_type=content_type)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Stage:
+    """One agent step in the pipeline graph."""
+    name: str
+    agent: Any
+    build_input: Callable[["StageRun"], str]
+    fallback: str
+    error: str
+    label: str = ""
+    deps: tuple[str, ...] = ()
+
+
+class StageRun:
+    """Outputs of a single pipeline run, filled in as stages complete."""
+
+    def __init__(self, stages: list[Stage]):
+        self._order = {stage.name: i for i, stage in enumerate(stages)}
+        self.outputs: dict[str, str] = {}
+        self.failed: set[str] = set()
+        self._errors: dict[str, str] = {}
+
+    def ok(self, name: str) -> bool:
+        return name in self.outputs and name not in self.failed
+
+    def record(self, stage: Stage, result: str | None) -> str:
+        if not result:
+            self.failed.add(stage.name)
+            self._errors[stage.name] = stage.error
+            result = stage.fallback
+        self.outputs[stage.name] = result
+        return result
+
+    @property
+    def errors(self) -> list[str]:
+        """Failures in pipeline order, regardless of completion order."""
+        return [self._errors[n] for n in sorted(self._errors, key=self._order.get)]
+
+
+StageRunner = Callable[[Stage, str], Awaitable[str | None]]
+
+
+class StageScheduler:
+    """
+    Runs a list of stages as a DAG: every stage starts as soon as all of its deps
+    have an output (real or fallback), so independent stages overlap.
+    """
+
+    def __init__(self, stages: list[Stage]):
+        seen = set()
+        for stage in stages:
+            if stage.name in seen:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            missing = [d for d in stage.deps if d not in seen]
+            if missing:
+                # Requiring deps to be declared first also rules out cycles
+                raise ValueError(f"Stage '{stage.name}' depends on undeclared or later stages: {missing}")
+            seen.add(stage.name)
+        self.stages = stages
+
+    async def run(
+        self,
+        runner: StageRunner,
+        on_start: Callable[[Stage], Awaitable[None]] | None = None,
+        on_finish: Callable[[Stage], Awaitable[None]] | None = None,
+    ) -> StageRun:
+        """
+        `on_start` and `on_finish` are awaited as each stage starts and once it has
+        an output; stages overlap, so finishing order can differ from pipeline order.
+        """
+        run = StageRun(self.stages)
+        tasks: dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage) -> str:
+            if stage.deps:
+                await asyncio.gather(*(tasks[d] for d in stage.deps))
+            input_text = stage.build_input(run)
+            if on_start:
+                await on_start(stage)
+            output = run.record(stage, await runner(stage, input_text))
+            if on_finish:
+                await on_finish(stage)
+            return output
+
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.create_task(run_stage(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+        return run
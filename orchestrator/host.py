@@ -1,91 +1,419 @@
-from agents.structurer_agent import StructurerAgent
-from agents.router_agent import RouterAgent
-from agents.speaker_agent import SpeakerAgent
-from agents.script_agent import ScriptAgent
-from agents.validator_agent import ValidatorAgent
+from agents.call_context import CallOptions, RunProgress, call_options, run_progress
+from agents.cassette import get_cassette_recorder
+from agents.episode_log import estimate_tokens, prepare_episode_input
+from agents.metrics import PIPELINE_IN_FLIGHT, STAGE_FALLBACKS, STAGE_LATENCY, trace_exemplar
+from agents.resilience import CircuitOpenError
+from agents.structured_output import parse_output
+from api.schemas import (
+    ScriptCandidates, ScriptResult, SpeakerDecision, StructuredInput, ValidationResult, VariantRanking,
+)
+from orchestrator.dag import Stage, StageRun, StageScheduler
+from orchestrator.near_duplicates import get_near_duplicate_index
+from orchestrator.profiling import get_stage_profiler
+from orchestrator.singleflight import VOLATILE_KEYS, SingleFlight, coalesce_key
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.events import EventQueue
+from a2a.server.tasks import TaskUpdater
 from a2a.utils.message import new_agent_text_message, get_message_text
-from a2a.types import TaskStatusUpdateEvent, TaskState, TaskStatus
+from a2a.utils.task import new_task
+from a2a.types import TaskState, Part, TextPart
+from contextlib import aclosing, nullcontext
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import AsyncIterator
+import asyncio
+import json
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+# Stages whose outputs are reused for near-duplicate inputs; later stages always re-run
+REUSABLE_STAGES = ("Structurer", "Router")
+
+
+@dataclass
+class HostEvent:
+    """Task-independent pipeline output, rendered into A2A events per caller."""
+    kind: str  # progress | chunk | chunk_end | final
+    stage: str = ""
+    text: str = ""
+    step: int = 0
+    total: int = 0
+    first: bool = False
+    # On `progress`: the stage has finished (else it has just started)
+    done: bool = False
+    # Typed summary of the run, attached to the final message as metadata
+    data: dict = field(default_factory=dict)
+
 
 class PipelineHost(AgentExecutor):
     def __init__(self):
-        self.structurer = StructurerAgent()
-        self.router = RouterAgent()
-        self.speaker = SpeakerAgent()
-        self.script_writer = ScriptAgent()
-        self.validator = ValidatorAgent()
-
-    async def _run_step(self, step_name: str, agent, input_text: str) -> str | None:
-        """Runs a single agent step with isolated error handling — never raises."""
+        # raw (default): the Router reads the input itself and runs alongside the Structurer,
+        # with the Speaker right behind it. structured: it waits for the Structurer's fields.
+        self.router_input = os.getenv("PIPELINE_ROUTER_INPUT", "raw").lower()
+        if self.router_input not in ("raw", "structured"):
+            raise ValueError(f"Unknown PIPELINE_ROUTER_INPUT: {self.router_input}")
+        self.coalesce = os.getenv("PIPELINE_COALESCE", "true").lower() == "true"
+        # Pasted episode logs are cleaned and cut to this many tokens before the Structurer
+        self.preprocess_input = os.getenv("PIPELINE_PREPROCESS_INPUT", "true").lower() == "true"
+        self.input_token_budget = int(os.getenv("STRUCTURER_INPUT_TOKEN_BUDGET", "1500"))
+        self.max_variants = int(os.getenv("PIPELINE_MAX_VARIANTS", "5"))
+        self.flights: SingleFlight[HostEvent] = SingleFlight.from_env()
+        # execute() task per A2A task id, so cancel() can stop the run and its Gemini calls
+        self._running: dict[str, asyncio.Task] = {}
+        # Optional cProfile/tracemalloc around each stage (PIPELINE_PROFILE)
+        self.profiler = get_stage_profiler()
+
+    # Agents are built on first use (or by warm_up()), so the server can open its
+    # port before the Gemini SDK is imported.
+    @cached_property
+    def structurer(self):
+        from agents.structurer_agent import StructurerAgent
+        return StructurerAgent()
+
+    @cached_property
+    def router(self):
+        from agents.router_agent import RouterAgent
+        return RouterAgent()
+
+    @cached_property
+    def speaker(self):
+        from agents.speaker_agent import SpeakerAgent
+        return SpeakerAgent()
+
+    @cached_property
+    def script_writer(self):
+        from agents.script_agent import ScriptAgent
+        return ScriptAgent()
+
+    @cached_property
+    def validator(self):
+        from agents.validator_agent import ValidatorAgent
+        return ValidatorAgent()
+
+    def build_agents(self) -> None:
+        for name in ("structurer", "router", "speaker", "script_writer", "validator"):
+            getattr(self, name)
+
+    async def warm_up(self) -> None:
+        """Builds every agent in a worker thread, keeping the event loop free for requests."""
+        await asyncio.to_thread(self.build_agents)
+
+    @staticmethod
+    def _structure(run: StageRun) -> StructuredInput | None:
+        return parse_output(StructuredInput, run.outputs["Structurer"]) if run.ok("Structurer") else None
+
+    @staticmethod
+    def _decision(run: StageRun) -> SpeakerDecision:
+        decision = parse_output(SpeakerDecision, run.outputs["Router"])
+        return decision or SpeakerDecision(format="Multi-Speaker", reason="Router output unreadable")
+
+    def _router_input(self, run: StageRun, user_input: str) -> str:
+        """Only the fields that decide the format; the raw input if there is no structure."""
+        if not run.ok("Structurer"):
+            return user_input
+        structure = self._structure(run)
+        if structure is None:
+            return run.outputs["Structurer"]
+        return (
+            f"Conflict: {structure.core_conflict}\n"
+            f"Shock moments: {'; '.join(structure.shock_moments)}\n"
+            f"Vibe: {structure.vibe or ''}\n"
+            f"Summary: {structure.summary or ''}"
+        )
+
+    def _script_input(self, run: StageRun, user_input: str) -> str:
+        structure = self._structure(run)
+        decision = self._decision(run)
+        if structure is None:
+            story = run.outputs["Structurer"] if run.ok("Structurer") else user_input
+            story_lines = f"Story: {story}"
+        else:
+            story_lines = (
+                f"Show: {structure.show_title or ''}\n"
+                f"Characters: {', '.join(structure.primary_characters)}\n"
+                f"Conflict: {structure.core_conflict}\n"
+                f"Shock moments: {'; '.join(structure.shock_moments)}\n"
+                f"Vibe: {structure.vibe or decision.vibe or ''}"
+            )
+        return f"{story_lines}\nFormat: {decision.format}\nSpeakers: {run.outputs['Speaker']}"
+
+    @staticmethod
+    def _scripts(run: StageRun, variants: int) -> list[str]:
+        """ScriptWriter candidates; with variants the stage output is a JSON list of them."""
+        output = run.outputs["ScriptWriter"]
+        return json.loads(output) if variants > 1 and run.ok("ScriptWriter") else [output]
+
+    @staticmethod
+    def _ranking(run: StageRun) -> VariantRanking | None:
+        """The Validator's ranking of the candidates, or None if it did not rank any."""
+        ranking = parse_output(VariantRanking, run.outputs["Validator"])
+        return ranking if ranking is not None and ranking.variants else None
+
+    def _validator_input(self, run: StageRun, variants: int) -> str:
+        decision = self._decision(run)
+        genre = decision.vibe or "default"
+        scripts = self._scripts(run, variants)
+        if variants > 1 and run.ok("ScriptWriter"):
+            return ScriptCandidates(scripts=scripts, genre=genre, format=decision.format).model_dump_json()
+        return ScriptResult(script=scripts[0], genre=genre, format=decision.format).model_dump_json()
+
+    async def _prepare_input(self, user_input: str) -> str:
+        """Local log cleanup in front of the Structurer; big pastes are parsed off the event loop."""
+        if len(user_input) > 64 * 1024:
+            prepared = await asyncio.to_thread(prepare_episode_input, user_input, self.input_token_budget)
+        else:
+            prepared = prepare_episode_input(user_input, self.input_token_budget)
+        if prepared is not user_input:
+            logger.info(
+                f"PipelineHost: preprocessed input {estimate_tokens(user_input)} -> {estimate_tokens(prepared)} tokens"
+            )
+        return prepared
+
+    def _build_stages(self, user_input: str, variants: int = 1) -> list[Stage]:
+        """
+        The pipeline as a dependency graph; declaration order is the display order.
+        Structurer and Router/Speaker are independent unless the Router reads the structure.
+        """
+        structured_routing = self.router_input == "structured"
+        return [
+            Stage(
+                name="Structurer",
+                agent=self.structurer,
+                build_input=lambda run: user_input,
+                fallback=f"(Structurer failed — using raw input)\n{user_input}",
+                error="Structurer agent failed",
+                label="Analyzing show structure...",
+            ),
+            Stage(
+                name="Router",
+                agent=self.router,
+                build_input=(lambda run: self._router_input(run, user_input)) if structured_routing
+                else (lambda run: user_input),
+                fallback=SpeakerDecision(format="Multi-Speaker", reason="Router failed (fallback)").model_dump_json(),
+                error="Router agent failed",
+                label="Selecting ad format...",
+                deps=("Structurer",) if structured_routing else (),
+            ),
+            Stage(
+                name="Speaker",
+                agent=self.speaker,
+                build_input=lambda run: run.outputs["Router"],
+                fallback="Speaker 0: High energy narrator (fallback)",
+                error="Speaker agent failed",
+                label="Creating speaker profiles...",
+                deps=("Router",),
+            ),
+            Stage(
+                name="ScriptWriter",
+                agent=self.script_writer,
+                build_input=lambda run: self._script_input(run, user_input),
+                fallback="(Script generation failed)",
+                error="Script writer agent failed",
+                label="Drafting ad script...",
+                deps=("Structurer", "Router", "Speaker"),
+            ),
+            Stage(
+                name="Validator",
+                agent=self.validator,
+                build_input=lambda run: self._validator_input(run, variants),
+                fallback="(Validation skipped)",
+                error="Validator agent failed",
+                label="Validating final script...",
+                deps=("ScriptWriter",),
+            ),
+        ]
+
+    async def _run_step(self, step_name: str, agent, input_text: str, on_chunk=None, variants: int = 1) -> str | None:
+        """Runs a single agent step with isolated error handling — never raises.
+
+        If `on_chunk` is given and the agent streams its output, every text chunk is
+        awaited through `on_chunk(text, first)` as soon as the model produces it.
+        With `variants` > 1 the agent produces that many answers, returned as a JSON list.
+        """
+        started = time.monotonic()
+        trace = f" [trace {trace_id}]" if (trace_id := call_options.get().trace_id) else ""
         try:
-            logger.info(f">>> Running step: {step_name}")
-            result = await agent.run_logic(input_text)
-            logger.info(f">>> Step '{step_name}' completed. Output length: {len(result)}")
+            logger.info(f">>> Running step: {step_name}{trace}")
+            if variants > 1:
+                result = json.dumps(await agent.run_variants(input_text, variants), ensure_ascii=False)
+            elif on_chunk and agent.stream_output:
+                chunks = []
+                async for text in agent.stream_logic(input_text):
+                    await on_chunk(text, not chunks)
+                    chunks.append(text)
+                result = "".join(chunks)
+            else:
+                result = await agent.run_logic(input_text)
+            elapsed = time.monotonic() - started
+            STAGE_LATENCY.labels(step_name, "ok").observe(elapsed, exemplar=trace_exemplar())
+            logger.info(f">>> Step '{step_name}' completed in {elapsed:.2f}s. Output length: {len(result)}{trace}")
             return result
+        except TimeoutError:
+            logger.warning(f">>> Step '{step_name}' ran out of the request's time budget, using its fallback{trace}")
+            reason = "deadline"
+        except CircuitOpenError as e:
+            logger.warning(f">>> Step '{step_name}' skipped ({str(e)}), using its fallback{trace}")
+            reason = "circuit_open"
         except Exception as e:
-            logger.error(f">>> Step '{step_name}' FAILED: {str(e)}", exc_info=True)
-            return None
+            logger.error(f">>> Step '{step_name}' FAILED: {str(e)}{trace}", exc_info=True)
+            reason = "error"
+        STAGE_LATENCY.labels(step_name, "fallback").observe(time.monotonic() - started, exemplar=trace_exemplar())
+        STAGE_FALLBACKS.labels(step_name, reason).inc()
+        return None
 
-    async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
-        logger.info(f"PipelineHost.execute() started for task: {context.task_id}")
+    async def run_pipeline(self, user_input: str, options: CallOptions) -> AsyncIterator[HostEvent]:
+        """
+        Runs all stages for one input and yields task-independent HostEvents,
+        ending with a single `final` event carrying the report.
+        """
+        if self.preprocess_input:
+            user_input = await self._prepare_input(user_input)
 
-        user_input = get_message_text(context.message) if context.message else None
-        if not user_input:
-            logger.warning("PipelineHost: No user input found in context")
-            await event_queue.enqueue_event(new_agent_text_message(text="ERROR: No input received."))
-            return
+        index = get_near_duplicate_index()
+        match = index.lookup(user_input) if index is not None and not options.bypass_cache else None
+        reused = match.outputs if match else {}
+        if match:
+            logger.info(f"PipelineHost: near-duplicate input (similarity {match.similarity:.3f}), reusing {list(reused)}")
 
-        logger.info(f"PipelineHost: Input received ({len(user_input)} chars): {user_input[:80]}...")
+        variants = min(max(options.variants, 1), self.max_variants)
+        stages = self._build_stages(user_input, variants=variants)
+        step_numbers = {stage.name: i for i, stage in enumerate(stages, start=1)}
+        total = len(stages)
+        events: asyncio.Queue[HostEvent | None] = asyncio.Queue()
+
+        async def progress(stage: Stage) -> None:
+            await events.put(HostEvent(
+                kind="progress", stage=stage.name, text=stage.label, step=step_numbers[stage.name], total=total,
+            ))
+
+        async def finished(stage: Stage) -> None:
+            run_state.completed += 1
+            await events.put(HostEvent(
+                kind="progress", stage=stage.name, text=f"{stage.name} done",
+                step=step_numbers[stage.name], total=total, done=True,
+            ))
+
+        stage_seconds: dict[str, float] = {}
+
+        async def run_stage(stage: Stage, input_text: str) -> str | None:
+            if stage.name in reused:
+                return reused[stage.name]
+            started = time.monotonic()
+            try:
+                async with self.profiler.stage(stage.name) if self.profiler else nullcontext():
+                    return await run_agent(stage, input_text)
+            finally:
+                stage_seconds[stage.name] = round(time.monotonic() - started, 4)
+
+        async def run_agent(stage: Stage, input_text: str) -> str | None:
+            if stage.name == "ScriptWriter" and variants > 1:
+                # Candidates are ranked before any of them is shown, so they are not streamed
+                return await self._run_step(stage.name, stage.agent, input_text, variants=variants)
+            if not stage.agent.stream_output:
+                return await self._run_step(stage.name, stage.agent, input_text)
+
+            streamed: list[str] = []
+
+            async def on_chunk(text: str, first: bool) -> None:
+                streamed.append(text)
+                await events.put(HostEvent(kind="chunk", stage=stage.name, text=text, first=first))
+
+            result = await self._run_step(stage.name, stage.agent, input_text, on_chunk=on_chunk)
+            if streamed:
+                # Only an artifact that exists can be ended; it is closed with its full text
+                await events.put(HostEvent(kind="chunk_end", stage=stage.name, text="".join(streamed)))
+            return result
+
+        # Shared by the stage tasks, which inherit it; the governor ranks their calls by it
+        run_state = RunProgress()
+
+        async def produce() -> None:
+            call_options.set(options)
+            run_progress.set(run_state)
+            try:
+                run = await StageScheduler(stages).run(run_stage, on_start=progress, on_finish=finished)
+                data = self._final_data(run)
+                data["stage_seconds"] = stage_seconds
+                ranking = self._ranking(run)
+                if ranking is not None:
+                    data["valid"] = ranking.variants[0].valid
+                    data["variants"] = [variant.model_dump(exclude_none=True) for variant in ranking.variants]
+                if match:
+                    data["near_duplicate"] = {"similarity": round(match.similarity, 3), "reused": list(reused)}
+                elif index is not None and all(run.ok(name) for name in REUSABLE_STAGES):
+                    index.add(user_input, {name: run.outputs[name] for name in REUSABLE_STAGES})
+                await events.put(HostEvent(kind="final", text=self._build_final_output(run, variants), data=data))
+            finally:
+                await events.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    def _final_data(self, run: StageRun) -> dict:
+        decision = self._decision(run)
+        data = {"speaker_format": "multi_speaker" if decision.multi_speaker else "single_speaker"}
+        validation = parse_output(ValidationResult, run.outputs["Validator"])
+        if validation is not None:
+            data["valid"] = validation.valid
+        return data
+
+    def _build_final_output(self, run: StageRun, variants: int = 1) -> str:
+        errors = run.errors
+        structure_model = self._structure(run)
+        if structure_model is None:
+            structure = run.outputs["Structurer"]
+        else:
+            structure = "\n".join(
+                f"- **{label}:** {value}"
+                for label, value in (
+                    ("Title", structure_model.show_title),
+                    ("Characters", ", ".join(structure_model.primary_characters)),
+                    ("Conflict", structure_model.core_conflict),
+                    ("Vibe", structure_model.vibe),
+                    ("Shock moments", "; ".join(structure_model.shock_moments)),
+                    ("Summary", structure_model.summary),
+                )
+                if value
+            )
+        decision = self._decision(run)
+        ad_format = f"{decision.format} ({decision.vibe or 'default'})\n{decision.reason}"
+        speakers = run.outputs["Speaker"]
+        # Without a usable ranking the first candidate stands in for the best one
+        script = self._scripts(run, variants)[0]
+        validation_model = parse_output(ValidationResult, run.outputs["Validator"])
+        variants_section = ""
+        ranking = self._ranking(run)
+        if ranking is not None:
+            best = ranking.variants[0]
+            script = best.script
+            validation_model = ValidationResult(valid=best.valid, issues=best.issues, notes=best.notes)
+            variants_section = "\n### Script Variants\n" + "\n".join(
+                f"{v.rank}. {'APPROVED' if v.valid else 'REJECTED'}"
+                f" (score {v.score if v.score is not None else '-'})"
+                + (f": {'; '.join(v.issues)}" if v.issues else "")
+                for v in ranking.variants
+            ) + "\n"
+        if validation_model is None:
+            validation = run.outputs["Validator"]
+        elif validation_model.valid:
+            validation = "APPROVED" + (f"\n{validation_model.notes}" if validation_model.notes else "")
+        else:
+            validation = "REJECTED\n" + "\n".join(f"- {issue}" for issue in validation_model.issues)
 
-        errors = []
-
-        # Step 1: Structure Input
-        await event_queue.enqueue_event(new_agent_text_message(text="[1/5] Analyzing show structure..."))
-        structure = await self._run_step("Structurer", self.structurer, user_input)
-        if not structure:
-            errors.append("Structurer agent failed")
-            structure = f"(Structurer failed — using raw input)\n{user_input}"
-
-        # Step 2: Route Format
-        await event_queue.enqueue_event(new_agent_text_message(text="[2/5] Selecting ad format..."))
-        ad_format = await self._run_step("Router", self.router, structure)
-        if not ad_format:
-            errors.append("Router agent failed")
-            ad_format = "Multi-Speaker format (fallback)"
-
-        # Step 3: Define Speakers
-        await event_queue.enqueue_event(new_agent_text_message(text="[3/5] Creating speaker profiles..."))
-        speakers = await self._run_step("Speaker", self.speaker, ad_format)
-        if not speakers:
-            errors.append("Speaker agent failed")
-            speakers = "Speaker 0: High energy narrator (fallback)"
-
-        # Step 4: Write Script
-        await event_queue.enqueue_event(new_agent_text_message(text="[4/5] Drafting ad script..."))
-        context_data = f"Structure: {structure}\nFormat: {ad_format}\nSpeakers: {speakers}"
-        script = await self._run_step("ScriptWriter", self.script_writer, context_data)
-        if not script:
-            errors.append("Script writer agent failed")
-            script = "(Script generation failed)"
-
-        # Step 5: Validate Script
-        await event_queue.enqueue_event(new_agent_text_message(text="[5/5] Validating final script..."))
-        validation = await self._run_step("Validator", self.validator, script)
-        if not validation:
-            errors.append("Validator agent failed")
-            validation = "(Validation skipped)"
-
-        # Build final output
         error_section = ""
         if errors:
             error_section = "### ⚠️ Pipeline Warnings\n" + "\n".join(f"- {e}" for e in errors) + "\n\n"
 
-        final_output = f"""{error_section}### Show Structure
+        return f"""{error_section}### Show Structure
 {structure}
 
 ### Ad Format
@@ -99,23 +427,98 @@ class PipelineHost(AgentExecutor):
 
 ### Validation Report
 {validation}
-"""
-
-        logger.info("Enqueueing final output...")
-        await event_queue.enqueue_event(new_agent_text_message(text=final_output))
-
-        if context.current_task:
-            await event_queue.enqueue_event(
-                TaskStatusUpdateEvent(
-                    taskId=context.task_id,
-                    contextId=context.context_id,
-                    status=TaskStatus(state=TaskState.completed),
-                    final=True
-                )
-            )
+{variants_section}"""
+
+    async def execute(self, context: RequestContext, event_queue: EventQueue) -> None:
+        logger.info(f"PipelineHost.execute() started for task: {context.task_id}")
+
+        user_input = get_message_text(context.message) if context.message else None
+        if not user_input:
+            logger.warning("PipelineHost: No user input found in context")
+            await event_queue.enqueue_event(new_agent_text_message(text="ERROR: No input received."))
+            return
+
+        logger.info(f"PipelineHost: Input received ({len(user_input)} chars): {user_input[:80]}...")
+
+        # Progress is published as `working` status updates on a task: a bare Message
+        # is a terminal event for A2A streaming and would end the client stream early.
+        task = context.current_task
+        if not task:
+            task = new_task(context.message)
+            await event_queue.enqueue_event(task)
+        updater = TaskUpdater(event_queue, task.id, task.context_id)
+        self._running[task.id] = asyncio.current_task()
+        try:
+            with PIPELINE_IN_FLIGHT.track_inprogress():
+                await self._publish(user_input, context.message.metadata or {}, task, updater)
+        finally:
+            self._running.pop(task.id, None)
 
         logger.info("PipelineHost: execute() finished successfully.")
 
+    async def _publish(self, user_input: str, metadata: dict, task, updater: TaskUpdater) -> None:
+        """Runs the pipeline for one task and renders its HostEvents as A2A events."""
+        options = CallOptions.from_metadata(metadata)
+        if (recorder := get_cassette_recorder()) is not None:
+            # What a replay re-sends; deadlines and trace ids belong to the original request
+            recorder.record_pipeline(user_input, {k: v for k, v in metadata.items() if k not in VOLATILE_KEYS})
+        if options.trace_id:
+            logger.info(f"PipelineHost: task {task.id} belongs to trace {options.trace_id}")
+        if (remaining := options.remaining()) is not None:
+            logger.info(f"PipelineHost: task {task.id} has {remaining:.1f}s left before its deadline")
+        if self.coalesce:
+            # Identical concurrent requests with similar deadlines share one run; each task
+            # still gets its own events. A joiner's calls are logged under the run's trace id.
+            key = coalesce_key(user_input, metadata)
+            events = self.flights.stream(
+                key, lambda: self.run_pipeline(user_input, options), deadline=options.deadline,
+            )
+        else:
+            events = self.run_pipeline(user_input, options)
+
+        # aclosing() makes a cancelled execute() release the run right away
+        async with aclosing(events):
+            async for event in events:
+                if event.kind == "progress":
+                    await updater.update_status(
+                        TaskState.working,
+                        message=new_agent_text_message(
+                            text=f"[{event.step}/{event.total}] {event.text}",
+                            context_id=task.context_id, task_id=task.id,
+                        ),
+                        metadata={"stage": event.stage, "step": event.step, "total": event.total, "done": event.done},
+                    )
+                elif event.kind in ("chunk", "chunk_end"):
+                    # Streamed stages publish their tokens as chunks of one artifact. The
+                    # last update replaces it with the whole text, so the stored task
+                    # keeps one part instead of one per token.
+                    last = event.kind == "chunk_end"
+                    await updater.add_artifact(
+                        parts=[Part(root=TextPart(text=event.text))],
+                        artifact_id=f"{task.id}-{event.stage}",
+                        name="ad_script" if event.stage == "ScriptWriter" else event.stage,
+                        append=not last and not event.first,
+                        last_chunk=last,
+                    )
+                elif event.kind == "final":
+                    logger.info("Enqueueing final output...")
+                    message = new_agent_text_message(text=event.text, context_id=task.context_id, task_id=task.id)
+                    message.metadata = event.data or None
+                    await updater.complete(message=message)
+
     async def cancel(self, context: RequestContext, event_queue: EventQueue) -> None:
+        """
+        Stops the task's run and marks it canceled. Cancelling execute() closes its
+        pipeline subscription, which cancels in-flight Gemini calls and frees their
+        governor slots unless another coalesced request still needs the run.
+        """
         logger.info(f"PipelineHost: Canceling task {context.task_id}")
-        pass
+        running = self._running.pop(context.task_id, None)
+        if running is not None and not running.done():
+            running.cancel()
+        updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+        await updater.cancel(
+            message=new_agent_text_message(
+                text="Canceled by the caller", context_id=context.context_id, task_id=context.task_id
+            )
+        )
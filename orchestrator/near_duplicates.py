@@ -0,0 +1,169 @@
+import hashlib
+import os
+import re
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime for the universal hash family h(x) = (a*x + b) mod p
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+TIMESTAMP = re.compile(
+    r"\b\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}(?:[ t]\d{1,2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?)?\b|\b\d{1,2}:\d{2}(?::\d{2})?\b"
+)
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalise(text: str) -> str:
+    """Lowercase words only: timestamps, punctuation and whitespace runs do not count as changes."""
+    return NON_WORD.sub(" ", TIMESTAMP.sub(" ", text.lower())).strip()
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    words = normalise(text).split()
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+@dataclass
+class NearDuplicateMatch:
+    key: str
+    similarity: float
+    outputs: dict[str, str]
+
+
+class NearDuplicateIndex:
+    """
+    MinHash + LSH index of pipeline inputs, kept entirely in memory.
+
+    Each entry maps an input's MinHash signature to the stage outputs worth
+    reusing for near-identical inputs. Signatures are split into `bands`;
+    inputs sharing any band become candidates, and the best candidate whose
+    estimated Jaccard similarity reaches `threshold` is returned. The index is
+    an LRU bounded by `max_entries`.
+    """
+
+    def __init__(self, threshold: float = 0.85, max_entries: int = 2048, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+        # Fixed seeds so signatures are comparable across processes and restarts
+        self._params = [
+            (
+                int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % (_PRIME - 1) + 1,
+                int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME,
+            )
+            for i in range(num_perm)
+        ]
+        self._entries: OrderedDict[str, tuple[tuple[int, ...], dict[str, str]]] = OrderedDict()
+        self._buckets: dict[tuple[int, tuple[int, ...]], set[str]] = {}
+
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.last_similarity: float | None = None
+        self._hit_similarity_total = 0.0
+
+    @classmethod
+    def from_env(cls) -> "NearDuplicateIndex":
+        return cls(
+            threshold=float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.85")),
+            max_entries=int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "2048")),
+        )
+
+    def signature(self, text: str) -> tuple[int, ...]:
+        hashes = [
+            int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+            for s in shingles(text)
+        ]
+        if not hashes:
+            return (_MAX_HASH,) * self.num_perm
+        return tuple(min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in self._params)
+
+    def _bands(self, signature: tuple[int, ...]):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows]
+
+    @staticmethod
+    def similarity(left: tuple[int, ...], right: tuple[int, ...]) -> float:
+        """Estimated Jaccard similarity of the two inputs' shingle sets."""
+        return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+    def lookup(self, text: str) -> NearDuplicateMatch | None:
+        self.lookups += 1
+        signature = self.signature(text)
+        candidates: set[str] = set()
+        for band in self._bands(signature):
+            candidates |= self._buckets.get(band, set())
+
+        best: NearDuplicateMatch | None = None
+        for key in candidates:
+            stored, outputs = self._entries[key]
+            score = self.similarity(signature, stored)
+            if best is None or score > best.similarity:
+                best = NearDuplicateMatch(key, score, outputs)
+
+        self.last_similarity = best.similarity if best else 0.0
+        if best is None or best.similarity < self.threshold:
+            return None
+        self.hits += 1
+        self._hit_similarity_total += best.similarity
+        self._entries.move_to_end(best.key)
+        return best
+
+    def add(self, text: str, outputs: dict[str, str]) -> None:
+        signature = self.signature(text)
+        key = hashlib.sha256(normalise(text).encode("utf-8")).hexdigest()
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (signature, dict(outputs))
+        for band in self._bands(signature):
+            self._buckets.setdefault(band, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        signature, _ = self._entries.pop(key)
+        for band in self._bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "evictions": self.evictions,
+            "last_similarity": round(self.last_similarity, 3) if self.last_similarity is not None else None,
+            "mean_hit_similarity": round(self._hit_similarity_total / self.hits, 3) if self.hits else None,
+        }
+
+
+_near_duplicate_index: NearDuplicateIndex | None = None
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex | None:
+    """
+    Process-wide index, or None when NEAR_DUPLICATE_ENABLED=false or while
+    recording a cassette (GEMINI_CASSETTE_RECORD), which must see every call.
+    """
+    global _near_duplicate_index
+    if os.getenv("NEAR_DUPLICATE_ENABLED", "true").lower() != "true" or os.getenv("GEMINI_CASSETTE_RECORD"):
+        return None
+    if _near_duplicate_index is None:
+        _near_duplicate_index = NearDuplicateIndex.from_env()
+    return _near_duplicate_index
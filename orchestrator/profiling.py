@@ -0,0 +1,157 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+# Code under this directory is "ours"; profiles are filtered down to it
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def is_repo_file(filename: str) -> bool:
+    return filename.startswith(str(REPO_ROOT)) and "site-packages" not in filename
+
+
+def top_functions(stats: pstats.Stats, limit: int = 15, sort: str = "tottime") -> list[dict]:
+    """The most expensive functions in this repo's code, from a cProfile run."""
+    rows = [
+        {
+            "function": f"{Path(filename).relative_to(REPO_ROOT)}:{line}({name})",
+            "calls": calls,
+            "tottime": round(tottime, 6),
+            "cumtime": round(cumtime, 6),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items()
+        if is_repo_file(filename)
+    ]
+    rows.sort(key=lambda row: row[sort], reverse=True)
+    return rows[:limit]
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, baseline: tracemalloc.Snapshot | None = None,
+                    limit: int = 15) -> list[dict]:
+    """Lines of this repo's code holding the most memory (or gaining the most since `baseline`)."""
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(True, f"{REPO_ROOT}/*")])
+    if baseline is not None:
+        baseline = baseline.filter_traces([tracemalloc.Filter(True, f"{REPO_ROOT}/*")])
+        entries = snapshot.compare_to(baseline, "lineno")
+    else:
+        entries = snapshot.statistics("lineno")
+    rows = []
+    for entry in entries[:limit]:
+        frame = entry.traceback[0]
+        rows.append({
+            "line": f"{Path(frame.filename).relative_to(REPO_ROOT)}:{frame.lineno}",
+            "bytes": entry.size,
+            "count": entry.count,
+            **({"bytes_diff": entry.size_diff, "count_diff": entry.count_diff} if baseline is not None else {}),
+        })
+    return rows
+
+
+@dataclass
+class StageTotals:
+    runs: int = 0
+    # Time spent waiting for other stages to finish before this one could start
+    queued_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    alloc_bytes: int = 0
+    peak_bytes: int = 0
+
+
+class StageProfiler:
+    """
+    Per-stage profiling hooks for PipelineHost (PIPELINE_PROFILE=cpu,alloc).
+    A stage window spans its awaits, so while profiling, stages run one at a
+    time: stages that could overlap (Router and Structurer) wait for each other
+    instead, and every sample belongs to the stage being measured. The window
+    still sees whatever else the event loop runs meanwhile (event publishing,
+    stream consumers); replays with one request at a time keep that to the
+    stage's own request.
+
+    Every window records wall and process CPU time; `cpu` adds a cProfile per
+    stage, `alloc` net and peak traced memory (tracemalloc).
+    """
+
+    def __init__(self, cpu: bool = True, alloc: bool = False):
+        self.cpu = cpu
+        self.alloc = alloc
+        self.stages: dict[str, StageTotals] = {}
+        self._profiles: dict[str, cProfile.Profile] = {}
+        self._exclusive = asyncio.Lock()
+        if alloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def from_env(cls) -> "StageProfiler":
+        modes = {mode.strip() for mode in os.getenv("PIPELINE_PROFILE", "").lower().split(",") if mode.strip()}
+        return cls(cpu="cpu" in modes, alloc="alloc" in modes)
+
+    @asynccontextmanager
+    async def stage(self, name: str):
+        totals = self.stages.setdefault(name, StageTotals())
+        queued = time.perf_counter()
+        async with self._exclusive:
+            totals.queued_seconds += time.perf_counter() - queued
+            profile = self._profiles.setdefault(name, cProfile.Profile()) if self.cpu else None
+            if self.alloc:
+                tracemalloc.reset_peak()
+                memory_before = tracemalloc.get_traced_memory()[0]
+            wall, cpu = time.perf_counter(), time.process_time()
+            if profile is not None:
+                profile.enable()
+            try:
+                yield
+            finally:
+                if profile is not None:
+                    profile.disable()
+                totals.runs += 1
+                totals.wall_seconds += time.perf_counter() - wall
+                totals.cpu_seconds += time.process_time() - cpu
+                if self.alloc:
+                    current, peak = tracemalloc.get_traced_memory()
+                    totals.alloc_bytes += current - memory_before
+                    totals.peak_bytes = max(totals.peak_bytes, peak - memory_before)
+
+    def reset(self) -> None:
+        self.stages.clear()
+        self._profiles.clear()
+
+    def report(self, limit: int = 15, sort: str = "tottime") -> dict:
+        report = {}
+        for name, totals in self.stages.items():
+            entry = {
+                "runs": totals.runs,
+                "queued_seconds": round(totals.queued_seconds, 4),
+                "wall_seconds": round(totals.wall_seconds, 4),
+                "cpu_seconds": round(totals.cpu_seconds, 4),
+                "cpu_ms_per_run": round(1000 * totals.cpu_seconds / totals.runs, 3) if totals.runs else None,
+            }
+            if self.alloc:
+                entry["alloc_bytes"] = totals.alloc_bytes
+                entry["peak_bytes"] = totals.peak_bytes
+            if name in self._profiles:
+                entry["functions"] = top_functions(pstats.Stats(self._profiles[name]), limit, sort)
+            report[name] = entry
+        return report
+
+
+_stage_profiler: StageProfiler | None = None
+
+
+def get_stage_profiler() -> StageProfiler | None:
+    """
+    Process-wide stage profiler, or None without PIPELINE_PROFILE. Any value
+    times the stages; `cpu` and `alloc` (comma-separated) add cProfile and tracemalloc.
+    """
+    global _stage_profiler
+    if not os.getenv("PIPELINE_PROFILE"):
+        return None
+    if _stage_profiler is None:
+        _stage_profiler = StageProfiler.from_env()
+    return _stage_profiler
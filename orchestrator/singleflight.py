@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from typing import AsyncIterator, Callable, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Per-call values that must not keep otherwise identical requests apart. A joiner
+# runs under the shared run's trace id (its own is only in its caller's logs);
+# deadlines are compared on join instead (SingleFlight.deadline_slack).
+VOLATILE_KEYS = {"deadline", "trace_id"}
+
+
+def coalesce_key(text: str, extra: dict | None = None) -> str:
+    """Key under which requests are coalesced: case/whitespace-insensitive prompt plus options."""
+    normalized = _WHITESPACE.sub(" ", text).strip().casefold()
+    options = {k: v for k, v in (extra or {}).items() if k not in VOLATILE_KEYS}
+    payload = json.dumps([normalized, options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Flight(Generic[T]):
+    def __init__(self):
+        self.events: list[T] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+        # The run's time budget, from the caller that started it (None: unlimited)
+        self.deadline: float | None = None
+
+
+class SingleFlight(Generic[T]):
+    """
+    Shares one run of an async event stream between all concurrent callers with
+    the same key.
+
+    Every subscriber sees the full stream, including events emitted before it
+    joined. A subscriber that goes away only detaches itself; the shared run is
+    cancelled once its last subscriber is gone.
+
+    A caller only joins a run whose deadline is at most `deadline_slack`
+    seconds earlier than its own; otherwise it would get fallbacks when the
+    first caller's budget runs out. It starts a fresh run instead, which
+    later arrivals then join.
+    """
+
+    def __init__(self, deadline_slack: float = 5.0):
+        self.deadline_slack = deadline_slack
+        self._flights: dict[str, _Flight[T]] = {}
+
+    @classmethod
+    def from_env(cls) -> "SingleFlight[T]":
+        return cls(deadline_slack=float(os.getenv("PIPELINE_COALESCE_DEADLINE_SLACK", "5")))
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def _joinable(self, flight: _Flight[T], deadline: float | None) -> bool:
+        flight_deadline = math.inf if flight.deadline is None else flight.deadline
+        own_deadline = math.inf if deadline is None else deadline
+        return flight_deadline >= own_deadline - self.deadline_slack
+
+    async def stream(
+        self, key: str, factory: Callable[[], AsyncIterator[T]], deadline: float | None = None,
+    ) -> AsyncIterator[T]:
+        flight = self._flights.get(key)
+        if flight is not None and self._joinable(flight, deadline):
+            logger.info(f"SingleFlight: joining in-flight run {key[:12]}")
+        else:
+            if flight is not None:
+                logger.info(f"SingleFlight: run {key[:12]} ends too early for this caller, starting another")
+            flight = _Flight()
+            flight.deadline = deadline
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._produce(key, flight, factory))
+
+        flight.subscribers += 1
+        index = 0
+        try:
+            while True:
+                async with flight.changed:
+                    await flight.changed.wait_for(lambda: index < len(flight.events) or flight.done)
+                    pending = flight.events[index:]
+                    finished = flight.done
+                for event in pending:
+                    yield event
+                index += len(pending)
+                if finished and index == len(flight.events):
+                    break
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                logger.info(f"SingleFlight: last subscriber left, cancelling run {key[:12]}")
+                flight.task.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    async def _produce(self, key: str, flight: _Flight[T], factory: Callable[[], AsyncIterator[T]]) -> None:
+        try:
+            async for event in factory():
+                async with flight.changed:
+                    flight.events.append(event)
+                    flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            # Later arrivals start a fresh run instead of replaying a finished one
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done = True
+            async with flight.changed:
+                flight.changed.notify_all()
@@ -0,0 +1,92 @@
+import subprocess
+import sys
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfile:
+    """
+    Wall-clock timings of server startup phases (app build, agent warm-up),
+    from the moment this module is first imported until ready. Import time is
+    only measured on request, in a fresh interpreter (measure_imports).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.ready_after: float | None = None
+        self.error: str | None = None
+        self.slowest_imports: list[dict] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - started, 4)
+
+    def measure_imports(self, module: str, limit: int = 10) -> None:
+        """
+        Imports `module` in a cold interpreter under `-X importtime`: records what
+        its imports cost (its own body excluded) and its slowest direct imports.
+        """
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True,
+        )
+        # Lines are "import time: self | cumulative | name", children before their parent,
+        # each level indented two more spaces
+        rows = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            if not self_us.strip().isdigit():
+                continue
+            depth = (len(name) - len(name.lstrip()) - 1) // 2
+            rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+        top = next((i for i, row in enumerate(rows) if row[:2] == (0, module)), None)
+        if result.returncode or top is None:
+            raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+        first = max((i + 1 for i, row in enumerate(rows[:top]) if row[0] == 0), default=0)
+        direct = sorted((row for row in rows[first:top] if row[0] == 1), key=lambda row: row[3], reverse=True)
+        self.phases["imports"] = round((rows[top][3] - rows[top][2]) / 1e6, 4)
+        self.slowest_imports = [
+            {"module": name, "seconds": round(cumulative / 1e6, 4)} for _, name, _, cumulative in direct[:limit]
+        ]
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_after is not None
+
+    def mark_ready(self) -> None:
+        self.ready_after = round(time.perf_counter() - self.started, 4)
+        logger.info(f"Startup: ready after {self.ready_after:.2f}s {self.phases}")
+
+    def mark_failed(self, error: Exception) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+        logger.error(f"Startup: warm-up failed: {self.error}")
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "seconds_to_ready": self.ready_after,
+            "phases": self.phases,
+            **({"slowest_imports": self.slowest_imports} if self.slowest_imports else {}),
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+_startup_profile: StartupProfile | None = None
+
+
+def get_startup_profile() -> StartupProfile:
+    global _startup_profile
+    if _startup_profile is None:
+        _startup_profile = StartupProfile()
+    return _startup_profile
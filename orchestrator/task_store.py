@@ -0,0 +1,177 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+from collections import OrderedDict
+
+from a2a.server.context import ServerCallContext
+from a2a.server.tasks import TaskStore
+from a2a.types import Task, TaskState
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = {TaskState.completed, TaskState.canceled, TaskState.failed, TaskState.rejected}
+
+
+class SQLiteTaskStore(TaskStore):
+    """
+    Task store backed by SQLite with a bounded in-memory hot cache.
+
+    Tasks are stored as zlib-compressed JSON. Running tasks are saved on every
+    event, so their writes are batched to at most one per `flush_interval`;
+    a task reaching a terminal state is written immediately. Finished tasks are
+    deleted after `completed_ttl`, and the oldest finished tasks are dropped
+    once the table holds more than `max_tasks`.
+
+    With `shared`, several server processes use the same database file: running
+    tasks owned by another process are always re-read from the database instead
+    of being served from this process's hot cache.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        hot_size: int = 256,
+        completed_ttl: float = 7 * 24 * 3600,
+        max_tasks: int = 100_000,
+        flush_interval: float = 1.0,
+        cleanup_interval: float = 60.0,
+        shared: bool = False,
+    ):
+        self.path = path
+        self.hot_size = hot_size
+        self.completed_ttl = completed_ttl
+        self.max_tasks = max_tasks
+        self.flush_interval = flush_interval
+        self.cleanup_interval = cleanup_interval
+        self.shared = shared
+
+        self._hot: OrderedDict[str, Task] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flushed_at: dict[str, float] = {}
+        # Tasks saved by this process; only these can be stale in another process's cache
+        self._local: set[str] = set()
+        self._last_cleanup = 0.0
+
+        self._db_lock = threading.Lock()
+        # Writers from other processes hold the lock briefly; wait for it rather than fail
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "task_id TEXT PRIMARY KEY, state TEXT NOT NULL, terminal INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS tasks_terminal_updated ON tasks (terminal, updated_at)")
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "SQLiteTaskStore":
+        return cls(
+            path=os.getenv("TASK_STORE_PATH", "tasks.db"),
+            hot_size=int(os.getenv("TASK_STORE_HOT_SIZE", "256")),
+            completed_ttl=float(os.getenv("TASK_STORE_TTL_SECONDS", str(7 * 24 * 3600))),
+            max_tasks=int(os.getenv("TASK_STORE_MAX_TASKS", "100000")),
+            shared=os.getenv("TASK_STORE_SHARED", "false").lower() == "true",
+        )
+
+    async def save(self, task: Task, context: ServerCallContext | None = None) -> None:
+        self._remember(task)
+        self._local.add(task.id)
+        now = time.monotonic()
+        terminal = task.status.state in TERMINAL_STATES
+        if terminal or now - self._flushed_at.get(task.id, 0.0) >= self.flush_interval:
+            await self._flush(task)
+        else:
+            self._dirty.add(task.id)
+
+        evicted = []
+        while len(self._hot) > self.hot_size:
+            task_id, old = self._hot.popitem(last=False)
+            self._local.discard(task_id)
+            if task_id in self._dirty:
+                evicted.append(old)
+            self._flushed_at.pop(task_id, None)
+        for old in evicted:
+            await self._flush(old)
+
+        if now - self._last_cleanup >= self.cleanup_interval:
+            self._last_cleanup = now
+            # Running tasks that went quiet still get their latest state persisted
+            for task_id in list(self._dirty):
+                if task_id in self._hot:
+                    await self._flush(self._hot[task_id])
+            await asyncio.to_thread(self._db_cleanup)
+
+    async def get(self, task_id: str, context: ServerCallContext | None = None) -> Task | None:
+        task = self._hot.get(task_id)
+        if task is not None and (
+            not self.shared or task_id in self._local or task.status.state in TERMINAL_STATES
+        ):
+            self._hot.move_to_end(task_id)
+            return task
+        payload = await asyncio.to_thread(self._db_get, task_id)
+        if payload is None:
+            return None
+        task = Task.model_validate_json(zlib.decompress(payload))
+        self._remember(task)
+        return task
+
+    async def delete(self, task_id: str, context: ServerCallContext | None = None) -> None:
+        self._hot.pop(task_id, None)
+        self._local.discard(task_id)
+        self._dirty.discard(task_id)
+        self._flushed_at.pop(task_id, None)
+        await asyncio.to_thread(self._db_delete, task_id)
+
+    def _remember(self, task: Task) -> None:
+        self._hot[task.id] = task
+        self._hot.move_to_end(task.id)
+
+    async def _flush(self, task: Task) -> None:
+        payload = zlib.compress(task.model_dump_json(exclude_none=True).encode("utf-8"))
+        terminal = task.status.state in TERMINAL_STATES
+        await asyncio.to_thread(self._db_put, task.id, task.status.state.value, terminal, payload)
+        self._dirty.discard(task.id)
+        self._flushed_at[task.id] = time.monotonic()
+        if terminal:
+            # Finished tasks are never written again, so stop tracking their flush time
+            self._flushed_at.pop(task.id, None)
+
+    def _db_put(self, task_id: str, state: str, terminal: bool, payload: bytes) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO tasks (task_id, state, terminal, updated_at, payload) VALUES (?, ?, ?, ?, ?)",
+                (task_id, state, int(terminal), time.time(), payload),
+            )
+            self._db.commit()
+
+    def _db_get(self, task_id: str) -> bytes | None:
+        with self._db_lock:
+            row = self._db.execute("SELECT payload FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def _db_delete(self, task_id: str) -> None:
+        with self._db_lock:
+            self._db.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            self._db.commit()
+
+    def _db_cleanup(self) -> None:
+        with self._db_lock:
+            expired = self._db.execute(
+                "DELETE FROM tasks WHERE terminal = 1 AND updated_at < ?", (time.time() - self.completed_ttl,)
+            ).rowcount
+            (count,) = self._db.execute("SELECT COUNT(*) FROM tasks").fetchone()
+            overflow = 0
+            if count > self.max_tasks:
+                overflow = self._db.execute(
+                    "DELETE FROM tasks WHERE task_id IN ("
+                    "SELECT task_id FROM tasks WHERE terminal = 1 ORDER BY updated_at LIMIT ?)",
+                    (count - self.max_tasks,),
+                ).rowcount
+            self._db.commit()
+        if expired or overflow:
+            logger.info(f"SQLiteTaskStore: evicted {expired} expired and {overflow} overflow tasks")
@@ -0,0 +1,182 @@
+"""
+Profiles the orchestration code on recorded Gemini traffic, with no network
+and no model latency hiding Python-side costs.
+
+Record a corpus from a production-like run (any backend; one file per process).
+Recording turns off the response cache and near-duplicate reuse, so every
+call the pipeline needs reaches the model and is written down:
+
+    GEMINI_CASSETTE_RECORD=cassettes/ python a2a_server.py
+
+then replay it:
+
+    python replay_cli.py cassettes/ --repeat 5 --profile cpu,alloc --output profile.json
+    python replay_cli.py cassettes/ --scope stages --sort cumtime
+    python replay_cli.py cassettes/ --timing original --concurrency 8
+
+Every recorded pipeline input is posted to main.py's streaming endpoint in
+this process (PIPELINE_MODE=inprocess, GEMINI_BACKEND=replay), so the
+request is handled and its SSE stream consumed exactly as in production.
+--scope run (default) profiles the whole replay, API and event loop
+included; --scope stages profiles each pipeline stage on its own
+(orchestrator/profiling.py). Either way the report has CPU time per request
+and per stage, the hottest functions and allocation sites in this repo's
+code, and cassette misses: inputs the current code sent that were never
+recorded, which fall back like failed calls.
+"""
+import argparse
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+
+import httpx
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("replay_cli")
+
+load_dotenv()
+
+
+def request_for(record: dict) -> tuple[dict, dict]:
+    """JSON body and headers that make main.py send the recorded input and metadata to the pipeline."""
+    metadata = record.get("metadata") or {}
+    body = {"prompt": record["input"], "variants": int(metadata.get("variants", 1))}
+    # Replays measure the pipeline, not the response cache
+    headers = {"X-Cache-Bypass": "1", "X-Priority": metadata.get("priority", "interactive")}
+    if metadata.get("tenant"):
+        headers["X-Tenant-Id"] = metadata["tenant"]
+    return body, headers
+
+
+async def replay(client: httpx.AsyncClient, records: list[dict], concurrency: int) -> list[bool]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(record: dict) -> bool:
+        body, headers = request_for(record)
+        async with semaphore:
+            response = await client.post("/api/generate-script/stream", json=body, headers=headers)
+        return response.status_code == 200 and "event: result" in response.text
+
+    return await asyncio.gather(*(one(record) for record in records))
+
+
+async def run(args) -> dict:
+    os.environ.update({
+        "GEMINI_BACKEND": "replay",
+        "GEMINI_CASSETTE": args.cassette,
+        "GEMINI_CASSETTE_TIMING": args.timing,
+        "PIPELINE_MODE": "inprocess",
+        "PIPELINE_PROFILE": ",".join(["times", *(m for m in args.profile if m != "cpu" or args.scope == "stages")]),
+        # A replayed call costs no quota, and a hedge would consume a recorded answer
+        "GEMINI_RPM_LIMIT": "1000000",
+        "GEMINI_TPM_LIMIT": "1000000000000",
+        "GEMINI_HEDGE_ENABLED": "false",
+        # Repeated inputs must run every stage again, each in a run of its own
+        "NEAR_DUPLICATE_ENABLED": "false",
+        "PIPELINE_COALESCE": "false",
+    })
+    os.environ.pop("GEMINI_CASSETTE_RECORD", None)
+    # Imported only now: the app and its agents read the settings above
+    from agents.cassette import get_cassette
+    from main import app, pipeline_runner
+    from orchestrator.profiling import get_stage_profiler, top_allocations, top_functions
+
+    cassette = get_cassette()
+    if not cassette.pipelines:
+        raise SystemExit(f"{args.cassette}: no recorded pipeline inputs to replay")
+    profiler = get_stage_profiler()
+    await pipeline_runner.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=None) as client:
+        # First requests build the agents and warm caches; they are not measured
+        await replay(client, cassette.pipelines[:args.warmup], 1)
+        cassette.rewind()
+        profiler.reset()
+        cassette.hits = cassette.misses = 0
+
+        records = cassette.pipelines * args.repeat
+        whole_run = cProfile.Profile() if "cpu" in args.profile and args.scope == "run" else None
+        baseline = tracemalloc.take_snapshot() if "alloc" in args.profile else None
+        if baseline is not None:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        wall, cpu = time.perf_counter(), time.process_time()
+        if whole_run is not None:
+            whole_run.enable()
+        try:
+            results = []
+            for _ in range(args.repeat):
+                results += await replay(client, cassette.pipelines, args.concurrency)
+                cassette.rewind()
+        finally:
+            if whole_run is not None:
+                whole_run.disable()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        if baseline is not None:
+            peak_traced = tracemalloc.get_traced_memory()[1] - traced_before
+            snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, __file__)])
+    await pipeline_runner.close()
+
+    report = {
+        "cassette": cassette.stats(),
+        "config": {
+            "repeat": args.repeat, "concurrency": args.concurrency, "timing": args.timing,
+            "profile": args.profile, "scope": args.scope,
+        },
+        "requests": len(records),
+        "errors": results.count(False),
+        "wall_seconds": round(wall, 4),
+        "cpu_seconds": round(cpu, 4),
+        "cpu_ms_per_request": round(1000 * cpu / len(records), 3),
+        "stages": profiler.report(args.top, args.sort),
+    }
+    if whole_run is not None:
+        report["functions"] = top_functions(pstats.Stats(whole_run), args.top, args.sort)
+    if baseline is not None:
+        report["memory"] = {
+            "peak_traced_bytes": peak_traced,
+            "top_allocations": top_allocations(snapshot, baseline, args.top),
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a Gemini cassette corpus and profile the orchestration code.")
+    parser.add_argument("cassette", help="cassette file or directory of cassettes")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the corpus")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="requests in flight; 1 keeps other requests out of per-stage numbers")
+    parser.add_argument("--warmup", type=int, default=1, help="recorded inputs replayed before measuring")
+    parser.add_argument("--timing", choices=["instant", "original"], default="instant",
+                        help="answer at once, or after each call's recorded latency")
+    parser.add_argument("--profile", default="cpu", help="comma-separated: cpu (cProfile), alloc (tracemalloc)")
+    parser.add_argument("--scope", choices=["run", "stages"], default="run",
+                        help="one cProfile over the whole replay, or one per pipeline stage")
+    parser.add_argument("--sort", choices=["tottime", "cumtime"], default="tottime")
+    parser.add_argument("--top", type=int, default=15, help="functions and allocation sites to list")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    args.profile = [mode.strip() for mode in args.profile.split(",") if mode.strip()]
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        logger.warning(f"Report written to {args.output}")
+    else:
+        print(text)
+    if report["cassette"]["misses"]:
+        logger.warning(f"{report['cassette']['misses']} calls were not in the cassette; their stages fell back")
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
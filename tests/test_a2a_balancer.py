@@ -0,0 +1,90 @@
+import time
+
+import httpx
+import pytest
+
+from api.a2a_client import A2ABalancer, A2AClientPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def balancer(count: int = 3, **kwargs) -> A2ABalancer:
+    return A2ABalancer([A2AClientPool(f"http://worker-{i}/") for i in range(count)], **kwargs)
+
+
+async def test_picks_backend_with_fewest_outstanding_calls():
+    lb = balancer()
+    busy, idle, _ = lb.backends
+    async with lb.lease(busy), lb.lease(busy), lb.lease(lb.backends[2]):
+        assert lb.pick() is idle
+        assert lb.pick(exclude={idle}) is lb.backends[2]
+    assert busy.outstanding == 0
+    assert busy.requests == 2
+
+
+def test_failed_backend_is_ejected_with_backoff(clock):
+    lb = balancer(2, eject_seconds=10.0)
+    failing, healthy = lb.backends
+    lb.record_failure(failing)
+    assert not failing.available
+    assert all(lb.pick() is healthy for _ in range(10))
+
+    clock[0] += 10.0
+    assert failing.available
+    lb.record_failure(failing)
+    clock[0] += 10.0
+    # The second failure in a row ejects for twice as long
+    assert not failing.available
+
+    lb.record_success(failing)
+    assert failing.available
+    assert failing.failures == 0
+
+
+def test_least_recently_failed_backend_is_tried_when_all_are_ejected(clock):
+    lb = balancer(2)
+    first, second = lb.backends
+    lb.record_failure(first)
+    clock[0] += 1.0
+    lb.record_failure(second)
+    assert lb.pick() is first
+
+
+def test_single_backend_is_never_ejected():
+    lb = balancer(1)
+    lb.record_failure(lb.backends[0])
+    assert lb.backends[0].available
+
+
+def test_tasks_stick_to_their_backend():
+    lb = balancer(3, max_sticky=2)
+    lb.bind("task-1", lb.backends[2])
+    lb.bind("task-2", lb.backends[2])
+    assert lb.backend_for("task-1") is lb.backends[2]
+
+    lb.bind("task-3", lb.backends[1])
+    # Only the `max_sticky` most recent tasks are remembered
+    assert lb.stats()["sticky_tasks"] == 2
+    assert lb.backend_for("task-2") is lb.backends[2]
+
+
+async def test_health_check_ejects_and_restores(clock):
+    lb = balancer(2)
+    backend = lb.backends[0]
+    status = [503]
+    backend.pool._http_client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(status[0], json={}))
+    )
+
+    await lb._check(backend)
+    assert not backend.available
+
+    status[0] = 200
+    await lb._check(backend)
+    assert backend.available
+    await backend.pool.close()
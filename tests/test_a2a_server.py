@@ -0,0 +1,19 @@
+import a2a_server
+
+
+def test_importing_the_server_builds_no_app():
+    # A2A_WORKERS supervisors import the module but must not open the task store
+    assert a2a_server._app is None
+
+
+def test_quota_is_split_across_workers(monkeypatch):
+    monkeypatch.setenv("GEMINI_RPM_LIMIT", "60")
+    monkeypatch.setenv("GEMINI_TPM_LIMIT", "1000000")
+    monkeypatch.setenv("GEMINI_MAX_IN_FLIGHT", "8")
+    assert a2a_server.split_quota(4) == {
+        "GEMINI_RPM_LIMIT": "15.0",
+        "GEMINI_TPM_LIMIT": "250000.0",
+        "GEMINI_MAX_IN_FLIGHT": "2",
+    }
+    # Every worker keeps at least one call in flight
+    assert a2a_server.split_quota(16)["GEMINI_MAX_IN_FLIGHT"] == "1"
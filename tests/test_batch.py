@@ -0,0 +1,129 @@
+import argparse
+import asyncio
+import json
+
+import pytest
+
+import batch_cli
+from api.batch import PipelineRunError, collect_result, run_batch
+from api.schemas import PipelineEvent, ScriptResponse
+
+
+def result(script: str) -> ScriptResponse:
+    return ScriptResponse(script=script, genre="kukufm_drama", speaker_format="single_speaker")
+
+
+async def pipeline(prompt: str):
+    """Fake pipeline run: fails for prompts starting with "fail", else echoes the prompt."""
+    await asyncio.sleep(0)
+    yield PipelineEvent(event="progress", step=1, text="[1/1] ScriptWriter")
+    if prompt.startswith("fail"):
+        yield PipelineEvent(event="error", detail=f"{prompt} went wrong")
+    else:
+        yield PipelineEvent(event="result", result=result(prompt))
+
+
+class Runner:
+    """Stands in for the pipeline runner batch_cli creates; records what it was asked to run."""
+
+    def __init__(self):
+        self.prompts: list[str] = []
+        self.metadata: list[dict] = []
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def stream(self, prompt: str, metadata: dict):
+        self.prompts.append(prompt)
+        self.metadata.append(metadata)
+        return pipeline(prompt)
+
+
+async def test_collect_result_raises_on_error_or_missing_result():
+    assert (await collect_result(pipeline("hello"))).script == "hello"
+    with pytest.raises(PipelineRunError, match="fail-1 went wrong"):
+        await collect_result(pipeline("fail-1"))
+
+    async def empty():
+        yield PipelineEvent(event="progress", step=1)
+
+    with pytest.raises(PipelineRunError):
+        await collect_result(empty())
+
+
+async def test_failed_items_do_not_stop_the_batch():
+    items = [("1", "one"), ("2", "fail-2"), ("3", "three")]
+    results = {r.id: r async for r in run_batch(items, pipeline, concurrency=2)}
+
+    assert results["1"].status == "ok" and results["1"].result.script == "one"
+    assert results["2"].status == "error" and "fail-2 went wrong" in results["2"].error
+    assert results["3"].status == "ok"
+
+
+async def test_concurrency_is_bounded():
+    in_flight = peak = 0
+
+    async def slow(prompt: str):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        yield PipelineEvent(event="result", result=result(prompt))
+
+    items = [(str(i), f"prompt {i}") for i in range(10)]
+    results = [r async for r in run_batch(items, slow, concurrency=3)]
+    assert len(results) == 10
+    assert peak == 3
+
+
+def test_csv_catalog_splits_peak_moments(tmp_path):
+    catalog = tmp_path / "catalog.csv"
+    catalog.write_text("id,episode_summary,peak_moments\nep1,A summary,first | second\n,Another,\n", encoding="utf-8")
+
+    rows = list(batch_cli.read_catalog(str(catalog)))
+    assert rows[0][0] == "ep1"
+    assert rows[0][1]["peak_moments"] == ["first", "second"]
+    # Rows without an id fall back to their position
+    assert rows[1][0] == "1"
+    assert rows[1][1]["peak_moments"] == []
+
+
+def test_checkpoint_counts_only_successes_and_tolerates_a_torn_line(tmp_path):
+    output = tmp_path / "scripts.jsonl"
+    output.write_text(
+        '{"id": "a", "status": "ok"}\n'
+        '{"id": "b", "status": "error", "error": "boom"}\n'
+        '{"id": "c", "sta',
+        encoding="utf-8",
+    )
+    assert batch_cli.read_checkpoint(str(output)) == {"a"}
+    assert batch_cli.read_checkpoint(str(tmp_path / "missing.jsonl")) == set()
+
+
+async def test_rerun_resumes_after_the_last_success(tmp_path, monkeypatch):
+    catalog = tmp_path / "catalog.jsonl"
+    catalog.write_text(
+        "\n".join(json.dumps({"id": i, "prompt": p}) for i, p in [("a", "one"), ("c", "three"), ("b", "fail-b")]),
+        encoding="utf-8",
+    )
+    output = tmp_path / "scripts.jsonl"
+    output.write_text('{"id": "a", "status": "ok", "result": {"script": "one"}}\n{"id": "c", "sta', encoding="utf-8")
+    runner = Runner()
+    monkeypatch.setattr(batch_cli, "create_pipeline_runner", lambda mode: runner)
+
+    args = argparse.Namespace(catalog=str(catalog), output=str(output), concurrency=1, mode=None)
+    assert await batch_cli.main(args) == 1
+
+    assert runner.prompts == ["three", "fail-b"]
+    assert all(metadata == batch_cli.BATCH_METADATA for metadata in runner.metadata)
+    # The torn line left by the crash does not swallow the first new record
+    assert batch_cli.read_checkpoint(str(output)) == {"a", "c"}
+
+    # The failed item is retried on the next run, and nothing else
+    runner.prompts.clear()
+    await batch_cli.main(args)
+    assert runner.prompts == ["fail-b"]
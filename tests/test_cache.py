@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+import agents.cache
+from agents.cache import ResponseCache, get_response_cache
+from agents.call_context import CallOptions, call_options
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    monkeypatch.setenv("GEMINI_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_MODEL_LATENCY", "fixed:0")
+    monkeypatch.setenv("GEMINI_HEDGE_ENABLED", "false")
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    monkeypatch.setenv("GEMINI_CACHE_ENABLED", "true")
+    monkeypatch.delenv("GEMINI_CASSETTE_RECORD", raising=False)
+    cache = ResponseCache()
+    monkeypatch.setattr(agents.cache, "_response_cache", cache)
+    return cache
+
+
+async def test_memory_tier_evicts_least_recently_used_entry():
+    cache = ResponseCache(max_entries=2)
+    await cache.set("a", "1")
+    await cache.set("b", "2")
+    assert await cache.get("a") == "1"
+    await cache.set("c", "3")
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == "1"
+    assert await cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_memory_tier_is_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=10)
+    await cache.set("a", "x" * 6)
+    await cache.set("b", "y" * 6)
+    await cache.set("huge", "z" * 11)
+
+    assert await cache.get("a") is None
+    assert await cache.get("b") == "y" * 6
+    # A value larger than the whole budget is never kept
+    assert await cache.get("huge") is None
+    assert cache.stats()["bytes"] == 6
+
+
+async def test_entries_expire_after_ttl(clock):
+    cache = ResponseCache(ttl=60.0)
+    await cache.set("key", "value")
+    clock[0] += 59
+    assert await cache.get("key") == "value"
+    clock[0] += 2
+    assert await cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+async def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    await ResponseCache(sqlite_path=path).set("key", "value")
+
+    restarted = ResponseCache(sqlite_path=path)
+    assert await restarted.get("key") == "value"
+    assert await restarted.get("key") == "value"
+    assert restarted.stats()["hits_disk"] == 1
+    assert restarted.stats()["hits_memory"] == 1
+
+
+async def test_disk_hit_keeps_stored_expiry(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    await ResponseCache(ttl=60.0, sqlite_path=path).set("key", "value")
+
+    clock[0] += 50
+    restarted = ResponseCache(ttl=60.0, sqlite_path=path)
+    assert await restarted.get("key") == "value"
+    # Promoted to memory with 10s left, not a fresh 60s
+    clock[0] += 11
+    assert await restarted.get("key") is None
+
+
+def test_key_depends_on_every_part_of_the_call():
+    key = ResponseCache.make_key("model", "system", {"temperature": 0}, "input")
+    assert key == ResponseCache.make_key("model", "system", {"temperature": 0}, "input")
+    assert key != ResponseCache.make_key("model", "system", {"temperature": 1}, "input")
+    assert key != ResponseCache.make_key("model", "other", {"temperature": 0}, "input")
+    assert key != ResponseCache.make_key("model", "system", {"temperature": 0}, "other")
+
+
+def test_no_cache_while_recording_a_cassette(monkeypatch, response_cache):
+    assert get_response_cache() is response_cache
+    monkeypatch.setenv("GEMINI_CASSETTE_RECORD", "cassette.jsonl.gz")
+    assert get_response_cache() is None
+
+
+def test_no_cache_when_disabled(monkeypatch, response_cache):
+    monkeypatch.setenv("GEMINI_CACHE_ENABLED", "false")
+    assert get_response_cache() is None
+
+
+def test_only_deterministic_agents_are_cacheable(fake_backend, response_cache):
+    from agents.router_agent import RouterAgent
+    from agents.script_agent import ScriptAgent
+    from agents.speaker_agent import SpeakerAgent
+    from agents.structurer_agent import StructurerAgent
+    from agents.validator_agent import ValidatorAgent
+
+    for agent_class in (StructurerAgent, RouterAgent, SpeakerAgent):
+        assert agent_class()._cache_key("input") is not None
+    for agent_class in (ScriptAgent, ValidatorAgent):
+        assert agent_class()._cache_key("input") is None
+
+
+async def test_repeated_call_is_served_from_cache(fake_backend, response_cache):
+    from agents.structurer_agent import StructurerAgent
+
+    agent = StructurerAgent()
+    first = await agent.run_logic("an episode")
+    assert await agent.run_logic("an episode") == first
+    assert response_cache.stats()["hits_memory"] == 1
+
+
+def test_bypass_skips_cache_and_is_counted(fake_backend, response_cache):
+    from agents.structurer_agent import StructurerAgent
+
+    token = call_options.set(CallOptions(bypass_cache=True))
+    try:
+        assert StructurerAgent()._cache_key("input") is None
+    finally:
+        call_options.reset(token)
+    assert response_cache.stats()["bypasses"] == 1
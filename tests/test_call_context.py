@@ -0,0 +1,30 @@
+import pytest
+
+from agents.call_context import CallOptions
+
+
+def test_reads_metadata_sent_by_the_api():
+    options = CallOptions.from_metadata({
+        "cache_bypass": True, "variants": 3, "deadline": 1700000000.5,
+        "trace_id": "abc", "priority": "batch", "tenant": "acme",
+    })
+    assert options == CallOptions(
+        bypass_cache=True, variants=3, deadline=1700000000.5, trace_id="abc", priority="batch", tenant="acme",
+    )
+
+
+@pytest.mark.parametrize("variants, expected", [
+    ("2", 2), (2.9, 2), ("many", 1), ("2.5", 1), (None, 1), ([3], 1), (True, 1), (0, 1), (-4, 1),
+])
+def test_malformed_variants_fall_back(variants, expected):
+    assert CallOptions.from_metadata({"variants": variants}).variants == expected
+
+
+@pytest.mark.parametrize("deadline", ["soon", float("nan"), float("inf"), {"at": 1}, 0])
+def test_malformed_deadline_is_ignored(deadline):
+    assert CallOptions.from_metadata({"deadline": deadline}).deadline is None
+
+
+def test_unknown_priority_is_interactive():
+    assert CallOptions.from_metadata({"priority": "urgent"}).priority == "interactive"
+    assert CallOptions.from_metadata(None) == CallOptions()
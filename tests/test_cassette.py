@@ -0,0 +1,140 @@
+import gzip
+import json
+
+import pytest
+
+from agents.cassette import (
+    Cassette, CassetteMiss, CassetteRecorder, RecordedError, RecordingModel, ReplayModel, read_cassette,
+)
+from agents.fake_model import FakeGenerativeModel, FakeModelConfig, LatencyDistribution
+
+MODEL = "gemini-1.5-flash"
+SYSTEM = "You are a test agent."
+
+
+def fake_model(error_rate: float = 0.0) -> FakeGenerativeModel:
+    config = FakeModelConfig(latency=LatencyDistribution("fixed", 0.0), error_rate=error_rate,
+                             response_words=12, chunk_words=4, seed=1)
+    return FakeGenerativeModel(MODEL, SYSTEM, config=config)
+
+
+def recording(tmp_path, model=None) -> tuple[RecordingModel, CassetteRecorder]:
+    recorder = CassetteRecorder(str(tmp_path / "calls.jsonl.gz"))
+    return RecordingModel(model or fake_model(), MODEL, SYSTEM, {}, recorder), recorder
+
+
+def replay(path) -> ReplayModel:
+    return ReplayModel(MODEL, SYSTEM, cassette=Cassette(str(path)))
+
+
+async def stream_text(response) -> list[str]:
+    return [chunk.text async for chunk in response]
+
+
+async def test_unary_call_replays_with_its_recorded_answer(tmp_path):
+    model, recorder = recording(tmp_path)
+    live = await model.generate_content_async("an episode")
+    recorder.record_pipeline("an episode", {"priority": "batch"})
+    recorder.close()
+    assert recorder.stats()["calls"] == 1
+
+    replayed = await replay(recorder.path).generate_content_async("an episode")
+    assert replayed.text == live.text
+    assert replayed.usage_metadata.total_token_count == live.usage_metadata.total_token_count
+    assert Cassette(str(recorder.path)).pipelines == [
+        {"kind": "pipeline", "input": "an episode", "metadata": {"priority": "batch"}}
+    ]
+
+
+async def test_stream_replays_chunk_by_chunk(tmp_path):
+    model, recorder = recording(tmp_path)
+    live = await stream_text(await model.generate_content_async("an episode", stream=True))
+    recorder.close()
+    assert len(live) > 1
+
+    replayer = replay(recorder.path)
+    assert await stream_text(await replayer.generate_content_async("an episode", stream=True)) == live
+    # A streamed recording also answers a unary call with the joined text
+    replayer.cassette.rewind()
+    assert (await replayer.generate_content_async("an episode")).text == "".join(live)
+
+
+async def test_unary_recording_replays_as_a_stream(tmp_path):
+    model, recorder = recording(tmp_path)
+    live = await model.generate_content_async("an episode")
+    recorder.close()
+
+    chunks = await stream_text(await replay(recorder.path).generate_content_async("an episode", stream=True))
+    assert "".join(chunks) == live.text
+
+
+async def test_recorded_error_fails_again_on_replay(tmp_path):
+    model, recorder = recording(tmp_path, fake_model(error_rate=1.0))
+    with pytest.raises(Exception, match="fake upstream unavailable"):
+        await model.generate_content_async("an episode")
+    recorder.close()
+
+    with pytest.raises(RecordedError, match="FakeModelError"):
+        await replay(recorder.path).generate_content_async("an episode")
+
+
+async def test_abandoned_stream_is_not_recorded(tmp_path):
+    model, recorder = recording(tmp_path)
+    stream = await model.generate_content_async("an episode", stream=True)
+    await anext(stream)
+    await stream.aclose()
+    recorder.close()
+    assert recorder.stats()["calls"] == 0
+
+
+async def test_repeated_calls_are_served_in_turn_until_rewound(tmp_path):
+    model, recorder = recording(tmp_path)
+    first = (await model.generate_content_async("an episode")).text
+    second = (await model.generate_content_async("an episode")).text
+    recorder.close()
+    assert first != second
+
+    replayer = replay(recorder.path)
+    answers = [(await replayer.generate_content_async("an episode")).text for _ in range(3)]
+    assert answers == [first, second, first]
+    replayer.cassette.rewind()
+    assert (await replayer.generate_content_async("an episode")).text == first
+
+
+async def test_unknown_input_or_config_is_a_miss(tmp_path):
+    model, recorder = recording(tmp_path)
+    await model.generate_content_async("an episode")
+    recorder.close()
+
+    replayer = replay(recorder.path)
+    with pytest.raises(CassetteMiss):
+        await replayer.generate_content_async("another episode")
+    with pytest.raises(CassetteMiss):
+        await replayer.generate_content_async("an episode", generation_config={"temperature": 0.1})
+    assert replayer.cassette.stats()["misses"] == 2
+
+
+async def test_corpus_directory_and_truncated_tail(tmp_path):
+    model, recorder = recording(tmp_path)
+    await model.generate_content_async("first")
+    await model.generate_content_async("second")
+    recorder.close()
+    # A recorder killed mid-write: the gzip stream ends inside the second record
+    data = recorder.path.read_bytes()
+    recorder.path.write_bytes(data[:len(data) - 20])
+
+    other = tmp_path / "nested" / "other.jsonl.gz"
+    other.parent.mkdir()
+    with gzip.open(other, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"kind": "pipeline", "input": "third", "metadata": {}}) + "\n")
+
+    records = list(read_cassette(str(tmp_path)))
+    assert [r["input"] for r in records if r["kind"] == "call"] == ["first"]
+    assert [r["input"] for r in records if r["kind"] == "pipeline"] == ["third"]
+
+
+def test_recorder_given_a_directory_writes_one_file_per_process(tmp_path):
+    recorder = CassetteRecorder(str(tmp_path / "corpus"))
+    recorder.close()
+    assert recorder.path.parent == tmp_path / "corpus"
+    assert recorder.path.name.endswith(".jsonl.gz")
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from orchestrator.dag import Stage, StageScheduler
+
+
+def stage(name: str, deps: tuple[str, ...] = ()) -> Stage:
+    return Stage(name, agent=None, build_input=lambda run: " ".join(run.outputs[d] for d in deps) or name,
+                 fallback=f"{name}-fallback", error=f"{name} failed", deps=deps)
+
+
+class Runner:
+    """Stage runner that records its calls; `first` answers 'real' quickly, `broken` fails."""
+
+    def __init__(self):
+        self.calls: list[tuple[str, str]] = []
+
+    async def __call__(self, stage: Stage, text: str) -> str | None:
+        self.calls.append((stage.name, text))
+        if stage.name == "first":
+            await asyncio.sleep(0.01)
+            return "real"
+        if stage.name == "broken":
+            return None
+        await asyncio.sleep(0.05)
+        return f"{stage.name}({text})"
+
+
+def test_deps_must_be_declared_first():
+    with pytest.raises(ValueError):
+        StageScheduler([stage("second", ("first",)), stage("first")])
+    with pytest.raises(ValueError):
+        StageScheduler([stage("first"), stage("first")])
+
+
+async def test_independent_stages_overlap_and_failures_fall_back():
+    started: list[str] = []
+
+    async def on_start(s: Stage) -> None:
+        started.append(s.name)
+
+    runner = Runner()
+    run = await StageScheduler([
+        stage("first"),
+        stage("broken"),
+        stage("last", ("first", "broken")),
+    ]).run(runner, on_start)
+
+    assert started[:2] == ["first", "broken"]
+    assert run.outputs["last"] == "last(real broken-fallback)"
+    assert not run.ok("broken")
+    assert run.errors == ["broken failed"]
+
+
+async def test_stages_report_their_own_finish():
+    finished: list[str] = []
+
+    async def on_finish(s: Stage) -> None:
+        finished.append(s.name)
+
+    # "slow" starts first but finishes after "first" and its dependant
+    await StageScheduler([
+        stage("slow"),
+        stage("first"),
+        stage("last", ("first",)),
+    ]).run(Runner(), on_finish=on_finish)
+
+    assert finished == ["first", "slow", "last"]
@@ -0,0 +1,93 @@
+import io
+
+from agents.episode_log import (
+    build_structurer_input, episode_ranges, estimate_tokens, parse_episode_log, prepare_episode_input,
+)
+
+NOISY_LOG = """\
+2024-05-01 10:00:01 INFO Show Title: Pyaar Ka Vaada
+model: gemini-1.5-flash
+tokens: 1532
+request_id: 7f1c0a8e-1b2c-4d3e-8f90-123456789abc
+EP 12 - Meera finds the letter hidden in the temple
+EP 13 - Arjun confronts his father about the land deal
+[10:02:11] EP 13 - Arjun confronts his father about the land deal
+Tags: revenge, family drama
+Peak moments:
+- Meera vows "I will never forgive you!"
+- The wedding is called off
+"""
+
+
+def long_log(episodes: int) -> str:
+    lines = ["Title: Long Running Saga", "model: gemini-1.5-pro"]
+    for n in range(1, episodes + 1):
+        lines.append(f"2024-01-01 09:00:00 INFO EP {n} - In episode {n} the family secret number {n} comes out")
+        lines.append(f"latency: {n}ms")
+    return "\n".join(lines)
+
+
+def test_parser_drops_noise_and_duplicates():
+    digest = parse_episode_log(io.StringIO(NOISY_LOG))
+    assert digest.title == "Pyaar Ka Vaada"
+    assert digest.episodes == [12, 13]
+    assert digest.tags[:2] == ["revenge", "family drama"]
+    assert digest.story == [
+        "Meera finds the letter hidden in the temple",
+        "Arjun confronts his father about the land deal",
+    ]
+    assert digest.peak_moments == ['Meera vows "I will never forgive you!"', "The wedding is called off"]
+    assert digest.dropped == 3
+    assert digest.duplicates == 1
+
+
+def test_clean_input_within_budget_is_unchanged():
+    text = "Episode Summary: Meera finds the letter. Arjun leaves the village."
+    assert prepare_episode_input(text, 1000) == text
+
+
+def test_prepared_input_stays_within_budget():
+    text = long_log(400)
+    assert estimate_tokens(text) > 5000
+    for budget in (50, 200, 1000):
+        prepared = prepare_episode_input(text, budget)
+        assert estimate_tokens(prepared) <= budget
+        assert prepared.startswith("Show: Long Running Saga\nEpisodes: EP 1-400")
+        assert "gemini" not in prepared and "latency" not in prepared
+
+
+def test_peak_moments_win_the_budget():
+    prepared = prepare_episode_input(NOISY_LOG, 40)
+    assert "I will never forgive you!" in prepared
+    assert estimate_tokens(prepared) <= 40
+
+
+def test_oversized_single_line_is_truncated():
+    digest = parse_episode_log(["Summary: " + "word " * 500])
+    prepared = build_structurer_input(digest, 60)
+    assert prepared.endswith(" …")
+    assert estimate_tokens(prepared) <= 60
+
+
+def test_episode_ranges():
+    assert episode_ranges([5, 3, 6, 7, 9, 3]) == "EP 3, EP 5-7, EP 9"
+
+
+def test_log_prefixes_and_model_names_are_never_passed_through():
+    text = (
+        "2025-01-02 10:00:01 INFO EP 12 - gemini-2.5-flash-lite - Parul finds the ring\n"
+        "2025-01-02 10:00:02 INFO EP 13 - Nalin leaves home"
+    )
+    digest = parse_episode_log(io.StringIO(text))
+    assert digest.dropped == digest.duplicates == 0
+    assert digest.rewritten == 2
+    assert digest.story == ["Parul finds the ring", "Nalin leaves home"]
+
+    prepared = prepare_episode_input(text, 1000)
+    assert prepared != text
+    assert "gemini" not in prepared and "INFO" not in prepared and "2025" not in prepared
+
+
+def test_inline_peak_list_keeps_quoted_commas():
+    digest = parse_episode_log(['Peak moments: Nalin says "I know, Parul"; the ring falls, “Wait, no” she cries'])
+    assert digest.peak_moments == ['Nalin says "I know, Parul"', "the ring falls", "“Wait, no” she cries"]
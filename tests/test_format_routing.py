@@ -0,0 +1,126 @@
+import pytest
+
+from agents.base import GeminiAgentExecutor
+from agents.format_profiles import (
+    MULTI_SPEAKER, SINGLE_SPEAKER, detect_vibe, parse_format, route_format, speaker_profile,
+)
+from api.schemas import SpeakerDecision
+
+REVELATION = 'Nalin stuns everyone and reveals the truth. Riya confronts him: "You lied!"'
+VOW = "Meera swears revenge and secretly plots against the family that betrayed her."
+UNCLEAR = "He reveals the plan."
+
+
+class Model:
+    """Stands in for the model call behind every agent; records what it was asked."""
+
+    def __init__(self):
+        self.answer = ""
+        self.calls: list[str] = []
+
+    async def answer_for(self, user_input: str) -> str:
+        self.calls.append(user_input)
+        return self.answer
+
+
+@pytest.fixture
+def model(monkeypatch):
+    monkeypatch.setenv("GEMINI_BACKEND", "fake")
+    monkeypatch.setenv("GEMINI_CACHE_ENABLED", "false")
+    fake = Model()
+
+    async def run_logic(agent, user_input: str) -> str:
+        return await fake.answer_for(user_input)
+
+    monkeypatch.setattr(GeminiAgentExecutor, "run_logic", run_logic)
+    return fake
+
+
+def test_revelation_routes_to_multi_speaker():
+    decision = route_format(REVELATION)
+    assert decision.format == MULTI_SPEAKER
+    assert decision.confidence >= 0.6
+
+
+def test_vow_routes_to_single_speaker():
+    decision = route_format(VOW)
+    assert decision.format == SINGLE_SPEAKER
+    assert decision.confidence >= 0.6
+    assert decision.vibe == "drama"
+
+
+def test_balanced_signals_have_no_confidence():
+    assert route_format(UNCLEAR).confidence == 0.0
+
+
+def test_vibe_and_format_parsing():
+    assert detect_vibe("A shocking twist at the wedding, what a twist") == "shock"
+    assert detect_vibe("Nothing in particular") == "default"
+    assert parse_format("I'd go with a multi speaker ad") == MULTI_SPEAKER
+    assert parse_format("Format: Single-Speaker") == SINGLE_SPEAKER
+    assert parse_format("no idea") is None
+
+
+def test_unknown_vibe_uses_the_default_profile():
+    profile = speaker_profile(SINGLE_SPEAKER, "horror")
+    assert profile.split("\n")[0] == speaker_profile(SINGLE_SPEAKER, "default").split("\n")[0]
+    assert profile.endswith(f"{SINGLE_SPEAKER} / horror)")
+
+
+async def test_router_decides_clear_structures_locally(model):
+    from agents.router_agent import RouterAgent
+
+    decision = SpeakerDecision.model_validate_json(await RouterAgent().run_logic(VOW))
+    assert decision.format == SINGLE_SPEAKER
+    assert decision.reason.endswith("(local router)")
+    assert model.calls == []
+
+
+async def test_router_asks_the_model_when_unsure(model):
+    from agents.router_agent import RouterAgent
+
+    model.answer = '{"format": "Single-Speaker", "reason": "an inner plan"}'
+    decision = SpeakerDecision.model_validate_json(await RouterAgent().run_logic(UNCLEAR))
+    assert model.calls == [UNCLEAR]
+    assert decision.format == SINGLE_SPEAKER
+    assert decision.reason == "an inner plan"
+    # The vibe always comes from the local detector
+    assert decision.vibe == "default"
+
+
+async def test_router_reads_the_format_from_a_free_text_answer(model):
+    from agents.router_agent import RouterAgent
+
+    model.answer = "Single speaker rant, because it is a secret plan."
+    decision = SpeakerDecision.model_validate_json(await RouterAgent().run_logic(UNCLEAR))
+    assert decision.format == SINGLE_SPEAKER
+    assert decision.reason == model.answer
+
+
+async def test_speaker_serves_library_profile_for_router_decision(model):
+    from agents.speaker_agent import SpeakerAgent
+
+    decision = SpeakerDecision(format=MULTI_SPEAKER, reason="a confrontation", vibe="shock")
+    profile = await SpeakerAgent().run_logic(decision.model_dump_json())
+    assert profile == speaker_profile(MULTI_SPEAKER, "shock")
+    assert model.calls == []
+
+
+async def test_speaker_reads_free_text_router_answers(model):
+    from agents.speaker_agent import SpeakerAgent
+
+    profile = await SpeakerAgent().run_logic("Format: Single-Speaker\nVibe: romance\nReason: a vow")
+    assert profile == speaker_profile(SINGLE_SPEAKER, "romance")
+    assert model.calls == []
+
+
+async def test_speaker_falls_back_to_the_model(model, monkeypatch):
+    from agents.speaker_agent import SpeakerAgent
+
+    model.answer = "[Speaker 0]: custom"
+    assert await SpeakerAgent().run_logic("Something without a format") == "[Speaker 0]: custom"
+
+    monkeypatch.setenv("SPEAKER_PROFILE_LIBRARY", "false")
+    decision = SpeakerDecision(format=MULTI_SPEAKER, reason="a confrontation")
+    assert await SpeakerAgent().run_logic(decision.model_dump_json()) == "[Speaker 0]: custom"
+    assert len(model.calls) == 2
@@ -0,0 +1,195 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.call_context import CallOptions, RunProgress, call_options, run_progress
+from agents.governor import GeminiGovernor, TokenBucket, is_throttle_error
+
+
+class Throttled(Exception):
+    code = 429
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def governor(**kwargs) -> GeminiGovernor:
+    # Quotas high enough that only the in-flight limit holds calls back
+    return GeminiGovernor(**{"requests_per_minute": 60_000, "max_in_flight": 1, **kwargs})
+
+
+async def call(gov: GeminiGovernor, name: str, admitted: list[str], priority: str = "interactive",
+               tenant: str = "default", run: RunProgress | None = None) -> None:
+    call_options.set(CallOptions(priority=priority, tenant=tenant))
+    run_progress.set(run)
+    async with gov.slot(10):
+        admitted.append(name)
+
+
+async def admission_order(gov: GeminiGovernor, calls: list[dict], hold: float = 0.0,
+                          while_queued=None) -> list[str]:
+    """Queues `calls` behind a call holding the only slot, runs `while_queued`, then releases the slot."""
+    admitted: list[str] = []
+    holding, release = asyncio.Event(), asyncio.Event()
+
+    async def blocker():
+        async with gov.slot(10):
+            holding.set()
+            await release.wait()
+
+    blocking = asyncio.create_task(blocker())
+    await holding.wait()
+    tasks = []
+    for spec in calls:
+        tasks.append(asyncio.create_task(call(gov, admitted=admitted, **spec)))
+        # Lets each call reach the queue before the next one
+        await asyncio.sleep(0)
+        if spec.get("priority") == "batch" and hold:
+            await asyncio.sleep(hold)
+    if while_queued is not None:
+        while_queued()
+    release.set()
+    await asyncio.gather(blocking, *tasks)
+    return admitted
+
+
+def test_token_bucket_waits_for_refill(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    bucket = TokenBucket(rate_per_second=2.0, capacity=10.0)
+    assert bucket.wait_time(10) == 0.0
+
+    bucket.take(10)
+    assert bucket.wait_time(4) == pytest.approx(2.0)
+    # A halved rate doubles the wait
+    assert bucket.wait_time(4, rate_factor=0.5) == pytest.approx(4.0)
+
+    clock.now += 1.0
+    assert bucket.wait_time(2) == 0.0
+    # Requests larger than the bucket only ever wait for a full one
+    assert bucket.wait_time(50) == pytest.approx(4.0)
+
+
+def test_token_bucket_adjust_is_capped():
+    bucket = TokenBucket(rate_per_second=1.0, capacity=10.0)
+    bucket.take(4)
+    bucket.adjust(100)
+    assert bucket.tokens == 10.0
+    bucket.adjust(-15)
+    assert bucket.tokens == -5.0
+
+
+def test_throttle_errors():
+    assert is_throttle_error(Throttled())
+    assert not is_throttle_error(ValueError("bad input"))
+
+
+async def test_throttling_halves_rate_and_success_restores_it():
+    gov = governor(max_in_flight=8, increase_step=0.1, decrease_cooldown=60.0)
+    with pytest.raises(Throttled):
+        async with gov.slot(10):
+            raise Throttled()
+    assert gov.rate_factor == 0.5
+    assert gov.in_flight_limit == 4
+
+    # A burst of failures inside the cooldown counts once
+    with pytest.raises(Throttled):
+        async with gov.slot(10):
+            raise Throttled()
+    assert gov.rate_factor == 0.5
+    assert gov.throttled == 2
+
+    async with gov.slot(10):
+        pass
+    assert gov.rate_factor == pytest.approx(0.6)
+    assert gov.in_flight == 0
+
+
+async def test_rate_factor_has_a_floor_and_other_errors_do_not_count():
+    gov = governor(min_rate_factor=0.1, decrease_cooldown=0.0)
+    for _ in range(10):
+        with pytest.raises(Throttled):
+            async with gov.slot(10):
+                raise Throttled()
+    assert gov.rate_factor == 0.1
+
+    with pytest.raises(ValueError):
+        async with gov.slot(10):
+            raise ValueError()
+    assert gov.rate_factor == 0.1
+    assert gov.throttled == 10
+
+
+async def test_interactive_calls_go_before_batch():
+    order = await admission_order(governor(), [
+        {"name": "batch-1", "priority": "batch"},
+        {"name": "interactive-1"},
+        {"name": "batch-2", "priority": "batch"},
+        {"name": "interactive-2"},
+    ])
+    assert order == ["interactive-1", "interactive-2", "batch-1", "batch-2"]
+
+
+async def test_runs_further_along_go_first():
+    order = await admission_order(governor(), [
+        {"name": "new-run", "run": RunProgress(completed=0)},
+        {"name": "far-along", "run": RunProgress(completed=3)},
+        {"name": "under-way", "run": RunProgress(completed=1)},
+        {"name": "no-run"},
+    ])
+    assert order == ["far-along", "under-way", "new-run", "no-run"]
+
+
+async def test_older_run_goes_first_at_equal_progress():
+    older, newer = RunProgress(), RunProgress()
+    order = await admission_order(governor(), [
+        {"name": "older-structurer", "run": older},
+        {"name": "newer-router", "run": newer},
+    ])
+    assert order == ["older-structurer", "newer-router"]
+
+
+async def test_progress_made_while_waiting_counts():
+    behind = RunProgress()
+    calls = [{"name": "ahead", "run": RunProgress(completed=1)}, {"name": "behind", "run": behind}]
+
+    def advance():
+        behind.completed = 2
+
+    assert await admission_order(governor(), calls, while_queued=advance) == ["behind", "ahead"]
+
+
+async def test_starved_batch_call_competes_as_interactive():
+    order = await admission_order(governor(starvation_seconds=0.05), [
+        {"name": "batch", "priority": "batch"},
+        {"name": "interactive"},
+    ], hold=0.1)
+    assert order == ["batch", "interactive"]
+
+
+async def test_tenants_share_by_weight():
+    calls = [{"name": tenant, "tenant": tenant} for _ in range(4) for tenant in ("light", "heavy")]
+    order = await admission_order(governor(tenant_weights={"heavy": 3.0}), calls)
+    assert order[:4].count("heavy") == 3
+    assert order.count("heavy") == 4
+
+
+async def test_cancelled_waiter_does_not_hold_a_slot():
+    gov = governor()
+    admitted: list[str] = []
+    async with gov.slot(10):
+        waiting = asyncio.create_task(call(gov, "cancelled", admitted))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+    await call(gov, "next", admitted)
+    assert admitted == ["next"]
+    assert gov.in_flight == 0
+    assert gov.queue_depth == 0
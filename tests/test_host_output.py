@@ -0,0 +1,43 @@
+import json
+
+from api.schemas import ScriptVariant, VariantRanking
+from orchestrator.dag import Stage, StageRun
+from orchestrator.host import PipelineHost
+
+STAGES = ["Structurer", "Router", "Speaker", "ScriptWriter", "Validator"]
+
+
+def finished_run(validator_output: str) -> StageRun:
+    stages = [Stage(name, None, lambda run: "", fallback="", error=f"{name} failed") for name in STAGES]
+    run = StageRun(stages)
+    outputs = {
+        "Structurer": "structure",
+        "Router": "router",
+        "Speaker": "speakers",
+        "ScriptWriter": json.dumps(["first script", "second script"]),
+        "Validator": validator_output,
+    }
+    for stage in stages:
+        run.record(stage, outputs[stage.name])
+    return run
+
+
+def test_empty_ranking_falls_back_to_first_candidate():
+    host = PipelineHost()
+    run = finished_run(VariantRanking(variants=[]).model_dump_json())
+    assert host._ranking(run) is None
+    output = host._build_final_output(run, variants=2)
+    assert "first script" in output
+    assert "second script" not in output
+
+
+def test_best_ranked_candidate_is_the_script():
+    host = PipelineHost()
+    ranking = VariantRanking(variants=[
+        ScriptVariant(rank=1, script="second script", valid=True, score=9),
+        ScriptVariant(rank=2, script="first script", valid=False, score=4, issues=["too long"]),
+    ])
+    output = host._build_final_output(finished_run(ranking.model_dump_json()), variants=2)
+    script_section = output.split("### Generated Ad Script\n", 1)[1].split("\n\n", 1)[0]
+    assert script_section == "second script"
+    assert "2. REJECTED (score 4): too long" in output
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from api.jobs import JobManager, JobQueueFull
+from api.schemas import PipelineEvent, ScriptResponse
+
+RESULT = ScriptResponse(script="script", genre="kukufm_drama", speaker_format="single_speaker")
+
+
+class Pipeline:
+    """Fake pipeline run: waits for `begin`, emits progress and two tokens, then waits for `resume`."""
+
+    def __init__(self):
+        self.begin = asyncio.Event()
+        self.begin.set()
+        self.resume = asyncio.Event()
+        self.paused = asyncio.Event()
+
+    async def __call__(self, prompt: str, metadata: dict):
+        await self.begin.wait()
+        yield PipelineEvent(event="progress", step=1, text="[1/2] Structurer")
+        yield PipelineEvent(event="token", text="a")
+        yield PipelineEvent(event="token", text="b")
+        self.paused.set()
+        await self.resume.wait()
+        yield PipelineEvent(event="progress", step=2, text="[2/2] ScriptWriter")
+        yield PipelineEvent(event="token", text="c")
+        yield PipelineEvent(event="result", result=RESULT)
+
+
+def labels(events: list[PipelineEvent]) -> list[str]:
+    return [event.text or event.event for event in events]
+
+
+async def collect(manager: JobManager, job) -> list[PipelineEvent]:
+    return [event async for event in manager.events(job)]
+
+
+@pytest.fixture
+async def manager():
+    pipeline = Pipeline()
+    jobs = JobManager(pipeline, workers=1, queue_size=2)
+    jobs.pipeline = pipeline
+    await jobs.start()
+    yield jobs
+    await jobs.close()
+
+
+async def test_subscribers_see_events_in_order(manager):
+    manager.pipeline.begin.clear()
+    job = manager.submit("prompt", {})
+    early = asyncio.create_task(collect(manager, job))
+    while not job.subscribers:
+        await asyncio.sleep(0)
+    manager.pipeline.begin.set()
+    await manager.pipeline.paused.wait()
+    # Attaches after the first tokens went out: replay first, then only what follows
+    late = asyncio.create_task(collect(manager, job))
+    await asyncio.sleep(0)
+    manager.pipeline.resume.set()
+
+    assert labels(await early) == ["[1/2] Structurer", "a", "b", "[2/2] ScriptWriter", "c", "result"]
+    assert labels(await late) == ["[1/2] Structurer", "[2/2] ScriptWriter", "c", "result"]
+    assert job.subscribers == []
+    assert manager.status(job).status == "succeeded"
+    # A subscriber after the end gets the recorded history
+    assert labels(await collect(manager, job)) == ["[1/2] Structurer", "[2/2] ScriptWriter", "result"]
+
+
+async def test_status_reports_queue_position_and_progress(manager):
+    first = manager.submit("first", {})
+    second = manager.submit("second", {})
+    await manager.pipeline.paused.wait()
+    assert manager.status(first).progress == "[1/2] Structurer"
+    assert manager.status(second).queue_position == 1
+    manager.pipeline.resume.set()
+    await manager.wait(second, timeout=1.0)
+    assert manager.status(second).status == "succeeded"
+
+
+async def test_full_queue_rejects_at_once():
+    jobs = JobManager(Pipeline(), workers=1, queue_size=1)
+    await jobs.start()
+    try:
+        jobs.submit("queued", {})
+        with pytest.raises(JobQueueFull) as rejected:
+            jobs.submit("rejected", {})
+        assert rejected.value.retry_after >= 1
+    finally:
+        await jobs.close()
+
+
+async def test_job_whose_run_raises_fails_with_terminal_event():
+    async def exploding(prompt: str, metadata: dict):
+        yield PipelineEvent(event="progress", step=1, text="[1/2] Structurer")
+        raise RuntimeError("upstream exploded")
+
+    jobs = JobManager(exploding, workers=1)
+    await jobs.start()
+    try:
+        job = jobs.submit("prompt", {})
+        await jobs.wait(job, timeout=1.0)
+        assert job.status == "failed"
+        assert job.error == "upstream exploded"
+        assert labels(await collect(jobs, job)) == ["[1/2] Structurer", "error"]
+    finally:
+        await jobs.close()
+
+
+async def test_finished_jobs_expire_while_idle():
+    async def instant(prompt: str, metadata: dict):
+        yield PipelineEvent(event="result", result=RESULT)
+
+    jobs = JobManager(instant, workers=1, retention_seconds=0.0, prune_interval=0.01)
+    await jobs.start()
+    try:
+        job = jobs.submit("prompt", {})
+        await jobs.wait(job, timeout=1.0)
+        await asyncio.sleep(0.05)
+        assert jobs.get(job.id) is None
+    finally:
+        await jobs.close()
@@ -0,0 +1,66 @@
+from orchestrator.near_duplicates import NearDuplicateIndex, shingles
+
+STORY = (
+    "Meera finds the old letter hidden behind the temple wall and learns that Arjun's father "
+    "sold the family land to pay off a debt he never told anyone about, while the village "
+    "prepares for the wedding that everyone believes will finally unite the two families"
+)
+OTHER = "A cooking show where two chefs compete to make the best street food in Mumbai before sunset"
+
+
+def jaccard(left: str, right: str) -> float:
+    a, b = shingles(left), shingles(right)
+    return len(a & b) / len(a | b)
+
+
+def test_identical_and_reformatted_inputs_match_exactly():
+    index = NearDuplicateIndex()
+    index.add(STORY, {"structurer": "structured"})
+    reformatted = "[2024-05-01 10:00] " + STORY.upper().replace(" ", "   ")
+    match = index.lookup(reformatted)
+    assert match is not None
+    assert match.similarity == 1.0
+    assert match.outputs == {"structurer": "structured"}
+
+
+def test_unrelated_input_does_not_match():
+    index = NearDuplicateIndex()
+    index.add(STORY, {"structurer": "structured"})
+    assert index.lookup(OTHER) is None
+    assert index.stats()["hits"] == 0
+
+
+def test_estimate_tracks_jaccard_similarity():
+    index = NearDuplicateIndex()
+    edited = STORY.replace("old letter", "torn letter").replace("wedding", "engagement")
+    estimate = index.similarity(index.signature(STORY), index.signature(edited))
+    assert abs(estimate - jaccard(STORY, edited)) < 0.15
+    assert index.similarity(index.signature(STORY), index.signature(OTHER)) < 0.2
+
+
+def test_threshold_is_inclusive():
+    probe = NearDuplicateIndex()
+    edited = STORY.replace("old letter", "torn letter")
+    similarity = probe.similarity(probe.signature(STORY), probe.signature(edited))
+    assert 0 < similarity < 1
+
+    at_threshold = NearDuplicateIndex(threshold=similarity)
+    at_threshold.add(STORY, {"structurer": "structured"})
+    assert at_threshold.lookup(edited) is not None
+
+    above_threshold = NearDuplicateIndex(threshold=similarity + 0.01)
+    above_threshold.add(STORY, {"structurer": "structured"})
+    assert above_threshold.lookup(edited) is None
+    assert above_threshold.last_similarity == similarity
+
+
+def test_least_recently_used_entry_is_evicted():
+    index = NearDuplicateIndex(max_entries=2)
+    index.add("first story about a lost ring", {"structurer": "1"})
+    index.add("second story about a broken promise", {"structurer": "2"})
+    assert index.lookup("first story about a lost ring") is not None
+    index.add("third story about a secret brother", {"structurer": "3"})
+
+    assert index.evictions == 1
+    assert index.lookup("second story about a broken promise") is None
+    assert index.lookup("first story about a lost ring") is not None
@@ -0,0 +1,30 @@
+import asyncio
+
+from orchestrator.profiling import StageProfiler
+
+
+async def test_concurrent_stages_are_measured_one_at_a_time():
+    profiler = StageProfiler(cpu=True)
+    inside: list[str] = []
+
+    async def stage(name: str) -> None:
+        async with profiler.stage(name):
+            inside.append(name)
+            assert inside == [name]
+            await asyncio.sleep(0.02)
+            inside.remove(name)
+
+    await asyncio.gather(stage("Structurer"), stage("Router"))
+    report = profiler.report()
+
+    assert report["Structurer"]["runs"] == report["Router"]["runs"] == 1
+    assert report["Router"]["queued_seconds"] >= 0.015
+    assert "functions" in report["Router"]
+
+
+async def test_reset_forgets_earlier_runs():
+    profiler = StageProfiler(cpu=False)
+    async with profiler.stage("Speaker"):
+        pass
+    profiler.reset()
+    assert profiler.report() == {}
@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from agents.resilience import CircuitBreaker, CircuitOpenError, Hedger
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def open_breaker(clock) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10.0)
+    breaker.check()
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.rejected == 1
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 9.9
+    assert breaker.state == "open"
+    clock[0] += 0.1
+    assert breaker.state == "half_open"
+
+    breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_successful_trial_closes(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 10.0
+    breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.check()
+    assert breaker.failures == 0
+
+
+def test_failed_trial_reopens_for_a_full_timeout(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 10.0
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 9.0
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock[0] += 1.0
+    breaker.check()
+
+
+def test_released_trial_allows_another(clock):
+    breaker = open_breaker(clock)
+    clock[0] += 10.0
+    breaker.check()
+    breaker.release_trial()
+    assert breaker.state == "half_open"
+    breaker.check()
+
+
+def primed_hedger(latency: float = 0.01, **kwargs) -> Hedger:
+    hedger = Hedger(**{"min_samples": 5, "max_rate": 1.0, **kwargs})
+    for _ in range(5):
+        hedger.latency.record(latency)
+    return hedger
+
+
+def upstream(queue_seconds: float, call_seconds: list[float], calls: list[int]):
+    """Attempt factory: waits `queue_seconds` for admission, then takes the next call latency."""
+    async def attempt(hedged):
+        await asyncio.sleep(queue_seconds)
+        hedged.admit()
+        n = len(calls)
+        calls.append(n)
+        await asyncio.sleep(call_seconds[n])
+        return n
+    return attempt
+
+
+async def test_no_hedging_without_enough_history():
+    hedger = Hedger(min_samples=5, max_rate=1.0)
+    calls: list[int] = []
+    assert await hedger.run(upstream(0.0, [0.05], calls)) == 0
+    assert hedger.hedges == 0
+    assert len(hedger.latency) == 1
+
+
+async def test_slow_admitted_call_is_hedged_and_hedge_wins():
+    hedger = primed_hedger()
+    calls: list[int] = []
+    assert await hedger.run(upstream(0.0, [1.0, 0.0], calls)) == 1
+    assert hedger.hedges == hedger.hedge_wins == 1
+
+
+async def test_queued_call_is_not_hedged_and_queueing_is_not_latency():
+    hedger = primed_hedger()
+    calls: list[int] = []
+    assert await hedger.run(upstream(0.1, [0.001], calls)) == 0
+    assert hedger.hedges == 0
+    assert calls == [0]
+    assert hedger.latency.percentile(100) < 0.05
+
+
+async def test_hedges_are_limited_by_budget():
+    hedger = primed_hedger(max_rate=0.0001)
+    # The starting budget pays for one hedge; the second slow call is not hedged
+    for expected_hedges in (1, 1):
+        calls: list[int] = []
+        await hedger.run(upstream(0.0, [0.05, 0.05], calls))
+        assert hedger.hedges == expected_hedges
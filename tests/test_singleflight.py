@@ -0,0 +1,110 @@
+import asyncio
+
+from orchestrator.singleflight import SingleFlight, coalesce_key
+
+
+class Source:
+    """Event source that emits 1, waits for `release`, then emits 2."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.cancelled = asyncio.Event()
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            yield 1
+            await self.release.wait()
+            yield 2
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+
+
+async def collect(stream) -> list:
+    return [event async for event in stream]
+
+
+def test_coalesce_key_ignores_case_whitespace_and_volatile_options():
+    assert coalesce_key("Hello   World", {"variants": 1, "trace_id": "a"}) == coalesce_key(
+        "hello world", {"variants": 1, "trace_id": "b", "deadline": 1.0}
+    )
+    assert coalesce_key("hello", {"variants": 1}) != coalesce_key("hello", {"variants": 2})
+
+
+async def test_joiner_sees_events_emitted_before_it_joined():
+    flight, source = SingleFlight(), Source()
+    first = flight.stream("key", source)
+    assert await anext(first) == 1
+
+    second = flight.stream("key", source)
+    source.release.set()
+    assert await collect(second) == [1, 2]
+    assert await collect(first) == [2]
+    assert source.calls == 1
+    assert flight.in_flight() == 0
+
+
+async def test_detaching_subscriber_leaves_run_going():
+    flight, source = SingleFlight(), Source()
+    first = flight.stream("key", source)
+    second = flight.stream("key", source)
+    assert await anext(first) == 1
+    assert await anext(second) == 1
+
+    await first.aclose()
+    source.release.set()
+    assert await collect(second) == [2]
+    assert not source.cancelled.is_set()
+    assert source.calls == 1
+
+
+async def test_run_is_cancelled_when_last_subscriber_leaves():
+    flight, source = SingleFlight(), Source()
+    only = flight.stream("key", source)
+    assert await anext(only) == 1
+
+    await only.aclose()
+    await asyncio.wait_for(source.cancelled.wait(), timeout=1.0)
+    assert flight.in_flight() == 0
+
+
+async def test_finished_run_is_not_replayed():
+    flight, source = SingleFlight(), Source()
+    source.release.set()
+    assert await collect(flight.stream("key", source)) == [1, 2]
+    assert await collect(flight.stream("key", source)) == [1, 2]
+    assert source.calls == 2
+
+
+async def test_producer_error_reaches_every_subscriber():
+    flight = SingleFlight()
+
+    async def failing():
+        yield 1
+        raise RuntimeError("upstream")
+
+    results = await asyncio.gather(
+        collect(flight.stream("key", failing)), collect(flight.stream("key", failing)), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+
+async def test_does_not_join_run_with_much_earlier_deadline():
+    flight, source = SingleFlight(deadline_slack=5.0), Source()
+    early = flight.stream("key", source, deadline=100.0)
+    assert await anext(early) == 1
+
+    late = flight.stream("key", source, deadline=200.0)
+    assert await anext(late) == 1
+    assert source.calls == 2
+
+    # Within the slack of the newest run, so it joins that one
+    close = flight.stream("key", source, deadline=203.0)
+    assert await anext(close) == 1
+    assert source.calls == 2
+
+    source.release.set()
+    for stream in (early, late, close):
+        assert await collect(stream) == [2]
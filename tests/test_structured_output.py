@@ -0,0 +1,58 @@
+from agents.structured_output import GEMINI_SCHEMA_KEYS, gemini_schema, parse_output
+from api.schemas import CandidateReviews, SpeakerDecision, StructuredInput
+
+
+def keys(schema) -> set[str]:
+    """Every key used anywhere in a schema, property names excluded."""
+    if isinstance(schema, list):
+        return set().union(*(keys(item) for item in schema))
+    if not isinstance(schema, dict):
+        return set()
+    found = set(schema)
+    for key, value in schema.items():
+        if key == "properties":
+            found |= set().union(*(keys(prop) for prop in value.values()))
+        else:
+            found |= keys(value)
+    return found
+
+
+def test_schema_keeps_only_keys_gemini_accepts():
+    for model in (StructuredInput, SpeakerDecision, CandidateReviews):
+        assert keys(gemini_schema(model)) <= GEMINI_SCHEMA_KEYS
+
+
+def test_schema_marks_optional_fields_nullable():
+    properties = gemini_schema(StructuredInput)["properties"]
+    assert properties["show_title"] == {"type": "string", "nullable": True}
+    assert properties["romance_intensity"]["type"] == "integer"
+    assert "show_title" not in gemini_schema(StructuredInput)["required"]
+
+
+def test_schema_inlines_nested_models():
+    reviews = gemini_schema(CandidateReviews)["properties"]["reviews"]
+    assert reviews["type"] == "array"
+    assert set(reviews["items"]["properties"]) == {"index", "valid", "score", "issues", "notes"}
+    assert reviews["items"]["properties"]["notes"]["nullable"] is True
+
+
+def test_schema_keeps_enums():
+    assert gemini_schema(SpeakerDecision)["properties"]["format"]["enum"] == ["Single-Speaker", "Multi-Speaker"]
+
+
+def test_parses_plain_fenced_and_wrapped_json():
+    expected = SpeakerDecision(format="Multi-Speaker", reason="a confrontation")
+    body = '{"format": "Multi-Speaker", "reason": "a confrontation"}'
+    assert parse_output(SpeakerDecision, body) == expected
+    assert parse_output(SpeakerDecision, f"```json\n{body}\n```") == expected
+    assert parse_output(SpeakerDecision, f"Here you go:\n{body}\nHope this helps.") == expected
+
+
+def test_returns_none_for_anything_else():
+    assert parse_output(SpeakerDecision, None) is None
+    assert parse_output(SpeakerDecision, "") is None
+    assert parse_output(SpeakerDecision, "Multi-Speaker, because of the confrontation") is None
+    assert parse_output(SpeakerDecision, '{"format": "Multi-Speaker", "reason": ') is None
+    # Valid JSON, wrong shape
+    assert parse_output(SpeakerDecision, '{"format": "Three-Speaker", "reason": "x"}') is None
+    assert parse_output(StructuredInput, '{"primary_characters": [], "core_conflict": "x"}') is None
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+from a2a.types import Task, TaskState, TaskStatus
+
+from orchestrator.task_store import SQLiteTaskStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def task(task_id: str, state: TaskState = TaskState.completed) -> Task:
+    return Task(id=task_id, context_id="context", status=TaskStatus(state=state))
+
+
+def store(tmp_path, **kwargs) -> SQLiteTaskStore:
+    # One hot task and a cleanup on every save, so reads below come from SQLite
+    return SQLiteTaskStore(str(tmp_path / "tasks.db"), hot_size=1, cleanup_interval=0.0, **kwargs)
+
+
+async def test_round_trip_through_database(tmp_path):
+    tasks = store(tmp_path)
+    await tasks.save(task("a", TaskState.working))
+    await tasks.save(task("b"))
+
+    restored = await tasks.get("a")
+    assert restored.status.state == TaskState.working
+    await tasks.delete("a")
+    assert await tasks.get("a") is None
+
+
+async def test_finished_tasks_expire_after_ttl(tmp_path, clock):
+    tasks = store(tmp_path, completed_ttl=60.0)
+    await tasks.save(task("finished"))
+    await tasks.save(task("running", TaskState.working))
+
+    clock[0] += 61.0
+    await tasks.save(task("new"))
+
+    assert await tasks.get("finished") is None
+    assert (await tasks.get("running")).status.state == TaskState.working
+    assert await tasks.get("new") is not None
+
+
+async def test_oldest_finished_tasks_are_pruned_past_max_tasks(tmp_path, clock):
+    tasks = store(tmp_path, max_tasks=3)
+    await tasks.save(task("running", TaskState.working))
+    for n in range(4):
+        clock[0] += 1.0
+        await tasks.save(task(f"done-{n}"))
+
+    assert [await tasks.get(f"done-{n}") is not None for n in range(4)] == [False, False, True, True]
+    assert await tasks.get("running") is not None
@@ -0,0 +1,46 @@
+from agents.validator_rules import check_script, count_words, dialogue_text
+
+WORD = "नमस्ते"
+
+
+def script(words: int, speakers: tuple[int, ...] = (0,)) -> str:
+    per_speaker = words // len(speakers)
+    lines = [f"[Speaker {n}] " + " ".join([WORD] * per_speaker) for n in speakers]
+    return "\n".join(lines)
+
+
+def test_valid_script_passes():
+    result = check_script(script(80))
+    assert result.valid
+    assert result.issues == []
+
+
+def test_word_count_bounds_are_inclusive():
+    assert check_script(script(70)).valid
+    assert check_script(script(90)).valid
+    short = check_script(script(69))
+    assert not short.valid
+    assert "69 words" in short.issues[0]
+    assert not check_script(script(91)).valid
+
+
+def test_headings_tags_and_punctuation_are_not_words():
+    text = "# शीर्षक\n[Speaker 0] नमस्ते , दुनिया !"
+    assert dialogue_text(text).split() == ["नमस्ते", ",", "दुनिया", "!"]
+    assert count_words(dialogue_text(text)) == 2
+
+
+def test_latin_dialogue_is_reported():
+    result = check_script(script(80) + " hello world hello")
+    assert not result.valid
+    assert any("hello, world" in issue for issue in result.issues)
+
+
+def test_speaker_tags():
+    untagged = check_script(" ".join([WORD] * 80))
+    assert "Missing `[Speaker 0]` tag." in untagged.issues
+
+    assert not check_script(script(80), multi_speaker=True).valid
+    assert check_script(script(80, speakers=(0, 1)), multi_speaker=True).valid
+    # Spacing and case inside the tag do not matter
+    assert check_script(script(80).replace("[Speaker 0]", "[ speaker 0 ]")).valid